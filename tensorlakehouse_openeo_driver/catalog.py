@@ -1,8 +1,9 @@
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from pystac_client import Client, CollectionClient
+from pystac_client import CollectionClient
 from pystac import Item
+import pandas as pd
 from openeo_driver.backend import CollectionCatalog
 from tensorlakehouse_openeo_driver.constants import (
     GEODN_DISCOVERY_USERNAME,
@@ -12,6 +13,8 @@ from tensorlakehouse_openeo_driver.constants import (
     DEFAULT_Y_DIMENSION,
 )
 from tensorlakehouse_openeo_driver.geodn_discovery import GeoDNDiscovery
+from tensorlakehouse_openeo_driver import stac_geoparquet
+from tensorlakehouse_openeo_driver.stac import get_collection, get_stac_client
 from datetime import datetime
 import logging
 from tensorlakehouse_openeo_driver.model.datacube_variable import DataCubeVariable
@@ -41,7 +44,6 @@ class TensorLakehouseCollectionCatalog(CollectionCatalog):
         self.discovery = GeoDNDiscovery(
             client_id=GEODN_DISCOVERY_USERNAME, password=GEODN_DISCOVERY_PASSWORD
         )
-        self._stac_catalog = None
 
     @property
     def headers(self):
@@ -53,9 +55,8 @@ class TensorLakehouseCollectionCatalog(CollectionCatalog):
 
     @property
     def stac_client(self):
-        if self._stac_catalog is None:
-            self._stac_catalog = Client.open(STAC_URL)
-        return self._stac_catalog
+        # the client is shared with load_collection to reuse its connection pool
+        return get_stac_client()
 
     def get_all_metadata(self) -> List[Dict]:
         """
@@ -108,7 +109,7 @@ class TensorLakehouseCollectionCatalog(CollectionCatalog):
         logger.debug(
             f"TensorLakehouseCollectionCatalog - Searching collection: {collection_id}"
         )
-        collection = self.stac_client.get_collection(collection_id=collection_id)
+        collection = get_collection(collection_id=collection_id)
         openeo_collection = self._convert_collection_client_to_openeo(
             pystac_collection=collection, full=True
         )
@@ -149,16 +150,32 @@ class TensorLakehouseCollectionCatalog(CollectionCatalog):
             f"Searching items: collections={collection_ids} bbox={bbox}\
                 datetime={datetime_field} fields={fields} limit={limit}"
         )
-        result = self.stac_client.search(
-            collections=collection_ids,
-            bbox=bbox,
-            limit=limit,
-            datetime=datetime_field,
-            fields=fields,
-        )
+        if stac_geoparquet.has_snapshot(collection_id=collection_id):
+            starttime, endtime = TensorLakehouseCollectionCatalog._parse_datetime(
+                datetime_field=datetime_field
+            )
+            pystac_items = [
+                Item.from_dict(item)
+                for item in stac_geoparquet.search_items(
+                    collection_id=collection_id,
+                    bbox=tuple(bbox) if bbox is not None else None,
+                    starttime=starttime,
+                    endtime=endtime,
+                    limit=limit,
+                )
+            ]
+        else:
+            result = self.stac_client.search(
+                collections=collection_ids,
+                bbox=bbox,
+                limit=limit,
+                datetime=datetime_field,
+                fields=fields,
+            )
+            pystac_items = result.items()
         items = list()
 
-        for item in result.items():
+        for item in pystac_items:
             items.append(
                 TensorLakehouseCollectionCatalog._convert_item_client_to_openeo(
                     pystac_item=item
@@ -175,6 +192,31 @@ class TensorLakehouseCollectionCatalog(CollectionCatalog):
 
         return response
 
+    @staticmethod
+    def _parse_datetime(
+        datetime_field: Optional[str],
+    ) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """parse datetime parameter of STAC API, i.e., a single datetime or an interval whose
+        ends may be open (".." or empty)
+
+        Args:
+            datetime_field (Optional[str]): datetime parameter
+
+        Returns:
+            Tuple[Optional[datetime], Optional[datetime]]: start, end
+        """
+        if datetime_field is None:
+            return None, None
+        if "/" not in datetime_field:
+            timestamp = pd.Timestamp(datetime_field).to_pydatetime()
+            return timestamp, timestamp
+        start, end = datetime_field.split("/")
+        starttime = (
+            pd.Timestamp(start).to_pydatetime() if start not in ["", ".."] else None
+        )
+        endtime = pd.Timestamp(end).to_pydatetime() if end not in ["", ".."] else None
+        return starttime, endtime
+
     @staticmethod
     def _convert_item_client_to_openeo(pystac_item: Item) -> Dict[str, Any]:
         links = list()
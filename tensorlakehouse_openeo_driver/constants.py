@@ -1,12 +1,100 @@
+import json
 import logging
 import logging.config
 import os
 from pathlib import Path
+from typing import Dict
 
 # set URL of STAC service, which provides collections and items
 STAC_URL = os.environ["STAC_URL"]
 assert STAC_URL is not None
 assert isinstance(STAC_URL, str)
+# max number of keep-alive connections that the process-wide STAC client keeps open
+STAC_CLIENT_POOL_SIZE = int(os.getenv("STAC_CLIENT_POOL_SIZE", 10))
+# number of seconds that STAC item search results are cached (0 disables the cache)
+STAC_SEARCH_CACHE_TTL = float(os.getenv("STAC_SEARCH_CACHE_TTL", 60))
+# per-collection TTL overrides as JSON, e.g., {"HLSS30": 600}
+STAC_SEARCH_CACHE_TTL_BY_COLLECTION: Dict[str, float] = json.loads(
+    os.getenv("STAC_SEARCH_CACHE_TTL_BY_COLLECTION", "{}")
+)
+# URL of the redis server through which the search caches of all worker processes are
+# invalidated, e.g., redis://redis:6379/0. If it is not set, only the TTL expires cached results
+# of other processes
+STAC_SEARCH_CACHE_REDIS_URL = os.getenv("STAC_SEARCH_CACHE_REDIS_URL")
+# max number of STAC items kept in the search cache
+STAC_SEARCH_CACHE_MAX_ITEMS = int(os.getenv("STAC_SEARCH_CACHE_MAX_ITEMS", 100000))
+# if true, load_collection starts loading each page of items as soon as it arrives
+STAC_SEARCH_STREAMING = os.getenv("STAC_SEARCH_STREAMING", "false").lower() in [
+    "true",
+    "1",
+    "yes",
+]
+# number of items per page of a streaming search
+STAC_SEARCH_PAGE_SIZE = int(os.getenv("STAC_SEARCH_PAGE_SIZE", 500))
+# number of pages that are loaded concurrently by a streaming search
+STAC_SEARCH_STREAMING_WORKERS = int(os.getenv("STAC_SEARCH_STREAMING_WORKERS", 4))
+# searches larger than these limits are split into partitions that are searched concurrently
+STAC_SEARCH_PARTITION_DEGREES = float(os.getenv("STAC_SEARCH_PARTITION_DEGREES", 10))
+STAC_SEARCH_PARTITION_DAYS = int(os.getenv("STAC_SEARCH_PARTITION_DAYS", 366))
+# max number of partitions searched at the same time
+STAC_SEARCH_MAX_CONCURRENCY = int(os.getenv("STAC_SEARCH_MAX_CONCURRENCY", 4))
+# directory of local stac-geoparquet snapshots, one subdirectory per collection
+STAC_GEOPARQUET_DIR = os.getenv("STAC_GEOPARQUET_DIR")
+STAC_GEOPARQUET_ROW_GROUP_SIZE = int(os.getenv("STAC_GEOPARQUET_ROW_GROUP_SIZE", 10000))
+# collections are served from cache for STAC_COLLECTION_CACHE_TTL seconds and then revalidated
+# using their ETag. Entries older than STAC_COLLECTION_CACHE_MAX_AGE seconds are dropped
+STAC_COLLECTION_CACHE_TTL = float(os.getenv("STAC_COLLECTION_CACHE_TTL", 300))
+STAC_COLLECTION_CACHE_MAX_AGE = float(os.getenv("STAC_COLLECTION_CACHE_MAX_AGE", 86400))
+STAC_COLLECTION_CACHE_MAX_SIZE = int(os.getenv("STAC_COLLECTION_CACHE_MAX_SIZE", 1000))
+# max number of band/CRS stacks that COGFileReader builds concurrently
+COG_STACK_WORKERS = int(os.getenv("COG_STACK_WORKERS", 8))
+# name of the GDAL I/O profile used to read collections that do not set one
+GDAL_IO_PROFILE = os.getenv("GDAL_IO_PROFILE", "default")
+# max width/height in pixels of data cubes loaded from COGs, larger extents are read from overviews
+COG_MAX_OUTPUT_SIZE = int(os.getenv("COG_MAX_OUTPUT_SIZE", 0))
+# COGs are assumed to have overviews down to 1/2**COG_MAX_OVERVIEW_LEVEL of the full resolution
+COG_MAX_OVERVIEW_LEVEL = int(os.getenv("COG_MAX_OVERVIEW_LEVEL", 8))
+# max number of items of each stackstac stack, larger lists are split into time-ordered batches
+COG_STACK_BATCH_SIZE = int(os.getenv("COG_STACK_BATCH_SIZE", 1000))
+# size in pixels of the internal tiles of COGs whose STAC metadata do not set their shape
+COG_TILE_SIZE = int(os.getenv("COG_TILE_SIZE", 512))
+# memory in bytes of each dask worker, which bounds the size of the chunks of COG data cubes
+DASK_WORKER_MEMORY = int(os.getenv("DASK_WORKER_MEMORY", 4 * 1024**3))
+# number of chunks that must fit in the memory of a dask worker at the same time
+DASK_CHUNKS_PER_WORKER = int(os.getenv("DASK_CHUNKS_PER_WORKER", 32))
+# bboxes whose output grid has at most this width/height in pixels are read without dask
+COG_PIXEL_DRILL_MAX_SIZE = int(os.getenv("COG_PIXEL_DRILL_MAX_SIZE", 8))
+# max number of assets that are read concurrently by the pixel-drill path
+COG_PIXEL_DRILL_WORKERS = int(os.getenv("COG_PIXEL_DRILL_WORKERS", 32))
+# data type of data cubes loaded from COGs: float64, float32 or native, i.e., the data type of the
+# assets, in which case missing pixels are marked by the nodata value of the assets instead of NaN
+COG_DTYPE = os.getenv("COG_DTYPE", "float64")
+# precedence of the COG items that have the same timestamp and overlap: "first" keeps the order
+# in which items are found, "least-cloudy" prefers the items that have the lowest eo:cloud_cover
+COG_MOSAIC_ORDER = os.getenv("COG_MOSAIC_ORDER", "first")
+# directory of the persistent COG header cache, which is disabled if it is not set. It must be
+# an absolute path of a volume that is mounted at the same path by the driver and all dask workers
+COG_HEADER_CACHE_DIR = os.getenv("COG_HEADER_CACHE_DIR")
+# max total size in bytes of the cached COG headers
+COG_HEADER_CACHE_MAX_BYTES = int(os.getenv("COG_HEADER_CACHE_MAX_BYTES", 1024**3))
+# number of seconds since the last use of a cached COG header during which it is never evicted,
+# which must be longer than the longest job
+COG_HEADER_CACHE_MIN_AGE = float(os.getenv("COG_HEADER_CACHE_MIN_AGE", 24 * 3600))
+# number of seconds a cached COG header is used before its ETag is revalidated
+COG_HEADER_CACHE_TTL = float(os.getenv("COG_HEADER_CACHE_TTL", 3600))
+# max number of COG headers that are fetched concurrently
+COG_HEADER_CACHE_WORKERS = int(os.getenv("COG_HEADER_CACHE_WORKERS", 16))
+# size in bytes of the blocks of remote NetCDF files that are fetched and cached
+NETCDF_BLOCK_SIZE = int(os.getenv("NETCDF_BLOCK_SIZE", 4 * 1024**2))
+# max number of Zarr stores that are opened concurrently
+ZARR_OPEN_WORKERS = int(os.getenv("ZARR_OPEN_WORKERS", 16))
+# synchronous requests whose load plan exceeds these limits must be submitted as batch jobs
+SYNC_PROCESSING_MAX_BYTES_READ = int(
+    os.getenv("SYNC_PROCESSING_MAX_BYTES_READ", 4 * 1024**3)
+)
+SYNC_PROCESSING_MAX_OUTPUT_BYTES = int(
+    os.getenv("SYNC_PROCESSING_MAX_OUTPUT_BYTES", 2 * 1024**3)
+)
 
 LOGGING_CONF_PATH = Path(__file__).parent.parent / "logging.conf"
 assert LOGGING_CONF_PATH.exists()
@@ -91,6 +179,8 @@ GEOTIFF_MEDIA_TYPE = "image/tiff; application=geotiff"
 PARQUET_MEDIA_TYPE = "table/parquet; application=geoparquet; profile=cloud-optimized"
 GRIB2_MEDIA_TYPE = "application/x-grib2"
 FSTD_MEDIA_TYPE = "application/x-fstd"
+# byte-range references of the chunks of NetCDF and GRIB2 files, generated by kerchunk
+REFERENCES_MEDIA_TYPE = "application/json; profile=kerchunk"
 
 # default reference system
 EPSG_4326 = "EPSG:4326"
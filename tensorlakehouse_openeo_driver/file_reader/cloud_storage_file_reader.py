@@ -11,7 +11,18 @@ from urllib.parse import urlparse
 from datetime import datetime
 import xarray as xr
 from openeo_pg_parser_networkx.pg_schema import ParameterReference
-from tensorlakehouse_openeo_driver.util import object_storage_util
+from tensorlakehouse_openeo_driver.constants import (
+    DEFAULT_BANDS_DIMENSION,
+    DEFAULT_X_DIMENSION,
+    DEFAULT_Y_DIMENSION,
+)
+from tensorlakehouse_openeo_driver.geospatial_utils import (
+    clip_box,
+    filter_by_time,
+    has_timestamps_within,
+    reproject_bbox,
+)
+from tensorlakehouse_openeo_driver.util import kerchunk_references, object_storage_util
 
 assert os.path.isfile("logging.conf")
 logging.config.fileConfig(fname="logging.conf", disable_existing_loggers=False)
@@ -230,6 +241,13 @@ class CloudStorageFileReader:
         url = f"s3://{bucket}/{object}"
         return url
 
+    def _get_endpoint_url(self) -> str:
+        """endpoint as an URL, i.e., prefixed by https:// if there is no scheme"""
+        if self.endpoint.startswith("https://"):
+            return self.endpoint
+        else:
+            return f"https://{self.endpoint}"
+
     def create_s3filesystem(
         self,
     ) -> s3fs.S3FileSystem:
@@ -243,18 +261,37 @@ class CloudStorageFileReader:
         Returns:
             s3fs.S3FileSystem: _description_
         """
-        if self.endpoint.startswith("https://"):
-            endpoint_url = self.endpoint
-        else:
-            endpoint_url = f"https://{self.endpoint}"
         fs = s3fs.S3FileSystem(
             anon=False,
-            endpoint_url=endpoint_url,
+            endpoint_url=self._get_endpoint_url(),
             key=self.access_key_id,
             secret=self.secret_access_key,
         )
         return fs
 
+    def _open_references(self, href: str) -> xr.Dataset:
+        """open a NetCDF or GRIB2 file through its kerchunk references, so that only the chunks
+        that are selected are read instead of the whole file
+
+        Args:
+            href (str): link to the references, as advertised by the item
+
+        Returns:
+            xr.Dataset: lazy dataset
+        """
+        if urlparse(href).scheme == "":
+            return kerchunk_references.open_references(url=href, storage_options={})
+        if href.lower().startswith("http"):
+            href = CloudStorageFileReader._convert_https_to_s3(url=href)
+        return kerchunk_references.open_references(
+            url=href,
+            storage_options={
+                "key": self.access_key_id,
+                "secret": self.secret_access_key,
+                "client_kwargs": {"endpoint_url": self._get_endpoint_url()},
+            },
+        )
+
     @staticmethod
     def _get_dimension_name(
         item: Dict[str, Any],
@@ -330,3 +367,56 @@ class CloudStorageFileReader:
                             dataset = dataset.sel({dimension_name: [value]})
 
         return dataset
+
+    def _subset_item(
+        self, ds: xr.Dataset, item: Dict[str, Any]
+    ) -> Optional[xr.DataArray]:
+        """clip the dataset of a single item to bbox, stack its bands and select the timestamps
+        within temporal_extent. File-based readers apply it to each item before items are
+        concatenated, so that memory scales with the requested region instead of the full grid
+        of every file. Items that have no timestamp within temporal_extent are skipped
+
+        Args:
+            ds (xr.Dataset): dataset of the item, whose bands and extra dimensions are selected
+            item (Dict[str, Any]): STAC item
+
+        Returns:
+            Optional[xr.DataArray]: data array of the item or None if it is skipped
+        """
+        x_dim = CloudStorageFileReader._get_dimension_name(
+            item=item, axis=DEFAULT_X_DIMENSION
+        )
+        y_dim = CloudStorageFileReader._get_dimension_name(
+            item=item, axis=DEFAULT_Y_DIMENSION
+        )
+        time_dim = CloudStorageFileReader._get_dimension_name(
+            item=item, dim_type="temporal"
+        )
+        crs_code = CloudStorageFileReader._get_epsg(item=item)
+        assert isinstance(crs_code, int), f"Error! Invalid type: {crs_code=}"
+        assert x_dim is not None and y_dim is not None
+        reprojected_bbox = reproject_bbox(
+            bbox=self.bbox, src_crs=4326, dst_crs=crs_code
+        )
+        # bands are stacked after clipping, because stacking loads lazy variables
+        ds = clip_box(
+            data=ds, bbox=reprojected_bbox, x_dim=x_dim, y_dim=y_dim, crs=crs_code
+        )
+        # if bands is already one of the dimensions, use default 'variable'
+        if DEFAULT_BANDS_DIMENSION in dict(ds.dims).keys():
+            da = ds.to_array()
+        else:
+            # else export array using bands
+            da = ds.to_array(dim=DEFAULT_BANDS_DIMENSION)
+        if time_dim is not None and time_dim in da.dims:
+            if not has_timestamps_within(
+                data=da, temporal_extent=self.temporal_extent, temporal_dim=time_dim
+            ):
+                logger.debug(
+                    f"Item {item['id']} has no timestamp within temporal extent"
+                )
+                return None
+            da = filter_by_time(
+                data=da, temporal_extent=self.temporal_extent, temporal_dim=time_dim
+            )
+        return da
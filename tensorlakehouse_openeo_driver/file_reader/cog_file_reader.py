@@ -1,9 +1,23 @@
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
 import numpy as np
-from typing import Any, DefaultDict, Dict, List, Mapping, Optional, Tuple
+from typing import Any, DefaultDict, Dict, List, Mapping, Optional, Tuple, Union
 import stackstac
 import xarray as xr
 from tensorlakehouse_openeo_driver.constants import (
+    COG_DTYPE,
+    COG_HEADER_CACHE_DIR,
+    COG_MAX_OUTPUT_SIZE,
+    COG_MAX_OVERVIEW_LEVEL,
+    COG_MOSAIC_ORDER,
+    COG_PIXEL_DRILL_MAX_SIZE,
+    COG_PIXEL_DRILL_WORKERS,
+    COG_STACK_BATCH_SIZE,
+    COG_STACK_WORKERS,
+    COG_TILE_SIZE,
+    DASK_CHUNKS_PER_WORKER,
+    DASK_WORKER_MEMORY,
     DEFAULT_BANDS_DIMENSION,
     DEFAULT_X_DIMENSION,
     DEFAULT_Y_DIMENSION,
@@ -11,17 +25,36 @@ from tensorlakehouse_openeo_driver.constants import (
 from tensorlakehouse_openeo_driver.file_reader.cloud_storage_file_reader import (
     CloudStorageFileReader,
 )
+from tensorlakehouse_openeo_driver.file_reader import gdal_io_profiles
 import os
 import logging
 import pandas as pd
+import rasterio
+from affine import Affine
+from boto3.session import Session
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
 from rasterio.session import AWSSession
+from rasterio.vrt import WarpedVRT
+from stackstac import geom_utils
+from stackstac.rio_env import LayeredEnv
 from tensorlakehouse_openeo_driver import geospatial_utils
+from tensorlakehouse_openeo_driver.util import cog_header_cache
 from datetime import datetime
 
 assert os.path.isfile("logging.conf")
 logging.config.fileConfig(fname="logging.conf", disable_existing_loggers=False)
 logger = logging.getLogger("geodnLogger")
 
+# name of the temporal dimension of the data arrays created by stackstac
+STACKSTAC_TIME_DIMENSION = "time"
+# valid values of COG_MOSAIC_ORDER
+MOSAIC_ORDERS = ["first", "least-cloudy"]
+# item property that sets the precedence of overlapping items if COG_MOSAIC_ORDER=least-cloudy
+CLOUD_COVER_PROPERTY = "eo:cloud_cover"
+# asset or item field that sets the shape of the internal tiles of COGs, i.e., [height, width]
+BLOCK_SHAPE_FIELD = "tensorlakehouse:block_shape"
+
 
 class COGFileReader(CloudStorageFileReader):
     def __init__(
@@ -31,7 +64,26 @@ class COGFileReader(CloudStorageFileReader):
         bbox: Tuple[float, float, float, float],
         temporal_extent: Tuple[datetime, Optional[datetime]],
         properties: Optional[Dict[str, Any]],
+        epsg: Optional[int] = None,
+        resolution: Optional[float] = None,
+        target_resolution: Optional[float] = None,
+        target_epsg: Optional[int] = None,
+        io_profile: Optional[str] = None,
     ) -> None:
+        """
+
+        Args:
+            epsg (Optional[int], optional): CRS of the output grid. Defaults to the most
+                frequent CRS of the items
+            resolution (Optional[float], optional): resolution of the output grid. Defaults to
+                the most frequent resolution of the items
+            target_resolution (Optional[float], optional): resolution to which the data cube
+                will be resampled, which allows reading COG overviews. Defaults to None
+            target_epsg (Optional[int], optional): CRS of target_resolution. Defaults to None,
+                i.e., the CRS of the output grid
+            io_profile (Optional[str], optional): name of the GDAL I/O profile. Defaults to
+                GDAL_IO_PROFILE
+        """
         super().__init__(
             items=items,
             bbox=bbox,
@@ -39,6 +91,11 @@ class COGFileReader(CloudStorageFileReader):
             temporal_extent=temporal_extent,
             properties=properties,
         )
+        self.epsg = epsg
+        self.resolution = resolution
+        self.target_resolution = target_resolution
+        self.target_epsg = target_epsg
+        self.io_profile = io_profile
 
     def load_items(
         self,
@@ -59,46 +116,85 @@ class COGFileReader(CloudStorageFileReader):
             most_frequent_epsg,
             most_frequent_resolution,
         ) = COGFileReader._group_items_by_band(items=self.items, bands=self.bands)
+        # output grid can be set by the caller, e.g., to align cubes loaded separately
+        if self.epsg is not None and self.resolution is not None:
+            most_frequent_epsg = self.epsg
+            most_frequent_resolution = self.resolution
+        else:
+            most_frequent_resolution = COGFileReader._get_overview_resolution(
+                bbox=self.bbox,
+                epsg=most_frequent_epsg,
+                resolution=most_frequent_resolution,
+                target_resolution=self.target_resolution,
+                target_epsg=self.target_epsg,
+            )
+        transform, width, height = COGFileReader._get_grid(
+            bbox=self.bbox, epsg=most_frequent_epsg, resolution=most_frequent_resolution
+        )
+        # all bands share the data type, so that they can be concatenated without conversion
+        dtype, nodata = COGFileReader._get_dtype_and_nodata(
+            items=self.items,
+            assets=[CloudStorageFileReader.DATA] + list(self.bands or []),
+        )
+        # a few pixels are read directly, because building a dask graph would cost more
+        if max(width, height) <= COG_PIXEL_DRILL_MAX_SIZE:
+            return self._drill_pixels(
+                item_by_bands=item_by_bands,
+                epsg=most_frequent_epsg,
+                transform=transform,
+                width=width,
+                height=height,
+                dtype=dtype,
+                nodata=nodata,
+            )
 
-        # for each group of media type items, load items into xarray
-        data_arrays: List[xr.DataArray] = list()
-        # concatenate the data arrays of each band alog the band dimension
-        for band, items_grouped_by_crs_resolution in item_by_bands.items():
-            single_band_arrays = list()
-            # combine the  data array that have the same band
-            for stac_items in items_grouped_by_crs_resolution.values():
-                # if items are single-asset, 'assets' is a list that has a single band name that will be
-                # used to rename 'data'
+        # stacks of each band, CRS group and batch of items are built concurrently
+        futures_by_band: Dict[str, List[List[Future]]] = defaultdict(list)
+        batches_by_group = {
+            (band, key): COGFileReader._split_into_batches(items=stac_items)
+            for band, items_grouped_by_crs_resolution in item_by_bands.items()
+            for key, stac_items in items_grouped_by_crs_resolution.items()
+        }
+        num_batches = sum(len(batches) for batches in batches_by_group.values())
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(COG_STACK_WORKERS, num_batches))
+        ) as executor:
+            for (band, _), batches in batches_by_group.items():
+                # if items are single-asset, 'assets' is a list that has a single band name
+                # that will be used to rename 'data'
                 if band is not None:
                     assets = [band]
                 else:
                     # multi-asset items are loaded in parallel
                     assert self.bands is not None
                     assets = self.bands
-
-                # load items from COS as xarray
-                arr = self._load_items_using_stackstac(
-                    items=stac_items,
-                    bbox=self.bbox,
-                    bands=assets,
-                    epsg=most_frequent_epsg,
-                    resolution=most_frequent_resolution,
+                batch_futures = [
+                    executor.submit(
+                        self._load_items_using_stackstac,
+                        items=batch,
+                        bbox=self.bbox,
+                        bands=assets,
+                        epsg=most_frequent_epsg,
+                        resolution=most_frequent_resolution,
+                        dtype=dtype,
+                        nodata=nodata,
+                    )
+                    for batch in batches
+                ]
+                futures_by_band[band].append(batch_futures)
+            # concatenate the data arrays of each band alog the band dimension
+            data_arrays: List[xr.DataArray] = list()
+            for band, groups in futures_by_band.items():
+                single_band_arrays = [
+                    COGFileReader._concat_batches(
+                        data_arrays=[future.result() for future in batch_futures]
+                    )
+                    for batch_futures in groups
+                ]
+                # groups of the same band are combined as a single mosaic
+                data_arrays.append(
+                    geospatial_utils.mosaic(data_arrays=single_band_arrays)
                 )
-
-                single_band_arrays.append(arr)
-
-            data_array = None
-            if len(single_band_arrays) > 1:
-                data_array = single_band_arrays[0]
-                for i in range(1, len(single_band_arrays)):
-                    data_array = data_array.combine_first(single_band_arrays[i])
-            elif len(single_band_arrays) == 1:
-                data_array = single_band_arrays.pop()
-            else:
-                raise ValueError(
-                    f"Error! Unexpected size of single band arrays list for band {band}"
-                )
-            data_arrays.append(data_array)
         if len(data_arrays) > 1:
             # Reindex each band to match coordinates of first band
             data_arrays_aligned = []
@@ -121,6 +217,8 @@ class COGFileReader(CloudStorageFileReader):
         bands: List[str],
         epsg: int,
         resolution: float,
+        dtype: np.dtype = np.dtype(np.float64),
+        nodata: Union[int, float] = np.nan,
     ) -> xr.DataArray:
         """load STAC items into memory as xarray objects
 
@@ -133,6 +231,8 @@ class COGFileReader(CloudStorageFileReader):
                 that case would mean each pixel is 20ºx20º (probably not what you wanted).
                 You can also give pair of (x_resolution, y_resolution).
             epsg (int): reference system (e.g., 4326)
+            dtype (np.dtype, optional): data type of the data array. Defaults to float64
+            nodata (Union[int, float], optional): value of the missing pixels. Defaults to NaN
 
         Returns:
             xr.DataArray: _description_
@@ -170,45 +270,83 @@ class COGFileReader(CloudStorageFileReader):
 
             mydatetime = item_prop.get("datetime")
             pddt = pd.Timestamp(mydatetime)
-            item["properties"]["datetime"] = pddt.isoformat(sep="T", timespec="seconds")
-            dict_items.append(item)
+            # items are shared with the STAC search cache, so they are copied, not modified
+            item_prop = {
+                **item_prop,
+                "datetime": pddt.isoformat(sep="T", timespec="seconds"),
+            }
+            dict_items.append({**item, "properties": item_prop})
 
         assert isinstance(time_dim, str), f"Error! Unexpected time_dim={time_dim}"
         # create boto3 session using credentials
         assert isinstance(bucket, str)
         session = self._create_boto3_session()
         logger.debug(f"load_items_using_stackstac - connecting to {self.endpoint=}")
-        # accessing non-AWS s3 https://github.com/rasterio/rasterio/pull/1779
-        aws_session = AWSSession(
-            session=session,
-            endpoint_url=self.endpoint,
+        dict_items = self._replace_hrefs(
+            items=dict_items, assets=assets, session=session
+        )
+        block_shape = COGFileReader._get_block_shape(items=dict_items, assets=assets)
+        chunksize = COGFileReader._get_chunksize(
+            num_times=len({item["properties"]["datetime"] for item in dict_items}),
+            bbox=bbox,
+            epsg=epsg,
+            resolution=resolution,
+            itemsize=dtype.itemsize,
+            block_shape=block_shape,
+        )
+        # same bounds that stackstac computes from bounds_latlon
+        bounds = geom_utils.snapped_bounds(
+            geom_utils.reproject_bounds(bbox, 4326, epsg), (resolution, resolution)
+        )
+        stack_bounds = COGFileReader._get_aligned_bounds(
+            bounds=bounds,
+            resolution=resolution,
+            chunksize=chunksize,
+            block_shape=block_shape,
+            origin=COGFileReader._get_tile_origin(items=dict_items, epsg=epsg),
         )
         # setting gdal_env param is based on this https://github.com/gjoseph92/stackstac#roadmap
         data_array = stackstac.stack(
             dict_items,
             epsg=epsg,
             resolution=resolution,
-            bounds_latlon=bbox,
+            bounds=stack_bounds,
+            snap_bounds=False,
             rescale=False,
-            fill_value=np.nan,
-            properties=["datetime"],
-            assets=assets,
-            gdal_env=stackstac.DEFAULT_GDAL_ENV.updated(
-                always=dict(session=aws_session)
+            dtype=dtype,
+            fill_value=nodata,
+            properties=(
+                ["datetime", CLOUD_COVER_PROPERTY]
+                if COGFileReader._is_least_cloudy()
+                else ["datetime"]
             ),
+            assets=assets,
+            gdal_env=self._create_gdal_env(session=session),
             band_coords=False,
             sortby_date="asc",
+            chunksize=chunksize,
         )
+        if stack_bounds != bounds:
+            # pixels outside of bounds are dropped lazily, so chunks still match the tiles
+            west, _, east, north = bounds
+            col = int(round((west - stack_bounds[0]) / resolution))
+            row = int(round((stack_bounds[3] - north) / resolution))
+            width = int((east - west + resolution / 2) / resolution)
+            data_array = data_array.isel(x=slice(col, col + width), y=slice(row, None))
+        if not np.isnan(nodata):
+            # processes that compute new values replace the nodata value by NaN
+            data_array.rio.write_nodata(nodata, encoded=False, inplace=True)
         if "band" in data_array.dims and "band" != DEFAULT_BANDS_DIMENSION:
             data_array = data_array.rename({"band": DEFAULT_BANDS_DIMENSION})
         # if time_dim in data_array.dims and "time" != TIME:
         # data_array = data_array.rename({"time": TIME})
+        order = COGFileReader._get_mosaic_order(data_array=data_array)
         # drop coords that are not required to avoid merging conflicts
         for coord in list(data_array.coords.keys()):
             if coord not in [x_dim, y_dim, DEFAULT_BANDS_DIMENSION, time_dim]:
                 data_array = data_array.reset_coords(names=coord, drop=True)
         data_array = geospatial_utils.remove_repeated_time_coords(
-            data_array=data_array, time_dim=time_dim
+            data_array=data_array, time_dim=time_dim, order=order
         )
 
         data_array.rio.write_crs(epsg, inplace=True)
@@ -226,6 +364,550 @@ class COGFileReader(CloudStorageFileReader):
 
         return data_array
 
+    @staticmethod
+    def _is_least_cloudy() -> bool:
+        assert (
+            COG_MOSAIC_ORDER in MOSAIC_ORDERS
+        ), f"Error! Invalid COG_MOSAIC_ORDER={COG_MOSAIC_ORDER}. Valid values: {MOSAIC_ORDERS}"
+        return COG_MOSAIC_ORDER == "least-cloudy"
+
+    @staticmethod
+    def _get_cloud_cover(item: Dict[str, Any]) -> float:
+        """get the cloud cover of an item, which is infinite if it is not advertised, so that
+        these items have the lowest precedence"""
+        cloud_cover = pd.to_numeric(
+            item["properties"].get(CLOUD_COVER_PROPERTY), errors="coerce"
+        )
+        return np.inf if pd.isna(cloud_cover) else float(cloud_cover)
+
+    @staticmethod
+    def _get_mosaic_order(data_array: xr.DataArray) -> Optional[np.ndarray]:
+        """get the sort key of each time slice of a stack, which sets the precedence of the
+        slices that have the same timestamp when they are merged as a mosaic
+
+        Args:
+            data_array (xr.DataArray): stack created by stackstac
+
+        Returns:
+            Optional[np.ndarray]: cloud cover of each time slice or None to keep the order of
+                the items
+        """
+        if (
+            not COGFileReader._is_least_cloudy()
+            or CLOUD_COVER_PROPERTY not in data_array.coords
+            or data_array[CLOUD_COVER_PROPERTY].ndim == 0
+        ):
+            # if all items have the same cloud cover, stackstac sets a scalar coordinate
+            return None
+        cloud_cover = pd.to_numeric(
+            pd.Series(data_array[CLOUD_COVER_PROPERTY].values), errors="coerce"
+        )
+        return cloud_cover.fillna(np.inf).to_numpy()
+
+    @staticmethod
+    def _get_overview_resolution(
+        bbox: Tuple[float, float, float, float],
+        epsg: int,
+        resolution: float,
+        target_resolution: Optional[float] = None,
+        target_epsg: Optional[int] = None,
+    ) -> float:
+        """select the resolution of the COG overview level that best matches the effective
+        output resolution, i.e., the coarsest overview that is not coarser than the resolution
+        to which the data cube will be resampled nor than COG_MAX_OUTPUT_SIZE pixels across bbox.
+        Reading at the resolution of an overview level makes GDAL read that overview instead of
+        the full-resolution tiles. Overview level n is assumed to have 2**n times the full
+        resolution, as created by gdaladdo and the COG driver
+
+        Args:
+            bbox (Tuple[float, float, float, float]): west, south, east, north (EPSG:4326)
+            epsg (int): CRS of the output grid
+            resolution (float): full resolution of the items
+            target_resolution (Optional[float], optional): resolution to which the data cube
+                will be resampled. Defaults to None
+            target_epsg (Optional[int], optional): CRS of target_resolution. Defaults to None,
+                i.e., epsg
+
+        Returns:
+            float: resolution of the output grid
+        """
+        effective_resolution = resolution
+        if target_resolution is not None:
+            if target_epsg is not None and target_epsg != epsg:
+                # compare resolutions in the units of the items' CRS, e.g., meters
+                target_resolution = geospatial_utils.reproject_resolution(
+                    resolution=target_resolution,
+                    bbox=bbox,
+                    dst_crs=epsg,
+                    src_crs=target_epsg,
+                )
+            effective_resolution = max(effective_resolution, target_resolution)
+        if COG_MAX_OUTPUT_SIZE > 0:
+            west, south, east, north = geospatial_utils.reproject_bbox(
+                bbox=bbox, dst_crs=epsg
+            )
+            size = max(east - west, north - south)
+            effective_resolution = max(effective_resolution, size / COG_MAX_OUTPUT_SIZE)
+        # tolerance avoids dropping a level because of floating point errors
+        level = int(np.floor(np.log2(effective_resolution / resolution) + 1e-9))
+        level = min(max(level, 0), COG_MAX_OVERVIEW_LEVEL)
+        if level > 0:
+            logger.debug(
+                f"Reading COG overview level {level}: {resolution=} {effective_resolution=}"
+            )
+        return resolution * 2**level
+
+    @staticmethod
+    def _get_block_shape(
+        items: List[Dict[str, Any]], assets: List[str]
+    ) -> Tuple[int, int]:
+        """get the shape of the internal tiles of the COGs, which is set by the
+        BLOCK_SHAPE_FIELD of the assets or of the items. If it is not set or the COGs do not
+        share the same shape, tiles of COG_TILE_SIZE pixels are assumed
+
+        Args:
+            items (List[Dict[str, Any]]): STAC items
+            assets (List[str]): keys of the assets that will be read
+
+        Returns:
+            Tuple[int, int]: height and width of the tiles
+        """
+        block_shapes = set()
+        for item in items:
+            for asset in assets:
+                if asset in item["assets"].keys():
+                    block_shape = item["assets"][asset].get(BLOCK_SHAPE_FIELD) or item[
+                        "properties"
+                    ].get(BLOCK_SHAPE_FIELD)
+                    block_shapes.add(
+                        None if block_shape is None else tuple(block_shape)
+                    )
+        if len(block_shapes) != 1 or None in block_shapes:
+            return COG_TILE_SIZE, COG_TILE_SIZE
+        block_y, block_x = block_shapes.pop()
+        return int(block_y), int(block_x)
+
+    @staticmethod
+    def _get_tile_origin(
+        items: List[Dict[str, Any]], epsg: int
+    ) -> Optional[Tuple[float, float]]:
+        """get the top-left corner of the COGs in epsg, which is the origin of their tiles. If
+        the COGs do not share the same corner, e.g., adjacent MGRS tiles, the most frequent one
+        is used
+
+        Args:
+            items (List[Dict[str, Any]]): STAC items
+            epsg (int): CRS of the output grid
+
+        Returns:
+            Optional[Tuple[float, float]]: x and y of the corner or None if unknown
+        """
+        origins: List[Tuple[float, float]] = list()
+        for item in items:
+            if CloudStorageFileReader._get_epsg(item=item) != epsg:
+                continue
+            cube_dims: Dict[str, Any] = item["properties"]["cube:dimensions"]
+            extents = {
+                value.get("axis"): value.get("extent")
+                for value in cube_dims.values()
+                if value.get("type") == "spatial"
+            }
+            if extents.get("x") is not None and extents.get("y") is not None:
+                origins.append((min(extents["x"]), max(extents["y"])))
+        if len(origins) == 0:
+            return None
+        return max(set(origins), key=origins.count)
+
+    @staticmethod
+    def _get_aligned_bounds(
+        bounds: Tuple[float, float, float, float],
+        resolution: float,
+        chunksize: Tuple[int, int, int, int],
+        block_shape: Tuple[int, int],
+        origin: Optional[Tuple[float, float]],
+    ) -> Tuple[float, float, float, float]:
+        """move the top-left corner of bounds to the top-left corner of the tile that contains
+        it, so that chunks of whole tiles do not straddle the tiles of the COGs. Axes that are
+        covered by a single chunk are not moved
+
+        Args:
+            bounds (Tuple[float, float, float, float]): west, south, east, north of the output
+                grid
+            resolution (float): resolution of the output grid
+            chunksize (Tuple[int, int, int, int]): chunk size of time, bands, y and x
+            block_shape (Tuple[int, int]): height and width of the tiles
+            origin (Optional[Tuple[float, float]]): top-left corner of the COGs
+
+        Returns:
+            Tuple[float, float, float, float]: bounds of the grid that stackstac will load
+        """
+        if origin is None:
+            return bounds
+        origin_x, origin_y = origin
+        # tiles of overviews match pixels of the output grid only if both share the origin
+        pixels = np.divide(origin, resolution)
+        if not np.allclose(pixels, np.round(pixels), rtol=0, atol=1e-6):
+            return bounds
+        west, south, east, north = bounds
+        _, _, chunk_y, chunk_x = chunksize
+        block_y, block_x = block_shape
+        # tolerance avoids moving a corner by a whole tile because of floating point errors
+        if chunk_x < int((east - west + resolution / 2) / resolution):
+            tile_width = block_x * resolution
+            west = (
+                origin_x + np.floor((west - origin_x) / tile_width + 1e-9) * tile_width
+            )
+        if chunk_y < int((north - south + resolution / 2) / resolution):
+            tile_height = block_y * resolution
+            north = (
+                origin_y
+                - np.floor((origin_y - north) / tile_height + 1e-9) * tile_height
+            )
+        return float(west), south, east, float(north)
+
+    @staticmethod
+    def _get_chunksize(
+        num_times: int,
+        bbox: Tuple[float, float, float, float],
+        epsg: int,
+        resolution: float,
+        itemsize: int = np.dtype(np.float64).itemsize,
+        block_shape: Tuple[int, int] = (COG_TILE_SIZE, COG_TILE_SIZE),
+    ) -> Tuple[int, int, int, int]:
+        """compute the chunk shape of the data cube built by stackstac. Spatial chunks are
+        multiples of block_shape, so that each chunk reads whole tiles, and they are as large
+        as the memory limit of a chunk (DASK_WORKER_MEMORY / DASK_CHUNKS_PER_WORKER) allows.
+        If a chunk covers the whole bbox, it spans as many timestamps as the limit allows, which
+        avoids millions of tiny chunks for time series of small areas
+
+        Args:
+            num_times (int): number of timestamps
+            bbox (Tuple[float, float, float, float]): west, south, east, north (EPSG:4326)
+            epsg (int): CRS of the output grid
+            resolution (float): resolution of the output grid
+            itemsize (int, optional): size of a pixel in bytes. Defaults to float64
+            block_shape (Tuple[int, int], optional): height and width of the internal tiles
+                of the COGs (see _get_block_shape). Defaults to COG_TILE_SIZE
+
+        Returns:
+            Tuple[int, int, int, int]: chunk size of time, bands, y and x dimensions
+        """
+        west, south, east, north = geospatial_utils.reproject_bbox(
+            bbox=bbox, dst_crs=epsg
+        )
+        size_x = max(1, int(np.ceil((east - west) / resolution)))
+        size_y = max(1, int(np.ceil((north - south) / resolution)))
+        max_pixels = max(1, DASK_WORKER_MEMORY // DASK_CHUNKS_PER_WORKER // itemsize)
+        block_y, block_x = block_shape
+        # largest square of whole tiles that fits in a chunk, but at least one tile
+        side = int(np.sqrt(max_pixels))
+        chunk_y = min(size_y, max(block_y, side // block_y * block_y))
+        # narrow areas use the remaining memory along the other axis
+        chunk_x = min(
+            size_x,
+            max(
+                block_x,
+                side // block_x * block_x,
+                max_pixels // chunk_y // block_x * block_x,
+            ),
+        )
+        chunk_time = max(1, min(num_times, max_pixels // (chunk_y * chunk_x)))
+        return chunk_time, 1, chunk_y, chunk_x
+
+    @staticmethod
+    def _split_into_batches(
+        items: List[Dict[str, Any]], batch_size: int = COG_STACK_BATCH_SIZE
+    ) -> List[List[Dict[str, Any]]]:
+        """split items into time-ordered batches of at most batch_size items, so that each
+        stackstac stack has a dask graph of bounded size
+
+        Args:
+            items (List[Dict[str, Any]]): STAC items
+            batch_size (int, optional): max number of items of each batch
+
+        Returns:
+            List[List[Dict[str, Any]]]: batches
+        """
+        if len(items) <= batch_size:
+            return [items]
+        sorted_items = sorted(
+            items, key=lambda item: pd.Timestamp(item["properties"]["datetime"])
+        )
+        return [
+            sorted_items[start : start + batch_size]  # noqa: E203
+            for start in range(0, len(sorted_items), batch_size)
+        ]
+
+    @staticmethod
+    def _concat_batches(data_arrays: List[xr.DataArray]) -> xr.DataArray:
+        """concatenate the stacks of time-ordered batches lazily along the temporal dimension.
+        Items that have the same timestamp might be split across batches, so their slices are
+        merged as a mosaic
+
+        Args:
+            data_arrays (List[xr.DataArray]): one stack per batch
+
+        Returns:
+            xr.DataArray: stack of all batches
+        """
+        if len(data_arrays) == 1:
+            return data_arrays[0]
+        data_array = xr.concat(data_arrays, dim=STACKSTAC_TIME_DIMENSION)
+        return geospatial_utils.remove_repeated_time_coords(
+            data_array=data_array, time_dim=STACKSTAC_TIME_DIMENSION
+        )
+
+    def _create_gdal_env(self, session: Session) -> LayeredEnv:
+        """GDAL configuration options of the I/O profile plus the credentials of session"""
+        # accessing non-AWS s3 https://github.com/rasterio/rasterio/pull/1779
+        aws_session = AWSSession(
+            session=session,
+            endpoint_url=self.endpoint,
+        )
+        return gdal_io_profiles.get_gdal_env(profile=self.io_profile).updated(
+            always=dict(session=aws_session)
+        )
+
+    def _replace_hrefs(
+        self, items: List[Dict[str, Any]], assets: List[str], session: Session
+    ) -> List[Dict[str, Any]]:
+        """if COG_HEADER_CACHE_DIR is set, headers are read from the local cache instead of the
+        object storage"""
+        if COG_HEADER_CACHE_DIR is None:
+            return items
+        return cog_header_cache.replace_hrefs(
+            items=items,
+            assets=assets,
+            s3_client=session.client("s3", endpoint_url=self._get_endpoint_url()),
+        )
+
+    @staticmethod
+    def _get_grid(
+        bbox: Tuple[float, float, float, float], epsg: int, resolution: float
+    ) -> Tuple[Affine, int, int]:
+        """compute the output grid that stackstac creates, i.e., bbox reprojected to epsg and
+        snapped to multiples of resolution
+
+        Args:
+            bbox (Tuple[float, float, float, float]): west, south, east, north (EPSG:4326)
+            epsg (int): CRS of the output grid
+            resolution (float): resolution of the output grid
+
+        Returns:
+            Tuple[Affine, int, int]: transform, width and height
+        """
+        west, south, east, north = geospatial_utils.reproject_bbox(
+            bbox=bbox, dst_crs=epsg
+        )
+        west = np.floor(west / resolution) * resolution
+        south = np.floor(south / resolution) * resolution
+        east = np.ceil(east / resolution) * resolution
+        north = np.ceil(north / resolution) * resolution
+        width = max(1, int(round((east - west) / resolution)))
+        height = max(1, int(round((north - south) / resolution)))
+        transform = Affine(resolution, 0.0, west, 0.0, -resolution, north)
+        return transform, width, height
+
+    def _drill_pixels(
+        self,
+        item_by_bands: DefaultDict,
+        epsg: int,
+        transform: Affine,
+        width: int,
+        height: int,
+        dtype: np.dtype = np.dtype(np.float64),
+        nodata: Union[int, float] = np.nan,
+    ) -> xr.DataArray:
+        """read the few pixels of a small bbox from each asset concurrently and assemble them
+        into a data cube directly, without stackstac and dask. GDAL only fetches the tiles
+        that intersect the output grid. Assets that have the same timestamp are combined as a
+        mosaic, i.e., the first valid value of each pixel is kept in the order set by
+        COG_MOSAIC_ORDER
+
+        Args:
+            item_by_bands (DefaultDict): items grouped by band and CRS/resolution
+            epsg (int): CRS of the output grid
+            transform (Affine): transform of the output grid
+            width (int): width of the output grid
+            height (int): height of the output grid
+            dtype (np.dtype, optional): data type of the data cube. Defaults to float64
+            nodata (Union[int, float], optional): value of the missing pixels. Defaults to NaN
+
+        Returns:
+            xr.DataArray: data cube whose dimensions are time, bands, y, x
+        """
+        session = self._create_boto3_session()
+        # timestamp, band name and href of each asset
+        reads: List[Tuple[pd.Timestamp, str, str]] = list()
+        # precedence of each asset where assets that have the same timestamp overlap
+        keys: List[float] = list()
+        for band, items_grouped_by_crs_resolution in item_by_bands.items():
+            bands = [band] if band is not None else self.bands
+            assert bands is not None
+            for stac_items in items_grouped_by_crs_resolution.values():
+                for item in self._replace_hrefs(
+                    items=stac_items,
+                    assets=[CloudStorageFileReader.DATA] + bands,
+                    session=session,
+                ):
+                    assets_item: Dict[str, Any] = item["assets"]
+                    timestamp = pd.Timestamp(item["properties"]["datetime"])
+                    # same timestamps as the stackstac path, i.e., naive and in seconds
+                    if timestamp.tzinfo is not None:
+                        timestamp = timestamp.tz_convert(None)
+                    timestamp = timestamp.floor("s")
+                    key = (
+                        COGFileReader._get_cloud_cover(item=item)
+                        if COGFileReader._is_least_cloudy()
+                        else 0.0
+                    )
+                    if CloudStorageFileReader.DATA in assets_item.keys():
+                        href = assets_item[CloudStorageFileReader.DATA]["href"]
+                        reads.append((timestamp, bands[0], href))
+                        keys.append(key)
+                    else:
+                        for band_name in bands:
+                            if band_name in assets_item.keys():
+                                href = assets_item[band_name]["href"]
+                                reads.append((timestamp, band_name, href))
+                                keys.append(key)
+        # pixels of the assets that are copied first take precedence
+        reads = [reads[i] for i in np.argsort(keys, kind="stable")]
+        times = sorted({timestamp for timestamp, _, _ in reads})
+        band_names = list(dict.fromkeys(band_name for _, band_name, _ in reads))
+        time_index = {timestamp: index for index, timestamp in enumerate(times)}
+        band_index = {band_name: index for index, band_name in enumerate(band_names)}
+        logger.debug(f"Drilling {width}x{height} pixels from {len(reads)} assets")
+        data = np.full(
+            (len(times), len(band_names), height, width), nodata, dtype=dtype
+        )
+        gdal_env = self._create_gdal_env(session=session)
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(COG_PIXEL_DRILL_WORKERS, len(reads)))
+        ) as executor:
+            pixels = executor.map(
+                lambda read: COGFileReader._read_pixels(
+                    href=read[2],
+                    gdal_env=gdal_env,
+                    epsg=epsg,
+                    transform=transform,
+                    width=width,
+                    height=height,
+                    dtype=dtype,
+                    nodata=nodata,
+                ),
+                reads,
+            )
+            for (timestamp, band_name, _), values in zip(reads, pixels):
+                target = data[time_index[timestamp], band_index[band_name]]
+                np.copyto(
+                    target,
+                    values,
+                    where=geospatial_utils.is_nodata(values=target, nodata=nodata),
+                )
+        resolution = transform.a
+        data_array = xr.DataArray(
+            data,
+            coords={
+                STACKSTAC_TIME_DIMENSION: times,
+                DEFAULT_BANDS_DIMENSION: band_names,
+                # top-left corner of each pixel, as stackstac does
+                DEFAULT_Y_DIMENSION: transform.f - resolution * np.arange(height),
+                DEFAULT_X_DIMENSION: transform.c + resolution * np.arange(width),
+            },
+            dims=[
+                STACKSTAC_TIME_DIMENSION,
+                DEFAULT_BANDS_DIMENSION,
+                DEFAULT_Y_DIMENSION,
+                DEFAULT_X_DIMENSION,
+            ],
+        )
+        data_array.rio.write_crs(epsg, inplace=True)
+        if not np.isnan(nodata):
+            data_array.rio.write_nodata(nodata, encoded=False, inplace=True)
+        return data_array
+
+    @staticmethod
+    def _read_pixels(
+        href: str,
+        gdal_env: LayeredEnv,
+        epsg: int,
+        transform: Affine,
+        width: int,
+        height: int,
+        dtype: np.dtype = np.dtype(np.float64),
+        nodata: Union[int, float] = np.nan,
+    ) -> np.ndarray:
+        """read the output grid from the first band of href, missing pixels are nodata. As
+        stackstac does, the dataset is opened under the "open" options of gdal_env and read
+        under its "read" options"""
+        with ExitStack() as stack:
+            with gdal_env.open:
+                src = stack.enter_context(rasterio.open(href))
+                vrt = stack.enter_context(
+                    WarpedVRT(
+                        src,
+                        crs=CRS.from_epsg(epsg),
+                        transform=transform,
+                        width=width,
+                        height=height,
+                        resampling=Resampling.nearest,
+                    )
+                )
+            with gdal_env.read:
+                values = vrt.read(1, masked=True)
+        return values.astype(dtype).filled(nodata)
+
+    @staticmethod
+    def _get_dtype_and_nodata(
+        items: List[Dict[str, Any]], assets: List[str]
+    ) -> Tuple[np.dtype, Union[int, float]]:
+        """get the data type of the data cube and the value of its missing pixels, as set by
+        COG_DTYPE. Native data types are taken from raster:bands of the assets, which must all
+        have the same data type and nodata value, otherwise float32 is used
+
+        Args:
+            items (List[Dict[str, Any]]): STAC items
+            assets (List[str]): keys of the assets that will be read
+
+        Returns:
+            Tuple[np.dtype, Union[int, float]]: data type and nodata value
+        """
+        assert COG_DTYPE in [
+            "float64",
+            "float32",
+            "native",
+        ], f"Error! Invalid COG_DTYPE: {COG_DTYPE}"
+        if COG_DTYPE != "native":
+            return np.dtype(COG_DTYPE), np.nan
+        data_types = set()
+        nodata_values = set()
+        for item in items:
+            for asset in assets:
+                if asset in item["assets"].keys():
+                    raster_bands = item["assets"][asset].get("raster:bands") or [{}]
+                    data_types.add(raster_bands[0].get("data_type"))
+                    nodata_values.add(raster_bands[0].get("nodata"))
+        if (
+            len(data_types) != 1
+            or len(nodata_values) != 1
+            or None in data_types
+            or None in nodata_values
+        ):
+            logger.debug(
+                f"Loading as float32, because of {data_types=} {nodata_values=}"
+            )
+            return np.dtype(np.float32), np.nan
+        dtype = np.dtype(data_types.pop())
+        # STAC allows "nan", "inf" and "-inf" as nodata values
+        nodata = float(nodata_values.pop())
+        if np.issubdtype(dtype, np.floating):
+            # NaN is the nodata value of float data cubes
+            return dtype, np.nan
+        if not np.isfinite(nodata):
+            return np.dtype(np.float32), np.nan
+        return dtype, int(nodata)
+
     @staticmethod
     def _group_items_by_band(
         items: List[Dict[str, Any]],
@@ -0,0 +1,80 @@
+from typing import Dict, Optional
+
+import stackstac
+from stackstac.rio_env import LayeredEnv
+
+from tensorlakehouse_openeo_driver.constants import GDAL_IO_PROFILE
+
+# field of STAC collections that sets the profile used to read their assets
+GDAL_IO_PROFILE_FIELD = "tensorlakehouse:gdal_io_profile"
+# key of the batch job option that sets the profile used to read all collections
+GDAL_IO_PROFILE_JOB_OPTION = "gdal-io-profile"
+
+# GDAL configuration options of each profile. "always" options are set while datasets are
+# opened and read, "open" options only while they are opened and "read" options only while
+# they are read, as defined by stackstac.LayeredEnv
+GDAL_IO_PROFILES: Dict[str, LayeredEnv] = {
+    "default": stackstac.DEFAULT_GDAL_ENV,
+    # small reads over many files, e.g., time series of a small area
+    "latency": stackstac.DEFAULT_GDAL_ENV.updated(
+        always={
+            "GDAL_CACHEMAX": 256,
+            "GDAL_HTTP_MULTIPLEX": "YES",
+            "GDAL_HTTP_VERSION": "2",
+            "GDAL_HTTP_MAX_RETRY": 2,
+            "GDAL_HTTP_RETRY_DELAY": 0.5,
+        },
+        open={
+            # header and IFDs of most COGs are fetched by a single request
+            "GDAL_INGESTED_BYTES_AT_OPEN": 65536,
+            "VSI_CACHE": True,
+            "VSI_CACHE_SIZE": 16 * 1024**2,
+        },
+    ),
+    # large reads over few files, e.g., a large area at full resolution
+    "throughput": stackstac.DEFAULT_GDAL_ENV.updated(
+        always={
+            "GDAL_CACHEMAX": 1024,
+            "GDAL_HTTP_MULTIPLEX": "YES",
+            "GDAL_HTTP_VERSION": "2",
+            "GDAL_HTTP_MAX_RETRY": 5,
+            "GDAL_HTTP_RETRY_DELAY": 1,
+            "GDAL_NUM_THREADS": "ALL_CPUS",
+            "CPL_VSIL_CURL_CHUNK_SIZE": 2 * 1024**2,
+            "CPL_VSIL_CURL_CACHE_SIZE": 512 * 1024**2,
+        },
+        read={
+            "VSI_CACHE": True,
+            "VSI_CACHE_SIZE": 128 * 1024**2,
+        },
+    ),
+    # workers whose memory is scarce
+    "low-memory": stackstac.DEFAULT_GDAL_ENV.updated(
+        always={
+            "GDAL_CACHEMAX": 64,
+            "GDAL_HTTP_MULTIPLEX": "YES",
+            "GDAL_HTTP_MAX_RETRY": 3,
+            "GDAL_HTTP_RETRY_DELAY": 1,
+            "CPL_VSIL_CURL_CACHE_SIZE": 16 * 1024**2,
+        },
+        open={"VSI_CACHE": False},
+        read={"VSI_CACHE": False},
+    ),
+}
+
+
+def get_gdal_env(profile: Optional[str] = None) -> LayeredEnv:
+    """get the GDAL configuration options of an I/O profile
+
+    Args:
+        profile (Optional[str], optional): profile name. Defaults to GDAL_IO_PROFILE
+
+    Returns:
+        LayeredEnv: GDAL configuration options used by stackstac
+    """
+    if profile is None:
+        profile = GDAL_IO_PROFILE
+    assert (
+        profile in GDAL_IO_PROFILES
+    ), f"Error! Unknown GDAL I/O profile: {profile}. Valid profiles: {list(GDAL_IO_PROFILES)}"
+    return GDAL_IO_PROFILES[profile]
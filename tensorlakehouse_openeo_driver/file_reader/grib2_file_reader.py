@@ -2,7 +2,6 @@ from pathlib import Path
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 from tensorlakehouse_openeo_driver.constants import (
-    DEFAULT_BANDS_DIMENSION,
     DEFAULT_X_DIMENSION,
     DEFAULT_Y_DIMENSION,
     TENSORLAKEHOUSE_OPENEO_DRIVER_DATA_DIR,
@@ -15,11 +14,8 @@ import uuid
 import pandas as pd
 import xarray as xr
 import cfgrib
-from tensorlakehouse_openeo_driver.geospatial_utils import (
-    clip_box,
-    filter_by_time,
-    reproject_bbox,
-)
+from tensorlakehouse_openeo_driver.geospatial_utils import filter_by_time
+from tensorlakehouse_openeo_driver.util import kerchunk_references
 from urllib.parse import urlparse
 
 
@@ -136,7 +132,12 @@ class Grib2FileReader(CloudStorageFileReader):
             # href field can be either URL (a link to a file on COS) or a path to a local file
             path_or_url = asset_value["href"]
             parse_url = urlparse(path_or_url)
-            if parse_url.scheme == "":
+            references_href = kerchunk_references.get_references_href(item=item)
+            if references_href is not None:
+                # the messages of the file are merged as variables of a single dataset, whose
+                # chunks are read only if they are selected
+                datasets = [self._open_references(href=references_href)]
+            elif parse_url.scheme == "":
                 path = Path(path_or_url)
                 assert path.exists(), f"Error! File does not exist: {path_or_url}"
                 hex_code = uuid.uuid4().hex
@@ -193,18 +194,14 @@ class Grib2FileReader(CloudStorageFileReader):
                     # drop dimensions that are not required
                     extra_dim_filter = self.get_extra_dimensions_filter()
                     ds = ds.sel(extra_dim_filter)
-                    # if bands is already one of the dimensions, use default 'variable'
-                    if DEFAULT_BANDS_DIMENSION in dict(ds.dims).keys():
-                        da = ds.to_array()
-                    else:
-                        # else export array using bands
-                        da = ds.to_array(dim=DEFAULT_BANDS_DIMENSION)
+                    # clip and filter by time before items are concatenated
+                    da = self._subset_item(ds=ds, item=item)
 
                     # add temporal dimension if it does not exist on dataarray
 
                     if time_dim is None:
                         raise ValueError(f"Error! {item=}")
-                    elif time_dim not in da.dims:
+                    elif da is not None and time_dim not in da.dims:
                         dt_str = item["properties"].get("datetime")
                         timestamps = pd.to_datetime([pd.Timestamp(dt_str)])
 
@@ -212,7 +209,12 @@ class Grib2FileReader(CloudStorageFileReader):
             assert (
                 found
             ), f"Error! Unable to find data that contains all {self.bands} variables all {self.get_extra_dimensions_filter()}"
-            data_arrays.append(da)
+            if da is not None:
+                data_arrays.append(da)
+        if len(data_arrays) == 0:
+            raise ValueError(
+                f"Error! No item has a timestamp within {self.temporal_extent=}"
+            )
         # get temporal dimension name from an arbitrary item. Assumption that all items
         # have the same temporal dimension name
 
@@ -222,21 +224,9 @@ class Grib2FileReader(CloudStorageFileReader):
             data_array = xr.concat(data_arrays, dim=time_dim)
         else:
             data_array = data_arrays.pop()
-        # filter by area of interest
-        assert isinstance(crs_code, int), f"Error! Invalid type: {crs_code=}"
-        reprojected_bbox = reproject_bbox(
-            bbox=self.bbox, src_crs=4326, dst_crs=crs_code
-        )
-        assert x_dim is not None
-        assert y_dim is not None
-        da = clip_box(
-            data=data_array,
-            bbox=reprojected_bbox,
-            x_dim=x_dim,
-            y_dim=y_dim,
-            crs=crs_code,
-        )
-        # remove timestamps that have not been selected by end-user
+        # remove timestamps that have not been selected by end-user, e.g., the datetime of
+        # items that have no temporal dimension
+        da = data_array
         if time_dim is not None and time_dim in da.dims:
             da = filter_by_time(
                 data=da, temporal_extent=self.temporal_extent, temporal_dim=time_dim
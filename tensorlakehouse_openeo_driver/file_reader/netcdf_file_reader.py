@@ -1,20 +1,13 @@
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
-from tensorlakehouse_openeo_driver.constants import (
-    DEFAULT_BANDS_DIMENSION,
-    DEFAULT_X_DIMENSION,
-    DEFAULT_Y_DIMENSION,
-)
+from tensorlakehouse_openeo_driver.constants import NETCDF_BLOCK_SIZE
 from tensorlakehouse_openeo_driver.file_reader.cloud_storage_file_reader import (
     CloudStorageFileReader,
 )
 import xarray as xr
 
-from tensorlakehouse_openeo_driver.geospatial_utils import (
-    clip_box,
-    filter_by_time,
-    reproject_bbox,
-)
+from tensorlakehouse_openeo_driver.geospatial_utils import filter_by_time
+from tensorlakehouse_openeo_driver.util import kerchunk_references
 from urllib.parse import urlparse
 import pandas as pd
 
@@ -41,6 +34,46 @@ class NetCDFFileReader(CloudStorageFileReader):
         url = f"s3://{self.bucket}/{path}"
         return url
 
+    @staticmethod
+    def _open_remote_dataset(file_obj: Any) -> xr.Dataset:
+        """open a remote NetCDF file lazily. NetCDF4 (HDF5) files are opened by h5netcdf and
+        chunked as they are stored, so that each dask chunk reads a single chunk of the file.
+        NetCDF3 files are opened by scipy
+
+        Args:
+            file_obj (Any): file-like object
+
+        Returns:
+            xr.Dataset: dataset
+        """
+        signature = file_obj.read(len(kerchunk_references.HDF5_SIGNATURE))
+        file_obj.seek(0)
+        if signature != kerchunk_references.HDF5_SIGNATURE:
+            return xr.open_dataset(file_obj, engine="scipy")
+        ds = xr.open_dataset(file_obj, engine="h5netcdf")
+        return ds.chunk(NetCDFFileReader._get_internal_chunks(ds=ds))
+
+    @staticmethod
+    def _get_internal_chunks(ds: xr.Dataset) -> Dict[str, int]:
+        """get the size of the internal chunks of the file along each dimension, as reported by
+        the backend (encoding["chunksizes"]). Variables that share a dimension but have
+        different chunks are aligned to the smallest one, contiguous dimensions are not chunked
+
+        Args:
+            ds (xr.Dataset): dataset opened by h5netcdf
+
+        Returns:
+            Dict[str, int]: chunk size of each chunked dimension
+        """
+        chunks: Dict[str, int] = dict()
+        for variable in ds.data_vars.values():
+            chunksizes = variable.encoding.get("chunksizes")
+            if chunksizes is None:
+                continue
+            for dim, size in zip(variable.dims, chunksizes):
+                chunks[str(dim)] = min(size, chunks.get(str(dim), size))
+        return chunks
+
     def load_items(self) -> xr.DataArray:
         """load items that are associated with netcdf files
 
@@ -58,22 +91,23 @@ class NetCDFFileReader(CloudStorageFileReader):
             # href field can be either URL (a link to a file on COS) or a path to a local file
             path_or_url = asset_value["href"]
             parse_url = urlparse(path_or_url)
-            if parse_url.scheme == "":
+            references_href = kerchunk_references.get_references_href(item=item)
+            if references_href is not None:
+                # only the chunks that are selected are read
+                ds = self._open_references(href=references_href)
+            elif parse_url.scheme == "":
                 ds = xr.open_dataset(path_or_url, engine="netcdf4")
             else:
                 s3fs = self.create_s3filesystem()
-                s3_file_obj = s3fs.open(path_or_url, mode="rb")
-                ds = xr.open_dataset(s3_file_obj, engine="scipy")
-            # get dimension names
-            x_dim = CloudStorageFileReader._get_dimension_name(
-                item=item, axis=DEFAULT_X_DIMENSION
-            )
-            y_dim = CloudStorageFileReader._get_dimension_name(
-                item=item, axis=DEFAULT_Y_DIMENSION
-            )
-            time_dim = CloudStorageFileReader._get_dimension_name(
-                item=item, dim_type="temporal"
-            )
+                # blocks are fetched on demand and kept, because HDF5 reads metadata and chunks
+                # at scattered offsets
+                s3_file_obj = s3fs.open(
+                    path_or_url,
+                    mode="rb",
+                    cache_type="blockcache",
+                    block_size=NETCDF_BLOCK_SIZE,
+                )
+                ds = NetCDFFileReader._open_remote_dataset(file_obj=s3_file_obj)
             # get CRS
             crs_code = CloudStorageFileReader._get_epsg(item=item)
             if ds.rio.crs is None:
@@ -84,12 +118,10 @@ class NetCDFFileReader(CloudStorageFileReader):
             # drop bands that were not required
             ds = ds[self.bands]
             ds = self._filter_by_extra_dimensions(ds)
-            # if bands is already one of the dimensions, use default 'variable'
-            if DEFAULT_BANDS_DIMENSION in dict(ds.dims).keys():
-                da = ds.to_array()
-            else:
-                # else export array using bands
-                da = ds.to_array(dim=DEFAULT_BANDS_DIMENSION)
+            # clip and filter by time before items are concatenated
+            da = self._subset_item(ds=ds, item=item)
+            if da is None:
+                continue
             # add temporal dimension if it does not exist on dataarray
             time_dim = CloudStorageFileReader._get_dimension_name(
                 item=item, dim_type="temporal"
@@ -102,25 +134,18 @@ class NetCDFFileReader(CloudStorageFileReader):
 
                 da = da.expand_dims({time_dim: [dt]})
             data_arrays.append(da)
+        if len(data_arrays) == 0:
+            raise ValueError(
+                f"Error! No item has a timestamp within {self.temporal_extent=}"
+            )
         if len(data_arrays) > 1:
             # concatenate all xarray.DataArray objects
             data_array = xr.concat(data_arrays, dim=time_dim)
         else:
             data_array = data_arrays.pop()
-        # filter by area of interest
-        assert isinstance(crs_code, int), f"Error! Invalid type: {crs_code=}"
-        reprojected_bbox = reproject_bbox(
-            bbox=self.bbox, src_crs=4326, dst_crs=crs_code
-        )
-        assert x_dim is not None and y_dim is not None
-        da = clip_box(
-            data=data_array,
-            bbox=reprojected_bbox,
-            x_dim=x_dim,
-            y_dim=y_dim,
-            crs=crs_code,
-        )
-        # remove timestamps that have not been selected by end-user
+        # remove timestamps that have not been selected by end-user, e.g., the datetime of
+        # items that have no temporal dimension
+        da = data_array
         if time_dim is not None:
             da = filter_by_time(
                 data=da, temporal_extent=self.temporal_extent, temporal_dim=time_dim
@@ -2,22 +2,13 @@ from pathlib import Path
 import warnings
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
-from tensorlakehouse_openeo_driver.constants import (
-    DEFAULT_BANDS_DIMENSION,
-    DEFAULT_X_DIMENSION,
-    DEFAULT_Y_DIMENSION,
-    logger,
-)
+from tensorlakehouse_openeo_driver.constants import logger
 from tensorlakehouse_openeo_driver.file_reader.cloud_storage_file_reader import (
     CloudStorageFileReader,
 )
 import xarray as xr
 
-from tensorlakehouse_openeo_driver.geospatial_utils import (
-    clip_box,
-    filter_by_time,
-    reproject_bbox,
-)
+from tensorlakehouse_openeo_driver.geospatial_utils import filter_by_time
 
 
 class FSTDFileReader(CloudStorageFileReader):
@@ -79,12 +70,6 @@ class FSTDFileReader(CloudStorageFileReader):
                 buffer = fstd2nc.Buffer(file_path, forecast_axis=True)
                 ds = buffer.to_xarray()
                 # get dimension names
-                x_dim = CloudStorageFileReader._get_dimension_name(
-                    item=item, axis=DEFAULT_X_DIMENSION
-                )
-                y_dim = CloudStorageFileReader._get_dimension_name(
-                    item=item, axis=DEFAULT_Y_DIMENSION
-                )
                 time_dim = CloudStorageFileReader._get_dimension_name(
                     item=item, dim_type="temporal"
                 )
@@ -97,32 +82,22 @@ class FSTDFileReader(CloudStorageFileReader):
                 ), f"Error! not all bands={self.bands} are in ds={list(ds)}"
                 # drop bands that were not required
                 ds = ds[self.bands]
-                # if bands is already one of the dimensions, use default 'variable'
-                if DEFAULT_BANDS_DIMENSION in dict(ds.dims).keys():
-                    da = ds.to_array()
-                else:
-                    # else export array using bands
-                    da = ds.to_array(dim=DEFAULT_BANDS_DIMENSION)
-                data_arrays.append(da)
+                # clip and filter by time before items are concatenated
+                da = self._subset_item(ds=ds, item=item)
+                if da is not None:
+                    data_arrays.append(da)
+        if len(data_arrays) == 0:
+            raise ValueError(
+                f"Error! No item has a timestamp within {self.temporal_extent=}"
+            )
         if len(data_arrays) > 1:
             # concatenate all xarray.DataArray objects
             data_array = xr.concat(data_arrays, dim=time_dim)
         else:
             data_array = data_arrays.pop()
-        # filter by area of interest
-        assert isinstance(crs_code, int), f"Error! Invalid type: {crs_code=}"
-        reprojected_bbox = reproject_bbox(
-            bbox=self.bbox, src_crs=4326, dst_crs=crs_code
-        )
-        assert x_dim is not None and y_dim is not None
-        da = clip_box(
-            data=data_array,
-            bbox=reprojected_bbox,
-            x_dim=x_dim,
-            y_dim=y_dim,
-            crs=crs_code,
-        )
-        # remove timestamps that have not been selected by end-user
+        # remove timestamps that have not been selected by end-user, e.g., the datetime of
+        # items that have no temporal dimension
+        da = data_array
         if time_dim is not None:
             da = filter_by_time(
                 data=da, temporal_extent=self.temporal_extent, temporal_dim=time_dim
@@ -1,9 +1,14 @@
-from typing import Any, Dict, List, Optional, Tuple
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, DefaultDict, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
 import xarray as xr
 from tensorlakehouse_openeo_driver.constants import (
     DEFAULT_BANDS_DIMENSION,
     DEFAULT_X_DIMENSION,
     DEFAULT_Y_DIMENSION,
+    ZARR_OPEN_WORKERS,
 )
 
 import os
@@ -14,6 +19,8 @@ from tensorlakehouse_openeo_driver.file_reader.cloud_storage_file_reader import
 )
 from tensorlakehouse_openeo_driver.geospatial_utils import (
     filter_by_time,
+    mosaic,
+    remove_repeated_time_coords,
     reproject_bbox,
 )
 
@@ -42,24 +49,64 @@ class ZarrFileReader(CloudStorageFileReader):
     def load_items(
         self,
     ) -> xr.DataArray:
-        """create a raster datacube by loading zarr store
+        """create a raster datacube by loading zarr stores. Stores are opened concurrently and
+        each one is subset before they are combined: items that cover the same area are
+        concatenated along the temporal dimension and items that cover different areas are
+        combined as a mosaic
 
         Returns:
             xr.DataArray: raster datacube
         """
+        assert len(self.items) > 0, "Error! There is no item to load"
+        epsg_codes = {
+            CloudStorageFileReader._get_epsg(item=item) for item in self.items
+        }
         assert (
-            len(self.items) == 1
-        ), f"Error! Number of items must be 1, got: {len(self.items)}"
-        item = self.items[0]
+            len(epsg_codes) == 1
+        ), f"Error! All zarr items must have the same CRS, got: {epsg_codes}"
+        fs = self.create_s3filesystem()
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(ZARR_OPEN_WORKERS, len(self.items)))
+        ) as executor:
+            arrays = list(
+                executor.map(lambda item: self._load_item(item=item, fs=fs), self.items)
+            )
+        if len(arrays) == 1:
+            return arrays[0]
+        t_axis_name = CloudStorageFileReader._get_dimension_name(
+            item=self.items[0], dim_type="temporal"
+        )
+        if t_axis_name is None or t_axis_name not in arrays[0].dims:
+            return mosaic(data_arrays=arrays)
+        # items that have the same footprint are the time slices of the same area
+        arrays_by_footprint: DefaultDict[Tuple, List[xr.DataArray]] = defaultdict(list)
+        for item, array in zip(self.items, arrays):
+            arrays_by_footprint[tuple(item.get("bbox") or [])].append(array)
+        time_series = list()
+        for footprint_arrays in arrays_by_footprint.values():
+            array = xr.concat(footprint_arrays, dim=t_axis_name).sortby(t_axis_name)
+            time_series.append(
+                remove_repeated_time_coords(data_array=array, time_dim=t_axis_name)
+            )
+        return mosaic(data_arrays=time_series)
+
+    def _load_item(self, item: Dict[str, Any], fs: Any) -> xr.DataArray:
+        """open the zarr store of an item and select the bands, time range and bbox
+
+        Args:
+            item (Dict[str, Any]): STAC item
+            fs (Any): s3fs filesystem
+
+        Returns:
+            xr.DataArray: lazy data array
+        """
         assets: Dict[str, Any] = item["assets"]
         assert isinstance(assets, dict)
         asset_value = next(iter(assets.values()))
         href = asset_value["href"]
         s3_link = self._convert_https_to_s3(url=href)
-        fs = self.create_s3filesystem()
         store = fs.get_mapper(s3_link)
-        # store = s3fs.S3Map(root=s3_link, s3=fs)
-        dataset = xr.open_zarr(store=store)
+        dataset = ZarrFileReader._open_zarr(store=store, href=href)
 
         t_axis_name = CloudStorageFileReader._get_dimension_name(
             item=item, dim_type="temporal"
@@ -71,30 +118,123 @@ class ZarrFileReader(CloudStorageFileReader):
             item=item, axis=DEFAULT_Y_DIMENSION
         )
 
-        array = dataset[self.bands]
-        array = array.to_array(dim=DEFAULT_BANDS_DIMENSION)
-        # filter by temporal_extent
-        if t_axis_name is not None:
-            array = filter_by_time(
-                data=array,
-                temporal_extent=self.temporal_extent,
-                temporal_dim=t_axis_name,
-            )
-
-        # Filter by spatial extent
+        # crop is computed from the coordinates and applied before bands are stacked, so that
+        # the dask graph only has the chunks that intersect the request
+        assert x_axis_name is not None and y_axis_name is not None
+        dataset = dataset[self.bands]
         crs_code = CloudStorageFileReader._get_epsg(item=item)
         assert isinstance(
             crs_code, int
         ), f"Error! crs_code is not an int: {type(crs_code)}"
-        reprojected_bbox = reproject_bbox(
+        west, south, east, north = reproject_bbox(
             bbox=self.bbox, src_crs=4326, dst_crs=crs_code
         )
         epsilon = 1e-8
-        array = array.loc[
-            {x_axis_name: slice(reprojected_bbox[0], reprojected_bbox[2] + epsilon)}
-        ]
-        array = array.loc[
-            {y_axis_name: slice(reprojected_bbox[1], reprojected_bbox[3] + epsilon)}
-        ]
+        indexers: Dict[str, slice] = {
+            x_axis_name: ZarrFileReader._get_index_slice(
+                coords=dataset[x_axis_name].values, start=west, end=east + epsilon
+            ),
+            y_axis_name: ZarrFileReader._get_index_slice(
+                coords=dataset[y_axis_name].values, start=south, end=north + epsilon
+            ),
+        }
+        filter_time = t_axis_name is not None and t_axis_name in dataset.dims
+        if filter_time and np.issubdtype(dataset[t_axis_name].dtype, np.datetime64):
+            indexers[t_axis_name] = ZarrFileReader._get_time_slice(
+                times=dataset[t_axis_name].values, temporal_extent=self.temporal_extent
+            )
+            filter_time = False
+        dataset = dataset.isel(indexers)
+        array = dataset.to_array(dim=DEFAULT_BANDS_DIMENSION)
+        # other calendars (e.g., 360-day) are filtered by converting each timestamp
+        if filter_time:
+            assert t_axis_name is not None
+            array = filter_by_time(
+                data=array,
+                temporal_extent=self.temporal_extent,
+                temporal_dim=t_axis_name,
+            )
         assert isinstance(array, xr.DataArray)
         return array
+
+    @staticmethod
+    def _get_index_slice(coords: np.ndarray, start: float, end: float) -> slice:
+        """compute the integer slice of the coordinates that are within [start, end] using
+        binary search
+
+        Args:
+            coords (np.ndarray): sorted coordinates, either ascending or descending
+            start (float): lower bound
+            end (float): upper bound
+
+        Returns:
+            slice: positional slice
+        """
+        if len(coords) > 1 and coords[0] > coords[-1]:
+            # e.g., y coordinates of north-up grids
+            size = len(coords)
+            reversed_coords = coords[::-1]
+            return slice(
+                size - int(np.searchsorted(reversed_coords, end, side="right")),
+                size - int(np.searchsorted(reversed_coords, start, side="left")),
+            )
+        return slice(
+            int(np.searchsorted(coords, start, side="left")),
+            int(np.searchsorted(coords, end, side="right")),
+        )
+
+    @staticmethod
+    def _get_time_slice(
+        times: np.ndarray, temporal_extent: Tuple[datetime, Optional[datetime]]
+    ) -> slice:
+        """compute the integer slice of the timestamps within temporal_extent using binary
+        search, as filter_by_time does but without converting each timestamp. Naive datetimes
+        are UTC
+
+        Args:
+            times (np.ndarray): sorted datetime64 timestamps
+            temporal_extent (Tuple[datetime, Optional[datetime]]): start and end datetime
+
+        Returns:
+            slice: positional slice
+        """
+        assert len(times) > 0, "Error! temporal dimension is empty"
+        bounds = list()
+        for dt in temporal_extent:
+            if dt is None:
+                bounds.append(None)
+                continue
+            ts = pd.Timestamp(dt)
+            if ts.tzinfo is not None:
+                ts = ts.tz_convert(None)
+            bounds.append(ts.to_datetime64())
+        start, end = bounds
+        start_index = int(np.searchsorted(times, start, side="left"))
+        end_index = (
+            len(times)
+            if end is None
+            else int(np.searchsorted(times, end, side="right"))
+        )
+        # same as filter_by_time, which keeps the next timestamp if none is selected
+        if start_index == end_index:
+            return slice(start_index, start_index + 1)
+        return slice(start_index, end_index)
+
+    @staticmethod
+    def _open_zarr(store: Any, href: str) -> xr.Dataset:
+        """open a zarr store using its consolidated metadata (.zmetadata), which has the
+        metadata of all arrays, so that .zarray and .zattrs keys are not fetched one by one.
+        Stores that have no consolidated metadata are opened by listing their keys
+
+        Args:
+            store (Any): mapping of the zarr store
+            href (str): link to the store, used for logging
+
+        Returns:
+            xr.Dataset: lazy dataset
+        """
+        try:
+            return xr.open_zarr(store=store, consolidated=True)
+        except KeyError:
+            logger.debug(f"Zarr store has no consolidated metadata: {href}")
+            return xr.open_zarr(store=store, consolidated=False)
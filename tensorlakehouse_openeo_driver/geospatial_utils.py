@@ -1,6 +1,5 @@
-from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union, DefaultDict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 import numpy as np
 import pyproj
 import xarray as xr
@@ -16,16 +15,16 @@ import pytz
 
 
 def clip_box(
-    data: xr.DataArray,
+    data: Union[xr.DataArray, xr.Dataset],
     bbox: Tuple[float, float, float, float],
     x_dim: str,
     y_dim: str,
     crs: Optional[int] = 4326,
-) -> xr.DataArray:
+) -> Union[xr.DataArray, xr.Dataset]:
     """filter out data that is not within bbox
 
     Args:
-        data (xr.Dataset): data cube obtained from COS
+        data (Union[xr.DataArray, xr.Dataset]): data cube obtained from COS
         bbox (List[float]): area of interest (west, south, east, north)
         crs (int): reference system
         items (List[Item]): list of STAC items
@@ -158,6 +157,47 @@ def filter_by_time(
         data = data.convert_calendar(
             calendar="gregorian", dim=temporal_dim, align_on="year", use_cftime=False
         )
+    start_index, end_index = _get_time_indices(
+        data=data, temporal_extent=temporal_extent, temporal_dim=temporal_dim
+    )
+    if start_index == end_index:
+        data = data.isel({temporal_dim: [start_index]})
+    else:
+        data = data.isel({temporal_dim: slice(start_index, end_index)})
+    return data
+
+
+def has_timestamps_within(
+    data: Union[xr.DataArray, xr.Dataset],
+    temporal_extent: Tuple[datetime, Optional[datetime]],
+    temporal_dim: str,
+) -> bool:
+    """check whether at least one timestamp of data is within temporal_extent
+
+    Args:
+        data (Union[xr.DataArray, xr.Dataset]): datacube
+        temporal_extent (Tuple[datetime, Optional[datetime]]): start and end datetime
+        temporal_dim (str): name of the temporal dimension
+
+    Returns:
+        bool: True if filter_by_time selects timestamps within temporal_extent
+    """
+    if isinstance(data[temporal_dim].values[0], Datetime360Day):
+        data = data.convert_calendar(
+            calendar="gregorian", dim=temporal_dim, align_on="year", use_cftime=False
+        )
+    start_index, end_index = _get_time_indices(
+        data=data, temporal_extent=temporal_extent, temporal_dim=temporal_dim
+    )
+    return start_index < end_index
+
+
+def _get_time_indices(
+    data: Union[xr.DataArray, xr.Dataset],
+    temporal_extent: Tuple[datetime, Optional[datetime]],
+    temporal_dim: str,
+) -> Tuple[int, int]:
+    """compute the positional interval [start, end) of the timestamps within temporal_extent"""
     start_datetime = temporal_extent[0]
     end_datetime = temporal_extent[1]
     ts = data[temporal_dim].values
@@ -175,37 +215,165 @@ def filter_by_time(
     timestamps = _convert_to_datetime(datetime_index=ts)
     start_index = bisect.bisect_left(timestamps, start_datetime)
     end_index = bisect.bisect_right(timestamps, end_datetime)
-    if start_index == end_index:
-        data = data.isel({temporal_dim: [start_index]})
+    return start_index, end_index
+
+
+def mosaic(
+    data_arrays: List[xr.DataArray], order: Optional[Sequence[float]] = None
+) -> xr.DataArray:
+    """combine data arrays that cover the same or different areas into a single data array.
+    Where they overlap, the value of the first data array that is not missing (NaN or the nodata
+    value) is used, as a chain of combine_first would do, but in a single blockwise operation
+    that allocates one output per chunk
+
+    Args:
+        data_arrays (List[xr.DataArray]): data arrays that have the same dimensions
+        order (Optional[Sequence[float]], optional): sort key of each data array, arrays with
+            lower keys take precedence, e.g., eo:cloud_cover to pick the least cloudy pixel.
+            Defaults to None, i.e., the order of data_arrays
+
+    Returns:
+        xr.DataArray: mosaic
+    """
+    assert len(data_arrays) > 0, "Error! data_arrays is empty"
+    if order is not None:
+        assert len(order) == len(
+            data_arrays
+        ), f"Error! order has {len(order)} keys but there are {len(data_arrays)} data arrays"
+        # stable sort keeps the original order of arrays that have the same key
+        indices = np.argsort(np.asarray(order), kind="stable")
+        data_arrays = [data_arrays[i] for i in indices]
+    if len(data_arrays) == 1:
+        return data_arrays[0]
+    nodata = get_nodata(data_array=data_arrays[0])
+    if nodata is None:
+        aligned = xr.align(*data_arrays, join="outer")
     else:
-        data = data.isel({temporal_dim: slice(start_index, end_index)})
-    return data
+        # areas that are not covered by an array are filled with nodata to keep the data type
+        aligned = xr.align(*data_arrays, join="outer", fill_value=nodata)
+    dtype = np.result_type(*[a.dtype for a in aligned])
+    # arrays that cannot hold NaN and have no nodata value have no gaps, so the first one is
+    # the mosaic
+    if nodata is None and not np.issubdtype(dtype, np.floating):
+        return aligned[0]
+    return xr.apply_ufunc(
+        _first_valid,
+        *aligned,
+        kwargs={"nodata": nodata},
+        dask="parallelized",
+        output_dtypes=[dtype],
+        keep_attrs="override",
+    )
+
+
+def _first_valid(*blocks: np.ndarray, nodata: Optional[float] = None) -> np.ndarray:
+    """fill the missing values of the first block with the values of the next blocks"""
+    out = np.array(blocks[0], dtype=np.result_type(*blocks), copy=True)
+    for block in blocks[1:]:
+        missing = is_nodata(values=out, nodata=nodata)
+        if not missing.any():
+            break
+        np.copyto(out, block, where=missing)
+    return out
+
+
+def is_nodata(values: np.ndarray, nodata: Optional[float] = None) -> np.ndarray:
+    """boolean mask of the missing values, i.e., NaN or values equal to nodata"""
+    if nodata is None or np.isnan(nodata):
+        if np.issubdtype(values.dtype, np.floating):
+            return np.isnan(values)
+        return np.zeros(values.shape, dtype=bool)
+    return values == nodata
+
+
+def get_nodata(data_array: xr.DataArray) -> Optional[float]:
+    """get the value that marks missing pixels of a data array whose data type cannot hold NaN,
+    e.g., a data cube loaded with COG_DTYPE=native
+
+    Args:
+        data_array (xr.DataArray): data array
+
+    Returns:
+        Optional[float]: nodata value or None if missing pixels are NaN
+    """
+    nodata = data_array.rio.nodata
+    if nodata is None or np.isnan(nodata):
+        return None
+    return nodata
+
+
+def mask_nodata(data_array: xr.DataArray) -> xr.DataArray:
+    """replace the nodata values of a data array by NaN, so that processes that are not aware of
+    nodata values (e.g., mean) skip them. Integers of up to 16 bits are converted to float32 and
+    larger ones to float64. The operation is lazy if data_array is backed by dask
+
+    Args:
+        data_array (xr.DataArray): data array
+
+    Returns:
+        xr.DataArray: data array whose missing values are NaN
+    """
+    nodata = get_nodata(data_array=data_array)
+    if nodata is None:
+        return data_array
+    if np.issubdtype(data_array.dtype, np.floating):
+        dtype = data_array.dtype
+    elif data_array.dtype.itemsize <= 2:
+        # float32 represents all integers of up to 16 bits exactly
+        dtype = np.dtype(np.float32)
+    else:
+        dtype = np.dtype(np.float64)
+    masked = data_array.astype(dtype).where(data_array != nodata)
+    return masked.rio.write_nodata(np.nan, encoded=False)
 
 
 def remove_repeated_time_coords(
-    data_array: xr.DataArray, time_dim: str = DEFAULT_TIME_DIMENSION
+    data_array: xr.DataArray,
+    time_dim: str = DEFAULT_TIME_DIMENSION,
+    order: Optional[Sequence[float]] = None,
 ) -> xr.DataArray:
     """Squeeze duplicate timestamps into unique timestamps.
-    This function keeps the time dimension but merges duplicate timestamps by backward filling nan values.
+    This function keeps the time dimension but merges the slices of duplicate timestamps as a
+    mosaic, i.e., NaN values of a slice are filled with the values of the next slices.
+
+    Slices are not merged one timestamp at a time. Instead, duplicates are grouped by a single
+    factorization of the time labels and the k-th slice of every group is selected at once, so
+    that the mosaic of these layers is a single blockwise operation whose cost depends on the
+    max number of duplicates of a timestamp rather than on the number of timestamps
+
+    Args:
+        data_array (xr.DataArray): data array that may have duplicate timestamps
+        time_dim (str, optional): name of the time dimension. Defaults to DEFAULT_TIME_DIMENSION.
+        order (Optional[Sequence[float]], optional): sort key of each time slice, slices with
+            lower keys take precedence, e.g., eo:cloud_cover. Defaults to None, i.e., the first
+            slice takes precedence
+
+    Returns:
+        xr.DataArray: data array with unique timestamps
     """
     assert time_dim in data_array.dims, f"Error! {time_dim} is not in {data_array.dims}"
+    # timestamps keep the order of their first occurrence
+    codes, unique_times = pd.factorize(data_array[time_dim].values)
     # if there is no repeated timestamp, return same array
-    if len(set(data_array[time_dim].values)) == len(data_array[time_dim].values):
+    if len(unique_times) == len(codes):
         return data_array
+    if order is None:
+        keys = np.arange(len(codes))
     else:
-        array_by_time: DefaultDict = defaultdict(list)
-        for index, t in enumerate(data_array[time_dim].values):
-            slice_array = data_array.isel({time_dim: index})
-            if t in array_by_time.keys():
-                array_by_time[t] = array_by_time[t].combine_first(slice_array)
-            else:
-                array_by_time[t] = slice_array
-        # print('length of concat list', len(arr_timestamp_lst))
-        arr: xr.DataArray = xr.concat(
-            array_by_time.values(), dim=time_dim, compat="override", coords="minimal"
-        )
-
-        return arr
+        assert len(order) == len(
+            codes
+        ), f"Error! order has {len(order)} keys but there are {len(codes)} time slices"
+        keys = np.asarray(order)
+    # indices sorted by timestamp and, within each timestamp, by precedence (stable)
+    sorted_indices = np.lexsort((keys, codes))
+    counts = np.bincount(codes, minlength=len(unique_times))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    layers: List[xr.DataArray] = list()
+    for rank in range(int(counts.max())):
+        # timestamps that have fewer slices repeat their last one, which changes nothing
+        positions = starts + np.minimum(rank, counts - 1)
+        layers.append(data_array.isel({time_dim: sorted_indices[positions]}))
+    return mosaic(data_arrays=layers)
 
 
 def remove_files_in_dir(dir_path: Path, prefix: str, suffix: str):
@@ -326,6 +494,44 @@ def reproject_bbox(
     return (repr_minx, repr_miny, repr_maxx, repr_maxy)
 
 
+def reproject_resolution(
+    resolution: float,
+    bbox: Tuple[float, float, float, float],
+    dst_crs: Union[int, str],
+    src_crs: Union[int, str],
+) -> float:
+    """convert a resolution given in src_crs to the units of dst_crs, measured at the
+    center of bbox
+
+    Args:
+        resolution (float): resolution in the units of src_crs
+        bbox (Tuple[float, float, float, float]): west, south, east, north (EPSG:4326)
+        dst_crs (Union[int, str]): destination CRS
+        src_crs (Union[int, str]): CRS of resolution
+
+    Returns:
+        float: finest of the x and y resolutions in the units of dst_crs
+    """
+    crs_from: CRS = _get_epsg(crs_code=src_crs)
+    crs_to: CRS = _get_epsg(crs_code=dst_crs)
+    if crs_from.to_epsg() == crs_to.to_epsg():
+        return resolution
+    west, south, east, north = bbox
+    center_x, center_y = pyproj.Transformer.from_crs(
+        crs_from=4326, crs_to=crs_from, always_xy=True
+    ).transform((west + east) / 2, (south + north) / 2)
+    transformer = pyproj.Transformer.from_crs(
+        crs_from=crs_from, crs_to=crs_to, always_xy=True
+    )
+    xs, ys = transformer.transform(
+        [center_x, center_x + resolution, center_x],
+        [center_y, center_y, center_y + resolution],
+    )
+    x_resolution = float(np.hypot(xs[1] - xs[0], ys[1] - ys[0]))
+    y_resolution = float(np.hypot(xs[2] - xs[0], ys[2] - ys[0]))
+    return min(x_resolution, y_resolution)
+
+
 def _get_epsg(crs_code: Union[str, int]) -> CRS:
     if isinstance(crs_code, str):
         crs_code = int(crs_code.split(":")[1])
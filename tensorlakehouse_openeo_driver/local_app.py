@@ -16,7 +16,13 @@ from tensorlakehouse_openeo_driver.tensorlakehouse_backend import (
 # from openeo_driver.server import run_gunicorn
 from openeo_driver.util.logging import get_logging_config, setup_logging, show_log_level
 from openeo_driver.views import OpenEoApiApp, build_app
+from tensorlakehouse_openeo_driver.util import cog_header_cache
+from tensorlakehouse_openeo_driver.views import (
+    register_views_explain,
+    register_views_search_cache,
+)
 from tensorlakehouse_openeo_driver.constants import (
+    COG_HEADER_CACHE_DIR,
     DASK_SCHEDULER_ADDRESS,
     TENSORLAKEHOUSE_OPENEO_DRIVER_PORT,
     STAC_URL,
@@ -53,6 +59,18 @@ def make_dask_client() -> Client:
     return client
 
 
+def check_cog_header_cache_dir() -> None:
+    """if the COG header cache is enabled, check that its directory is shared with all dask
+    workers, which open the cached headers"""
+    if COG_HEADER_CACHE_DIR is None:
+        return
+    client = make_dask_client()
+    try:
+        cog_header_cache.check_cache_dir(client=client, root=COG_HEADER_CACHE_DIR)
+    finally:
+        client.close()
+
+
 def create_app(environment: str = "production") -> OpenEoApiApp:
     # "create_app" factory for Flask Application discovery
     # see https://flask.palletsprojects.com/en/2.1.x/cli/#application-discovery
@@ -64,7 +82,13 @@ def create_app(environment: str = "production") -> OpenEoApiApp:
         "dev",
         "production",
     ], f"Error! Invalid environment: {environment}"
-    app = build_app(backend_implementation=TensorLakeHouseBackendImplementation())
+    check_cog_header_cache_dir()
+    backend_implementation = TensorLakeHouseBackendImplementation()
+    app = build_app(backend_implementation=backend_implementation)
+
+    register_views_explain(app=app, backend_implementation=backend_implementation)
+    register_views_search_cache(app=app)
+
     app.config.from_mapping(
         OPENEO_TITLE="GeoDN Backend compliant with OpenEO",
         OPENEO_DESCRIPTION="GeoDN Backend compliant with OpenEO",
@@ -0,0 +1,359 @@
+import copy
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pyproj
+from shapely.geometry import shape
+from shapely.ops import unary_union
+
+from tensorlakehouse_openeo_driver.constants import logger
+
+LOAD_COLLECTION = "load_collection"
+FILTER_BBOX = "filter_bbox"
+FILTER_TEMPORAL = "filter_temporal"
+FILTER_BANDS = "filter_bands"
+FILTER_SPATIAL = "filter_spatial"
+RESAMPLE_SPATIAL = "resample_spatial"
+
+
+def optimize_process_graph(process_graph: Dict[str, Any]) -> Dict[str, Any]:
+    """apply all optimizations to a process graph. Synchronous and batch processing run the
+    graph returned by this function, so it must also be used to plan or explain them
+
+    Args:
+        process_graph (Dict[str, Any]): flat process graph, optionally wrapped in
+            {"process_graph": ...}
+
+    Returns:
+        Dict[str, Any]: optimized copy of the process graph
+    """
+    # resample_spatial is pushed down after the filters, because folding a filter may make
+    # resample_spatial a direct consumer of load_collection
+    process_graph = push_down_filters(process_graph=process_graph)
+    return push_down_resolution(process_graph=process_graph)
+
+
+def push_down_filters(process_graph: Dict[str, Any]) -> Dict[str, Any]:
+    """fold filter_bbox, filter_temporal and filter_bands nodes that consume a load_collection
+    node into the arguments of load_collection, so that only the data that survives the filters
+    is searched and read. filter_spatial nodes are kept, because they mask pixels outside the
+    geometries, but the spatial_extent of load_collection is narrowed to the geometries' bounds
+
+    A filter is folded only if load_collection has no other consumer, otherwise the other
+    consumers would receive filtered data
+
+    Args:
+        process_graph (Dict[str, Any]): flat process graph, optionally wrapped in
+            {"process_graph": ...}
+
+    Returns:
+        Dict[str, Any]: optimized copy of the process graph
+    """
+    process_graph = copy.deepcopy(process_graph)
+    if "process_graph" in process_graph:
+        process_graph["process_graph"] = _push_down_filters(
+            nodes=process_graph["process_graph"]
+        )
+        return process_graph
+    return _push_down_filters(nodes=process_graph)
+
+
+def _push_down_filters(nodes: Dict[str, Any]) -> Dict[str, Any]:
+    # folding a filter may enable folding the next one, e.g., filter_bands(filter_bbox(load))
+    folded = True
+    while folded:
+        folded = False
+        for node_id, node in list(nodes.items()):
+            process_id = node["process_id"]
+            if process_id not in [
+                FILTER_BBOX,
+                FILTER_TEMPORAL,
+                FILTER_BANDS,
+                FILTER_SPATIAL,
+            ]:
+                continue
+            data = node["arguments"].get("data")
+            if not isinstance(data, dict) or "from_node" not in data:
+                continue
+            load_id = data["from_node"]
+            load_node = nodes.get(load_id)
+            if load_node is None or load_node["process_id"] != LOAD_COLLECTION:
+                continue
+            if _count_references(nodes=nodes, node_id=load_id) != 1:
+                continue
+            arguments = _fold(
+                process_id=process_id,
+                filter_arguments=node["arguments"],
+                load_arguments=load_node["arguments"],
+            )
+            if arguments is None:
+                continue
+            logger.debug(f"Folding {node_id} ({process_id}) into {load_id}")
+            if process_id == FILTER_SPATIAL:
+                # filter_spatial is kept, only the extent of load_collection is narrowed
+                if arguments != load_node["arguments"]:
+                    load_node["arguments"] = arguments
+                    folded = True
+                continue
+            load_node["arguments"] = arguments
+            _remove_node(nodes=nodes, node_id=node_id, replacement_id=load_id)
+            folded = True
+    return nodes
+
+
+def push_down_resolution(process_graph: Dict[str, Any]) -> Dict[str, Any]:
+    """pass the resolution of resample_spatial nodes that consume a load_collection node to
+    load_collection as target_resolution and target_epsg, so that the loader can read coarser
+    data (e.g., COG overviews) instead of full-resolution data. resample_spatial is kept, because
+    it produces the exact output grid
+
+    Args:
+        process_graph (Dict[str, Any]): flat process graph, optionally wrapped in
+            {"process_graph": ...}
+
+    Returns:
+        Dict[str, Any]: optimized copy of the process graph
+    """
+    process_graph = copy.deepcopy(process_graph)
+    nodes = process_graph.get("process_graph", process_graph)
+    for node_id, node in nodes.items():
+        if node["process_id"] != RESAMPLE_SPATIAL:
+            continue
+        arguments = node["arguments"]
+        data = arguments.get("data")
+        if not isinstance(data, dict) or "from_node" not in data:
+            continue
+        load_id = data["from_node"]
+        load_node = nodes.get(load_id)
+        if load_node is None or load_node["process_id"] != LOAD_COLLECTION:
+            continue
+        if _count_references(nodes=nodes, node_id=load_id) != 1:
+            continue
+        if _has_reference(arguments, exclude="data"):
+            continue
+        resolution = _get_target_resolution(resolution=arguments.get("resolution"))
+        if resolution is None:
+            continue
+        projection = arguments.get("projection")
+        epsg: Optional[int] = None
+        if projection is not None:
+            try:
+                epsg = pyproj.CRS.from_user_input(projection).to_epsg()
+            except pyproj.exceptions.CRSError:
+                epsg = None
+            if epsg is None:
+                continue
+        logger.debug(f"Passing resolution of {node_id} to {load_id}: {resolution=}")
+        load_node["arguments"]["target_resolution"] = resolution
+        load_node["arguments"]["target_epsg"] = epsg
+    return process_graph
+
+
+def _get_target_resolution(resolution: Any) -> Optional[float]:
+    """finest resolution of resample_spatial or None if the resolution is not changed"""
+    if isinstance(resolution, list):
+        if len(resolution) == 0:
+            return None
+        resolutions = resolution
+    else:
+        resolutions = [resolution]
+    if not all(isinstance(r, (int, float)) and r > 0 for r in resolutions):
+        return None
+    return float(min(resolutions))
+
+
+def _fold(
+    process_id: str,
+    filter_arguments: Dict[str, Any],
+    load_arguments: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    """compute the arguments of load_collection after the filter is folded into it
+
+    Args:
+        process_id (str): process ID of the filter
+        filter_arguments (Dict[str, Any]): arguments of the filter
+        load_arguments (Dict[str, Any]): arguments of load_collection
+
+    Returns:
+        Optional[Dict[str, Any]]: new arguments or None if the filter cannot be folded
+    """
+    # arguments that depend on parameters are only known at runtime
+    if _has_reference(filter_arguments, exclude="data") or _has_reference(
+        load_arguments
+    ):
+        return None
+    arguments = copy.deepcopy(load_arguments)
+    if process_id == FILTER_BBOX:
+        spatial_extent = _intersect_extents(
+            load_arguments.get("spatial_extent"), filter_arguments["extent"]
+        )
+        if spatial_extent is None:
+            return None
+        arguments["spatial_extent"] = spatial_extent
+    elif process_id == FILTER_SPATIAL:
+        extent = _get_geometries_extent(geometries=filter_arguments["geometries"])
+        if extent is None:
+            return None
+        spatial_extent = _intersect_extents(
+            load_arguments.get("spatial_extent"), extent
+        )
+        if spatial_extent is None:
+            return None
+        arguments["spatial_extent"] = spatial_extent
+    elif process_id == FILTER_TEMPORAL:
+        temporal_extent = _intersect_intervals(
+            load_arguments.get("temporal_extent"), filter_arguments["extent"]
+        )
+        if temporal_extent is None:
+            return None
+        arguments["temporal_extent"] = temporal_extent
+    elif process_id == FILTER_BANDS:
+        bands: Optional[List[str]] = filter_arguments.get("bands")
+        # wavelengths require band metadata, so they are not folded
+        if bands is None or filter_arguments.get("wavelengths") is not None:
+            return None
+        load_bands: Optional[List[str]] = load_arguments.get("bands")
+        # filter_bands fails if a band was not loaded, so that error is kept
+        if load_bands is not None and not set(bands).issubset(load_bands):
+            return None
+        arguments["bands"] = list(bands)
+    return arguments
+
+
+def _intersect_extents(
+    load_extent: Optional[Dict[str, Any]], filter_extent: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """intersect two bounding boxes that share the same CRS. The intersection of disjoint
+    bounding boxes is not folded, because STAC would read west > east as a bounding box that
+    crosses the antimeridian, i.e., data on the other side of the globe would be loaded
+
+    Returns:
+        Optional[Dict[str, Any]]: intersection or None if CRSs are different, either bounding
+            box crosses the antimeridian or the intersection is empty
+    """
+    if any(
+        extent is not None
+        and (extent["west"] > extent["east"] or extent["south"] > extent["north"])
+        for extent in [load_extent, filter_extent]
+    ):
+        return None
+    if load_extent is None:
+        return dict(filter_extent)
+    if _get_crs(load_extent) != _get_crs(filter_extent):
+        return None
+    extent = dict(load_extent)
+    extent["west"] = max(load_extent["west"], filter_extent["west"])
+    extent["south"] = max(load_extent["south"], filter_extent["south"])
+    extent["east"] = min(load_extent["east"], filter_extent["east"])
+    extent["north"] = min(load_extent["north"], filter_extent["north"])
+    if extent["west"] > extent["east"] or extent["south"] > extent["north"]:
+        logger.debug(f"Bounding boxes are disjoint: {load_extent=} {filter_extent=}")
+        return None
+    return extent
+
+
+def _get_crs(extent: Dict[str, Any]) -> str:
+    crs = extent.get("crs")
+    # openEO's default CRS is EPSG:4326
+    if crs is None or str(crs).upper() in ["4326", "EPSG:4326"]:
+        return "4326"
+    return str(crs).upper()
+
+
+def _intersect_intervals(
+    load_interval: Optional[List[Optional[str]]], filter_interval: List[Optional[str]]
+) -> Optional[List[Optional[str]]]:
+    """intersect two temporal intervals whose bounds may be open (null). Intervals are
+    left-closed and right-open, so the intersection is None if start is not before end
+    """
+    if load_interval is None:
+        return list(filter_interval)
+    load_start, load_end = load_interval
+    filter_start, filter_end = filter_interval
+    if load_start is None:
+        start = filter_start
+    elif filter_start is None:
+        start = load_start
+    else:
+        start = max(load_start, filter_start, key=pd.Timestamp)
+    if load_end is None:
+        end = filter_end
+    elif filter_end is None:
+        end = load_end
+    else:
+        end = min(load_end, filter_end, key=pd.Timestamp)
+    if (
+        start is not None
+        and end is not None
+        and pd.Timestamp(start) >= pd.Timestamp(end)
+    ):
+        logger.debug(f"Intervals are disjoint: {load_interval=} {filter_interval=}")
+        return None
+    return [start, end]
+
+
+def _get_geometries_extent(geometries: Any) -> Optional[Dict[str, Any]]:
+    """compute the bounding box of GeoJSON geometries (EPSG:4326)"""
+    if not isinstance(geometries, dict) or "type" not in geometries:
+        return None
+    if geometries["type"] == "FeatureCollection":
+        shapes = [shape(f["geometry"]) for f in geometries["features"]]
+    elif geometries["type"] == "Feature":
+        shapes = [shape(geometries["geometry"])]
+    else:
+        shapes = [shape(geometries)]
+    if len(shapes) == 0:
+        return None
+    west, south, east, north = unary_union(shapes).bounds
+    return {"west": west, "south": south, "east": east, "north": north, "crs": 4326}
+
+
+def _has_reference(value: Any, exclude: Optional[str] = None) -> bool:
+    """check whether value has from_node or from_parameter references"""
+    if isinstance(value, dict):
+        if "from_node" in value or "from_parameter" in value:
+            return True
+        return any(
+            _has_reference(v)
+            for k, v in value.items()
+            if k != exclude and k != "process_graph"
+        )
+    if isinstance(value, list):
+        return any(_has_reference(v) for v in value)
+    return False
+
+
+def _count_references(nodes: Dict[str, Any], node_id: str) -> int:
+    def _count(value: Any) -> int:
+        if isinstance(value, dict):
+            if value.get("from_node") == node_id:
+                return 1
+            # nested process graphs have their own nodes
+            return sum(_count(v) for k, v in value.items() if k != "process_graph")
+        if isinstance(value, list):
+            return sum(_count(v) for v in value)
+        return 0
+
+    return sum(_count(node["arguments"]) for node in nodes.values())
+
+
+def _remove_node(nodes: Dict[str, Any], node_id: str, replacement_id: str) -> None:
+    """remove node and make its consumers point to replacement_id"""
+
+    def _replace(value: Any) -> Any:
+        if isinstance(value, dict):
+            if value.get("from_node") == node_id:
+                return {"from_node": replacement_id}
+            return {
+                k: (_replace(v) if k != "process_graph" else v)
+                for k, v in value.items()
+            }
+        if isinstance(value, list):
+            return [_replace(v) for v in value]
+        return value
+
+    removed = nodes.pop(node_id)
+    if removed.get("result", False):
+        nodes[replacement_id]["result"] = True
+    for node in nodes.values():
+        node["arguments"] = _replace(node["arguments"])
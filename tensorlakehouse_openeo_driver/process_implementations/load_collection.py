@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
 from collections import defaultdict
-from datetime import datetime
-from typing import Any, DefaultDict, Dict, List, Optional, Tuple, Union
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import json
+from typing import Any, DefaultDict, Dict, Iterator, List, Optional, Tuple, Union
 from openeo_pg_parser_networkx.pg_schema import (
     BoundingBox,
     TemporalInterval,
@@ -14,15 +16,33 @@ from tensorlakehouse_openeo_driver.constants import (
     JPG2000_MEDIA_TYPE,
     NETCDF_MEDIA_TYPE,
     STAC_DATETIME_FORMAT,
+    STAC_SEARCH_CACHE_MAX_ITEMS,
+    STAC_SEARCH_CACHE_REDIS_URL,
+    STAC_SEARCH_CACHE_TTL,
+    STAC_SEARCH_CACHE_TTL_BY_COLLECTION,
+    STAC_SEARCH_MAX_CONCURRENCY,
+    STAC_SEARCH_PARTITION_DAYS,
+    STAC_SEARCH_PARTITION_DEGREES,
+    STAC_SEARCH_PAGE_SIZE,
+    STAC_SEARCH_STREAMING,
+    STAC_SEARCH_STREAMING_WORKERS,
     STAC_URL,
     ZIP_ZARR_MEDIA_TYPE,
     FSTD_MEDIA_TYPE,
     logger,
 )
+import numpy as np
 import pandas as pd
 import pyproj
 from pyproj import Transformer
-from tensorlakehouse_openeo_driver.file_reader.cog_file_reader import COGFileReader
+from tensorlakehouse_openeo_driver import geospatial_utils, stac_geoparquet
+from tensorlakehouse_openeo_driver.file_reader.cloud_storage_file_reader import (
+    CloudStorageFileReader,
+)
+from tensorlakehouse_openeo_driver.file_reader.cog_file_reader import (
+    CLOUD_COVER_PROPERTY,
+    COGFileReader,
+)
 from tensorlakehouse_openeo_driver.file_reader.netcdf_file_reader import (
     NetCDFFileReader,
 )
@@ -31,12 +51,105 @@ from tensorlakehouse_openeo_driver.file_reader.standard_file_reader import (
 )
 from tensorlakehouse_openeo_driver.file_reader.zarr_file_reader import ZarrFileReader
 from tensorlakehouse_openeo_driver.file_reader.grib2_file_reader import Grib2FileReader
+from tensorlakehouse_openeo_driver.stac import get_stac_client
+from tensorlakehouse_openeo_driver.util.cache import TTLCache
 
 # from tensorlakehouse_openeo_driver.file_reader.standard_file_reader import (
 #     FSTDFileReader,
 # )
 from openeo_pg_parser_networkx.pg_schema import ParameterReference
 
+FileReader = Union[
+    COGFileReader,
+    ZarrFileReader,
+    NetCDFFileReader,
+    Grib2FileReader,
+    FSTDFileReader,
+]
+
+# results of STAC item searches, the size of each entry is the number of items
+_search_cache = TTLCache(
+    max_size=STAC_SEARCH_CACHE_MAX_ITEMS,
+    ttl=STAC_SEARCH_CACHE_TTL,
+    sizeof=lambda value: len(value[1]),
+)
+# redis hash that maps collection IDs to the number of times their search results have been
+# invalidated, the field "*" counts invalidations of all collections
+SEARCH_CACHE_VERSIONS_KEY = "tensorlakehouse:stac-search-cache:versions"
+ALL_COLLECTIONS = "*"
+_redis_client = None
+
+
+def _get_redis_client():
+    """get the redis client shared by the whole process or None if STAC_SEARCH_CACHE_REDIS_URL
+    is not set"""
+    global _redis_client
+    if STAC_SEARCH_CACHE_REDIS_URL is None:
+        return None
+    if _redis_client is None:
+        import redis
+
+        _redis_client = redis.Redis.from_url(
+            STAC_SEARCH_CACHE_REDIS_URL, socket_timeout=1, socket_connect_timeout=1
+        )
+    return _redis_client
+
+
+def _get_search_cache_version(collection_id: str) -> Optional[Tuple[Any, ...]]:
+    """get the version of the search results of the collection, which changes whenever any
+    process invalidates them
+
+    Returns:
+        Optional[Tuple[Any, ...]]: version or None if redis is not set or not available
+    """
+    redis_client = _get_redis_client()
+    if redis_client is None:
+        return None
+    try:
+        return tuple(
+            redis_client.hmget(
+                SEARCH_CACHE_VERSIONS_KEY, [ALL_COLLECTIONS, collection_id]
+            )
+        )
+    except Exception as e:
+        # cached results still expire after their TTL
+        logger.warning(f"Unable to get version of search cache: {e}")
+        return None
+
+
+def invalidate_search_cache(collection_id: Optional[str] = None) -> Dict[str, Any]:
+    """remove cached search results of the specified collection. If STAC_SEARCH_CACHE_REDIS_URL
+    is set, the results cached by other processes are invalidated too. Ingestion should call it
+    (via POST /search_cache/invalidate) after adding items to a collection, so that the next
+    load_collection sees them
+
+    Args:
+        collection_id (Optional[str], optional): collection ID. If None, clear the whole cache
+
+    Returns:
+        Dict[str, Any]: number of search results removed from the cache of this process
+            (removed), whether other processes have been notified (broadcast) and the reason
+            why they could not be notified (error), if any
+    """
+    # the cache of this process is cleared even if redis is not available
+    removed = _search_cache.invalidate(tag=collection_id)
+    logger.debug(f"Search cache invalidated: {collection_id=} {removed=}")
+    result: Dict[str, Any] = {"removed": removed, "broadcast": False}
+    redis_client = _get_redis_client()
+    if redis_client is not None:
+        try:
+            redis_client.hincrby(
+                SEARCH_CACHE_VERSIONS_KEY,
+                ALL_COLLECTIONS if collection_id is None else collection_id,
+                1,
+            )
+            result["broadcast"] = True
+        except Exception as e:
+            # other processes serve their cached results until they expire
+            logger.error(f"Unable to invalidate search cache of other processes: {e}")
+            result["error"] = str(e)
+    return result
+
 
 class AbstractLoadCollection(ABC):
     @abstractmethod
@@ -48,6 +161,9 @@ class AbstractLoadCollection(ABC):
         bands: List[str],
         dimensions: Dict[str, str],
         properties=None,
+        target_resolution: Optional[float] = None,
+        target_epsg: Optional[int] = None,
+        io_profile: Optional[str] = None,
     ) -> xr.DataArray:
         raise NotImplementedError()
 
@@ -88,8 +204,30 @@ class LoadCollectionFromCOS(AbstractLoadCollection):
         bands: List[str],
         dimensions: Dict[str, str],
         properties: Optional[Dict[str, Any]] = {},
+        target_resolution: Optional[float] = None,
+        target_epsg: Optional[int] = None,
+        io_profile: Optional[str] = None,
     ) -> xr.DataArray:
+        """load the items that match the search criteria as a data cube
+
+        Args:
+            target_resolution (Optional[float], optional): resolution to which the data cube
+                will be resampled, e.g., by resample_spatial, which allows COGs to be read from
+                overviews. Defaults to None
+            target_epsg (Optional[int], optional): CRS of target_resolution. Defaults to None
+            io_profile (Optional[str], optional): name of the GDAL I/O profile used to read
+                COGs. Defaults to None, i.e., GDAL_IO_PROFILE
+
+        Returns:
+            xr.DataArray: data cube
+        """
         logger.debug(f"load collection from COS: id={id} bands={bands}")
+        # parameters of COGFileReader, other readers ignore them
+        cog_kwargs = {
+            "target_resolution": target_resolution,
+            "target_epsg": target_epsg,
+            "io_profile": io_profile,
+        }
         bbox_wsg84 = LoadCollectionFromCOS._convert_to_WSG84(
             spatial_extent=spatial_extent
         )
@@ -102,6 +240,16 @@ class LoadCollectionFromCOS(AbstractLoadCollection):
         else:
             end = None
         temporal_ext = (start, end)
+        if STAC_SEARCH_STREAMING:
+            return self._load_collection_streaming(
+                id=id,
+                bbox=bbox_wsg84,
+                temporal_extent=temporal_extent,
+                temporal_ext=temporal_ext,
+                bands=bands,
+                properties=properties,
+                **cog_kwargs,
+            )
         item_search = self._search_items(
             bbox=bbox_wsg84,
             temporal_extent=temporal_extent,
@@ -111,101 +259,544 @@ class LoadCollectionFromCOS(AbstractLoadCollection):
         items_by_media_type = LoadCollectionFromCOS._group_items_by_media_type(
             items=item_search, bands=bands
         )
+        if len(items_by_media_type) == 1:
+            media_type, items = next(iter(items_by_media_type.items()))
+            reader = LoadCollectionFromCOS._create_reader(
+                media_type=media_type,
+                items=items,
+                bbox=bbox_wsg84,
+                bands=bands,
+                temporal_extent=temporal_ext,
+                properties=properties,
+                **cog_kwargs,
+            )
+            return reader.load_items()
+        # each media type is loaded by its own reader, concurrently
+        logger.debug(f"Loading media types: {list(items_by_media_type.keys())}")
+        time_dims: List[Optional[str]] = list()
+        with ThreadPoolExecutor(max_workers=len(items_by_media_type)) as executor:
+            futures = list()
+            for media_type, items in items_by_media_type.items():
+                futures.append(
+                    executor.submit(
+                        LoadCollectionFromCOS._load_page,
+                        media_type=media_type,
+                        items=items,
+                        bbox=bbox_wsg84,
+                        bands=bands,
+                        temporal_extent=temporal_ext,
+                        properties=properties,
+                        **cog_kwargs,
+                    )
+                )
+                time_dims.append(
+                    CloudStorageFileReader._get_dimension_name(
+                        item=items[0], dim_type="temporal"
+                    )
+                )
+            data_arrays = [future.result() for future in futures]
+        return LoadCollectionFromCOS._merge_cubes(
+            data_arrays=data_arrays, time_dims=time_dims
+        )
+
+    def _load_collection_streaming(
+        self,
+        id: str,
+        bbox: Tuple[float, float, float, float],
+        temporal_extent: TemporalInterval,
+        temporal_ext: Tuple[datetime, Optional[datetime]],
+        bands: List[str],
+        properties: Optional[Dict[str, Any]],
+        target_resolution: Optional[float] = None,
+        target_epsg: Optional[int] = None,
+        io_profile: Optional[str] = None,
+    ) -> xr.DataArray:
+        """search items page by page and hand each page over to a reader as soon as it arrives,
+        so that creating readers and opening the first assets overlap with the requests for the
+        remaining pages
+
+        Returns:
+            xr.DataArray: pages concatenated along the temporal dimension
+        """
+        futures_by_media_type: DefaultDict[str, List[Future]] = defaultdict(list)
+        time_dim_by_media_type: Dict[str, Optional[str]] = dict()
+        # COG pages must share the output grid, so it is set by the first page
+        grid: Optional[Tuple[int, float]] = None
+        with ThreadPoolExecutor(max_workers=STAC_SEARCH_STREAMING_WORKERS) as executor:
+            for page in self._search_item_pages(
+                bbox=bbox,
+                temporal_extent=temporal_extent,
+                collection_id=id,
+                properties=properties,
+                streaming=True,
+            ):
+                items_by_media_type = LoadCollectionFromCOS._group_items_by_media_type(
+                    items=page, bands=bands
+                )
+                for media_type, items in items_by_media_type.items():
+                    reader_kwargs: Dict[str, Any] = dict()
+                    if media_type in [COG_MEDIA_TYPE, JPG2000_MEDIA_TYPE]:
+                        if grid is None:
+                            epsg, resolution = COGFileReader._get_most_frequent_crs(
+                                crs_resolution_list=[
+                                    (
+                                        CloudStorageFileReader._get_epsg(item=item),
+                                        CloudStorageFileReader._get_resolution(
+                                            item=item
+                                        ),
+                                    )
+                                    for item in items
+                                ]
+                            )
+                            grid = (
+                                epsg,
+                                COGFileReader._get_overview_resolution(
+                                    bbox=bbox,
+                                    epsg=epsg,
+                                    resolution=resolution,
+                                    target_resolution=target_resolution,
+                                    target_epsg=target_epsg,
+                                ),
+                            )
+                        reader_kwargs = {
+                            "epsg": grid[0],
+                            "resolution": grid[1],
+                            "io_profile": io_profile,
+                        }
+                    logger.debug(
+                        f"Loading page of {len(items)} items: media_type={media_type}"
+                    )
+                    future = executor.submit(
+                        LoadCollectionFromCOS._load_page,
+                        media_type=media_type,
+                        items=items,
+                        bbox=bbox,
+                        bands=bands,
+                        temporal_extent=temporal_ext,
+                        properties=properties,
+                        **reader_kwargs,
+                    )
+                    futures_by_media_type[media_type].append(future)
+                    time_dim_by_media_type[media_type] = (
+                        CloudStorageFileReader._get_dimension_name(
+                            item=items[0], dim_type="temporal"
+                        )
+                    )
+            # pages of the same media type are concatenated and then media types are merged
+            media_types = list(futures_by_media_type.keys())
+            data_arrays = [
+                LoadCollectionFromCOS._concat_pages(
+                    data_arrays=[f.result() for f in futures_by_media_type[media_type]],
+                    time_dim=time_dim_by_media_type[media_type],
+                )
+                for media_type in media_types
+            ]
+        return LoadCollectionFromCOS._merge_cubes(
+            data_arrays=data_arrays,
+            time_dims=[
+                time_dim_by_media_type[media_type] for media_type in media_types
+            ],
+        )
+
+    @staticmethod
+    def _load_page(
+        media_type: str,
+        items: List[Dict[str, Any]],
+        bbox: Tuple[float, float, float, float],
+        bands: List[str],
+        temporal_extent: Tuple[datetime, Optional[datetime]],
+        properties: Optional[Dict[str, Any]],
+        **kwargs,
+    ) -> xr.DataArray:
+        reader = LoadCollectionFromCOS._create_reader(
+            media_type=media_type,
+            items=items,
+            bbox=bbox,
+            bands=bands,
+            temporal_extent=temporal_extent,
+            properties=properties,
+            **kwargs,
+        )
+        return reader.load_items()
+
+    @staticmethod
+    def _concat_pages(
+        data_arrays: List[xr.DataArray], time_dim: Optional[str]
+    ) -> xr.DataArray:
+        """concatenate data arrays loaded from different pages of the same search
+
+        Args:
+            data_arrays (List[xr.DataArray]): one data array per page
+            time_dim (Optional[str]): name of the temporal dimension
+
+        Returns:
+            xr.DataArray: data cube sorted by time
+        """
+        assert len(data_arrays) > 0, "Error! No page has been loaded"
+        if len(data_arrays) == 1:
+            return data_arrays[0]
         assert (
-            len(items_by_media_type) == 1
-        ), "Error! Current implementation supports only loading items that have the same media\
-                  type. For instance, if some of the selected items are associated with COG files \
-                      and other with parquet files, it will raise an exception"
+            time_dim is not None and time_dim in data_arrays[0].dims
+        ), f"Error! Unable to concatenate pages: {time_dim=} dims={data_arrays[0].dims}"
+        data_array = xr.concat(data_arrays, dim=time_dim).sortby(time_dim)
+        # items of the same timestamp might be split across pages
+        data_array = geospatial_utils.remove_repeated_time_coords(
+            data_array=data_array, time_dim=time_dim
+        )
+        return data_array
+
+    @staticmethod
+    def _merge_cubes(
+        data_arrays: List[xr.DataArray], time_dims: List[Optional[str]]
+    ) -> xr.DataArray:
+        """merge cubes loaded from different media types. Cubes are aligned onto the grid of
+        the largest cube, whose name of the temporal dimension is given to all cubes, and
+        concatenated along the temporal dimension. Bands that are missing in some cubes are
+        filled with NaN. Alignment is lazy
+
+        Args:
+            data_arrays (List[xr.DataArray]): one data array per media type
+            time_dims (List[Optional[str]]): name of the temporal dimension of each data array
 
-        media_type = next(iter(items_by_media_type.keys()))
-        items = next(iter(items_by_media_type.values()))
+        Returns:
+            xr.DataArray: merged data cube
+        """
+        assert len(data_arrays) > 0, "Error! No cube has been loaded"
+        assert len(data_arrays) == len(
+            time_dims
+        ), f"Error! Expected one time dimension per cube: {time_dims=}"
+        if len(data_arrays) == 1:
+            return data_arrays[0]
+        index = max(
+            range(len(data_arrays)),
+            key=lambda i: data_arrays[i].rio.width * data_arrays[i].rio.height,
+        )
+        # the temporal dimension of the reference cube is used, or the first one if it has none
+        time_dim = time_dims[index]
+        if time_dim is None:
+            time_dim = next((dim for dim in time_dims if dim is not None), None)
+        data_arrays = [
+            (
+                data_array.rename({dim: time_dim})
+                if dim is not None and dim != time_dim and dim in data_array.dims
+                else data_array
+            )
+            for data_array, dim in zip(data_arrays, time_dims)
+        ]
+        reference = data_arrays[index]
+        x_dim, y_dim = reference.rio.x_dim, reference.rio.y_dim
+        aligned = list()
+        for data_array in data_arrays:
+            if data_array is not reference:
+                if (
+                    data_array.rio.crs is not None
+                    and reference.rio.crs is not None
+                    and data_array.rio.crs != reference.rio.crs
+                ):
+                    data_array = LoadCollectionFromCOS._regrid(
+                        data_array=data_array, reference=reference
+                    )
+                else:
+                    # reference pixels outside of the pixels of data_array are set to NaN
+                    resolution = max(abs(r) for r in data_array.rio.resolution())
+                    data_array = data_array.reindex(
+                        {x_dim: reference[x_dim], y_dim: reference[y_dim]},
+                        method="nearest",
+                        tolerance=resolution / 2,
+                    )
+            aligned.append(data_array)
+        return LoadCollectionFromCOS._concat_pages(
+            data_arrays=aligned, time_dim=time_dim
+        )
+
+    @staticmethod
+    def _regrid(data_array: xr.DataArray, reference: xr.DataArray) -> xr.DataArray:
+        """lazily resample data_array onto the grid of reference, which has another CRS, by
+        nearest neighbor. The source pixel of each reference pixel is computed from the
+        coordinates only, so dask arrays are indexed without being loaded
+
+        Args:
+            data_array (xr.DataArray): cube on a regular grid
+            reference (xr.DataArray): cube whose grid and CRS are used
+
+        Returns:
+            xr.DataArray: data_array on the grid of reference, NaN outside of data_array
+        """
+        x_dim, y_dim = data_array.rio.x_dim, data_array.rio.y_dim
+        ref_x_dim, ref_y_dim = reference.rio.x_dim, reference.rio.y_dim
+        ref_x, ref_y = np.meshgrid(
+            reference[ref_x_dim].values, reference[ref_y_dim].values
+        )
+        transformer = Transformer.from_crs(
+            reference.rio.crs, data_array.rio.crs, always_xy=True
+        )
+        x, y = transformer.transform(ref_x, ref_y)
+        # fractional column and row of each reference pixel in the grid of data_array
+        cols, rows = ~data_array.rio.transform() * (x, y)
+        cols = np.floor(cols)
+        rows = np.floor(rows)
+        inside = (
+            (cols >= 0)
+            & (cols < data_array.rio.width)
+            & (rows >= 0)
+            & (rows < data_array.rio.height)
+        )
+        dims = [ref_y_dim, ref_x_dim]
+        regridded = data_array.isel(
+            {
+                y_dim: xr.DataArray(
+                    np.clip(rows, 0, data_array.rio.height - 1).astype(int), dims=dims
+                ),
+                x_dim: xr.DataArray(
+                    np.clip(cols, 0, data_array.rio.width - 1).astype(int), dims=dims
+                ),
+            }
+        )
+        regridded = regridded.where(xr.DataArray(inside, dims=dims))
+        regridded = regridded.drop_vars([x_dim, y_dim], errors="ignore").assign_coords(
+            {ref_y_dim: reference[ref_y_dim], ref_x_dim: reference[ref_x_dim]}
+        )
+        return regridded.rio.write_crs(reference.rio.crs).rio.set_spatial_dims(
+            x_dim=ref_x_dim, y_dim=ref_y_dim
+        )
+
+    @staticmethod
+    def _create_reader(
+        media_type: str,
+        items: List[Dict[str, Any]],
+        bbox: Tuple[float, float, float, float],
+        bands: List[str],
+        temporal_extent: Tuple[datetime, Optional[datetime]],
+        properties: Optional[Dict[str, Any]],
+        **kwargs,
+    ) -> FileReader:
+        """instantiate the reader that handles the specified media type
+
+        Args:
+            media_type (str): media type of the assets
+            items (List[Dict[str, Any]]): STAC items
+            kwargs: reader-specific parameters
+
+        Returns:
+            FileReader: reader
+        """
         if media_type in [COG_MEDIA_TYPE, JPG2000_MEDIA_TYPE]:
-            reader: Union[
-                COGFileReader,
-                ZarrFileReader,
-                NetCDFFileReader,
-                Grib2FileReader,
-                FSTDFileReader,
-            ] = COGFileReader(
+            reader: FileReader = COGFileReader(
                 items=items,
-                bbox=bbox_wsg84,
+                bbox=bbox,
                 bands=bands,
-                temporal_extent=temporal_ext,
+                temporal_extent=temporal_extent,
                 properties=properties,
+                **kwargs,
             )
 
         elif media_type == ZIP_ZARR_MEDIA_TYPE:
             reader = ZarrFileReader(
                 items=items,
-                bbox=bbox_wsg84,
+                bbox=bbox,
                 bands=bands,
-                temporal_extent=temporal_ext,
+                temporal_extent=temporal_extent,
                 properties=properties,
             )
         elif media_type == NETCDF_MEDIA_TYPE:
             reader = NetCDFFileReader(
                 items=items,
-                bbox=bbox_wsg84,
+                bbox=bbox,
                 bands=bands,
-                temporal_extent=temporal_ext,
+                temporal_extent=temporal_extent,
                 properties=properties,
             )
         elif media_type == GRIB2_MEDIA_TYPE:
             reader = Grib2FileReader(
                 items=items,
-                bbox=bbox_wsg84,
+                bbox=bbox,
                 bands=bands,
-                temporal_extent=temporal_ext,
+                temporal_extent=temporal_extent,
                 properties=properties,
             )
         elif media_type == FSTD_MEDIA_TYPE:
             reader = FSTDFileReader(
                 items=items,
-                bbox=bbox_wsg84,
+                bbox=bbox,
                 bands=bands,
-                temporal_extent=temporal_ext,
+                temporal_extent=temporal_extent,
                 properties=properties,
             )
         else:
             raise ValueError(f"Error! {media_type=} is not supported")
-        data = reader.load_items()
-        return data
+        return reader
+
+    # openEO comparison processes and their CQL2 operators
+    OPENEO_TO_CQL2_OPERATORS = {
+        "eq": "=",
+        "neq": "<>",
+        "lt": "<",
+        "lte": "<=",
+        "gt": ">",
+        "gte": ">=",
+    }
+    # operators that are equivalent when operands are swapped, e.g., 5 < value is value > 5
+    SWAPPED_CQL2_OPERATORS = {
+        "=": "=",
+        "<>": "<>",
+        "<": ">",
+        "<=": ">=",
+        ">": "<",
+        ">=": "<=",
+    }
 
     @staticmethod
-    def _parse_process_graph(
-        process_graph: Dict, property_name: str
-    ) -> Tuple[str, Union[str, int, float]]:
-        """parses process graph, which is part of properties parameter of load_collection process
+    def _translate_process_graph(
+        process_graph: Dict[str, Any], property_name: str
+    ) -> Dict[str, Any]:
+        """translate the process graph of a property, which is part of properties parameter of
+        load_collection process, to CQL2-JSON. Nodes are either logical operators (and, or, xor,
+        not) or conditions (eq, neq, lt, lte, gt, gte, between, array_contains)
 
         Args:
-            process_graph (Dict): process graph in which nodes are either operators or conditions
+            process_graph (Dict[str, Any]): process graph whose parameter is the property value
             property_name (str): name of the property that user wants to filter
 
         Returns:
-            Tuple[str, Union[str, int, float]]: operator and value
+            Dict[str, Any]: CQL2-JSON expression
         """
-        map_openeo_cql2_operators = {
-            "lte": "<=",
-            "lt": "<",
-            "gte": ">=",
-            "gt": ">",
-            "eq": "=",
-        }
-        x = process_graph["arguments"]["x"]
-        y = process_graph["arguments"]["y"]
-        if isinstance(x, ParameterReference):
-            value = y
-        else:
-            value = x
-        process_id: str = process_graph["process_id"]
-        assert isinstance(process_id, str)
+        result_nodes = [
+            node
+            for node in process_graph.values()
+            if LoadCollectionFromCOS._unpack_node(node=node)[2]
+        ]
+        if len(result_nodes) == 1:
+            return LoadCollectionFromCOS._translate_node(
+                node=result_nodes[0],
+                process_graph=process_graph,
+                property_name=property_name,
+            )
+        # if no result node is set, all nodes are conditions that must be met
+        conditions = [
+            LoadCollectionFromCOS._translate_node(
+                node=node, process_graph=process_graph, property_name=property_name
+            )
+            for node in process_graph.values()
+        ]
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"op": "and", "args": conditions}
+
+    @staticmethod
+    def _unpack_node(node: Any) -> Tuple[str, Dict[str, Any], bool]:
+        # nodes are dicts before the process graph is parsed and ProcessNode objects after it
+        if isinstance(node, dict):
+            return node["process_id"], node["arguments"], node.get("result", False)
+        return node.process_id, node.arguments, bool(node.result)
+
+    @staticmethod
+    def _translate_node(
+        node: Any, process_graph: Dict[str, Any], property_name: str
+    ) -> Dict[str, Any]:
+        """translate a node of the process graph of a property and the nodes it depends on
+
+        Args:
+            node (Any): process node
+            process_graph (Dict[str, Any]): all nodes of the process graph
+            property_name (str): name of the property that user wants to filter
+
+        Raises:
+            ValueError: if the process cannot be translated to CQL2
+
+        Returns:
+            Dict[str, Any]: CQL2-JSON expression
+        """
+
+        def _translate_argument(argument: Any) -> Dict[str, Any]:
+            # references to other nodes are ResultReference objects or {"from_node": ...}
+            if isinstance(argument, dict) and "from_node" in argument:
+                referenced_node = process_graph[argument["from_node"]]
+            elif hasattr(argument, "from_node"):
+                referenced_node = argument.node
+            else:
+                raise ValueError(
+                    f"Error! Expected a condition on {property_name}, got {argument}"
+                )
+            return LoadCollectionFromCOS._translate_node(
+                node=referenced_node,
+                process_graph=process_graph,
+                property_name=property_name,
+            )
+
+        def _is_value(argument: Any) -> bool:
+            return isinstance(argument, ParameterReference) or (
+                isinstance(argument, dict) and "from_parameter" in argument
+            )
+
+        process_id, arguments, _ = LoadCollectionFromCOS._unpack_node(node=node)
+        prop = {"property": f"properties.{property_name}"}
         # extra-dimensions (e.g., forecast horizon, issue time) are stored as lists, but openEO
         # client does not allow user to use "contains" operator, e.g., if 1 is in [1, 2, 3]
-        if property_name.startswith("cube:dimensions."):
-            operator = "a_contains"
-        else:
-            operator = map_openeo_cql2_operators[process_id]
-        return operator, value
+        is_extra_dimension = property_name.startswith("cube:dimensions.")
+        if process_id in ["and", "or"]:
+            return {
+                "op": process_id,
+                "args": [
+                    _translate_argument(arguments["x"]),
+                    _translate_argument(arguments["y"]),
+                ],
+            }
+        if process_id == "xor":
+            x = _translate_argument(arguments["x"])
+            y = _translate_argument(arguments["y"])
+            return {
+                "op": "or",
+                "args": [
+                    {"op": "and", "args": [x, {"op": "not", "args": [y]}]},
+                    {"op": "and", "args": [{"op": "not", "args": [x]}, y]},
+                ],
+            }
+        if process_id == "not":
+            return {"op": "not", "args": [_translate_argument(arguments["x"])]}
+        if process_id in LoadCollectionFromCOS.OPENEO_TO_CQL2_OPERATORS:
+            operator = LoadCollectionFromCOS.OPENEO_TO_CQL2_OPERATORS[process_id]
+            x, y = arguments["x"], arguments["y"]
+            if _is_value(x):
+                value = y
+            elif _is_value(y):
+                value = x
+                operator = LoadCollectionFromCOS.SWAPPED_CQL2_OPERATORS[operator]
+            else:
+                raise ValueError(
+                    f"Error! {process_id} does not compare the value of {property_name}"
+                )
+            if is_extra_dimension:
+                if operator != "=":
+                    raise ValueError(
+                        f"Error! Only eq is supported for extra-dimension {property_name}"
+                    )
+                return {"op": "a_contains", "args": [prop, value]}
+            return {"op": operator, "args": [prop, value]}
+        if process_id == "between":
+            assert _is_value(
+                arguments["x"]
+            ), f"Error! between does not compare the value of {property_name}"
+            low, high = arguments["min"], arguments["max"]
+            if arguments.get("exclude_max", False):
+                return {
+                    "op": "and",
+                    "args": [
+                        {"op": ">=", "args": [prop, low]},
+                        {"op": "<", "args": [prop, high]},
+                    ],
+                }
+            return {"op": "between", "args": [prop, low, high]}
+        if process_id == "array_contains":
+            assert _is_value(
+                arguments["value"]
+            ), f"Error! array_contains does not look up the value of {property_name}"
+            values = list(arguments["data"])
+            if is_extra_dimension:
+                return {"op": "a_overlaps", "args": [prop, values]}
+            return {"op": "in", "args": [prop, values]}
+        raise ValueError(
+            f"Error! Process {process_id} is not supported in properties: {property_name}"
+        )
 
     @staticmethod
     def _convert_properties_to_filter(
@@ -220,28 +811,16 @@ class LoadCollectionFromCOS(AbstractLoadCollection):
         Returns:
             Dict[str, Any]: filter parameter
         """
-        # TODO this method does not handle all types of filters that can be applied
-
         # this is the list of conditions/filters that we will pass as filters in the search
         conditions: List[Dict[str, Any]] = list()
         if properties is not None:
             # for each property
             for property_name, process_graph in properties.items():
-                # for each process graph
-                for process_graph_value in process_graph["process_graph"].values():
-                    # extract operator and value
-                    operator, value = LoadCollectionFromCOS._parse_process_graph(
-                        process_graph=process_graph_value, property_name=property_name
-                    )
-                    # set a condition and append it to the list of conditions
-                    condition = {
-                        "op": operator,
-                        "args": [
-                            {"property": f"properties.{property_name}"},
-                            value,
-                        ],
-                    }
-                    conditions.append(condition)
+                condition = LoadCollectionFromCOS._translate_process_graph(
+                    process_graph=process_graph["process_graph"],
+                    property_name=property_name,
+                )
+                conditions.append(condition)
         # if the number of conditions appended is zero then there is no filter
         if len(conditions) == 0:
             filter_cql = None
@@ -261,13 +840,48 @@ class LoadCollectionFromCOS(AbstractLoadCollection):
         properties: Optional[Dict[str, Any]] = {},
         limit: int = 10000,
     ) -> List[Dict[str, Any]]:
+        items_as_dicts: List[Dict[str, Any]] = list()
+        for page in self._search_item_pages(
+            bbox=bbox,
+            temporal_extent=temporal_extent,
+            collection_id=collection_id,
+            properties=properties,
+            limit=limit,
+        ):
+            items_as_dicts.extend(page)
+        return items_as_dicts
+
+    def _search_item_pages(
+        self,
+        bbox: Tuple[float, float, float, float],
+        temporal_extent: TemporalInterval,
+        collection_id: str,
+        properties: Optional[Dict[str, Any]] = {},
+        limit: int = 10000,
+        streaming: bool = False,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """search STAC items and yield them in pages
+
+        Args:
+            bbox (Tuple[float, float, float, float]): west, south, east, north
+            temporal_extent (TemporalInterval): time interval
+            collection_id (str): collection ID
+            properties (Optional[Dict[str, Any]], optional): properties parameter of
+                load_collection
+            limit (int, optional): page size if streaming is False
+            streaming (bool, optional): if True, yield each page of STAC_SEARCH_PAGE_SIZE
+                items as soon as it arrives. Otherwise, yield all items as a single page
+
+        Yields:
+            Iterator[List[Dict[str, Any]]]: pages of items
+        """
         starttime, endtime = LoadCollectionFromCOS._get_start_and_endtime(
             temporal_extent=temporal_extent
         )
         # set datetime using STAC format
         datetime = f"{starttime.strftime(STAC_DATETIME_FORMAT)}/{endtime.strftime(STAC_DATETIME_FORMAT)}"
         logger.debug(f"Connecting to STAC service URL={STAC_URL}")
-        stac_catalog = Client.open(STAC_URL)
+        stac_catalog = get_stac_client()
         filter_cql = LoadCollectionFromCOS._convert_properties_to_filter(
             properties=properties
         )
@@ -281,22 +895,92 @@ class LoadCollectionFromCOS(AbstractLoadCollection):
             ],
             "excludes": [],
         }
+        # otherwise the STAC service strips the property that orders COG mosaics
+        if COGFileReader._is_least_cloudy():
+            fields["includes"].append(f"properties.{CLOUD_COVER_PROPERTY}")
 
-        logger.debug(
-            f"Searching STAC items: {bbox=} {datetime=} collections={[collection_id]}\
-                  {fields=} {limit=} {filter_cql=}"
-        )
-        # search items
-        result = stac_catalog.search(
-            collections=[collection_id],
+        cache_key = LoadCollectionFromCOS._make_search_cache_key(
+            collection_id=collection_id,
             bbox=bbox,
             datetime=datetime,
+            filter_cql=filter_cql,
             fields=fields,
             limit=limit,
-            filter=filter_cql,
-            filter_lang="cql2-json",
         )
-        items_as_dicts = list(result.items_as_dicts())
+        # the version is read before searching, so that results are stale if items are added
+        # while they are being searched
+        version = _get_search_cache_version(collection_id=collection_id)
+        cached_items = None
+        cached_entry = _search_cache.get(cache_key)
+        if cached_entry is not None:
+            cached_version, cached_items = cached_entry
+            # None means that redis is not available, so results expire only after their TTL
+            if version is not None and cached_version != version:
+                logger.debug(f"Cached items of {collection_id} have been invalidated")
+                cached_items = None
+        if cached_items is not None:
+            logger.debug(f"{len(cached_items)} items have been found in cache")
+            # cached items are shared, not copied, because readers do not modify items
+            yield list(cached_items)
+            return
+
+        page_size = STAC_SEARCH_PAGE_SIZE if streaming else limit
+        partitions = LoadCollectionFromCOS._partition_search_extent(
+            bbox=bbox, starttime=starttime, endtime=endtime
+        )
+        pages: Optional[Iterator[List[Dict[str, Any]]]] = None
+        if stac_geoparquet.has_snapshot(collection_id=collection_id):
+            try:
+                pages = iter(
+                    [
+                        stac_geoparquet.search_items(
+                            collection_id=collection_id,
+                            bbox=bbox,
+                            starttime=starttime,
+                            endtime=endtime,
+                            filter_cql=filter_cql,
+                        )
+                    ]
+                )
+            except ValueError as e:
+                logger.warning(f"Snapshot of {collection_id} cannot be searched: {e}")
+        if pages is None and len(partitions) > 1:
+            logger.debug(
+                f"Searching STAC items in {len(partitions)} partitions: {bbox=} {datetime=}\
+                    collections={[collection_id]} {page_size=} {filter_cql=}"
+            )
+            pages = LoadCollectionFromCOS._search_partitions(
+                stac_catalog=stac_catalog,
+                partitions=partitions,
+                collection_id=collection_id,
+                fields=fields,
+                page_size=page_size,
+                filter_cql=filter_cql,
+                streaming=streaming,
+            )
+        elif pages is None:
+            logger.debug(
+                f"Searching STAC items: {bbox=} {datetime=} collections={[collection_id]}\
+                    {fields=} {page_size=} {filter_cql=}"
+            )
+            # search items
+            result = stac_catalog.search(
+                collections=[collection_id],
+                bbox=bbox,
+                datetime=datetime,
+                fields=fields,
+                limit=page_size,
+                filter=filter_cql,
+                filter_lang="cql2-json",
+            )
+            if streaming:
+                pages = (page["features"] for page in result.pages_as_dicts())
+            else:
+                pages = iter([list(result.items_as_dicts())])
+        items_as_dicts: List[Dict[str, Any]] = list()
+        for page in pages:
+            items_as_dicts.extend(page)
+            yield page
         matched_items = len(items_as_dicts)
         logger.debug(f"{matched_items} items have been found")
         assert (
@@ -304,8 +988,132 @@ class LoadCollectionFromCOS(AbstractLoadCollection):
         ), f"Error! No item has been found, please check the params:\
                 collection_id={collection_id} {bbox=} {datetime=} {limit=}\
                 {fields=}"
+        ttl = STAC_SEARCH_CACHE_TTL_BY_COLLECTION.get(
+            collection_id, STAC_SEARCH_CACHE_TTL
+        )
+        if ttl > 0:
+            _search_cache.set(
+                cache_key, (version, items_as_dicts), ttl=ttl, tag=collection_id
+            )
 
-        return items_as_dicts
+    @staticmethod
+    def _partition_search_extent(
+        bbox: Tuple[float, float, float, float],
+        starttime: datetime,
+        endtime: datetime,
+    ) -> List[Tuple[Tuple[float, float, float, float], str]]:
+        """split a large search extent into tiles of at most STAC_SEARCH_PARTITION_DEGREES
+        degrees and time intervals of at most STAC_SEARCH_PARTITION_DAYS days
+
+        Args:
+            bbox (Tuple[float, float, float, float]): west, south, east, north
+            starttime (datetime): start of the time interval
+            endtime (datetime): end of the time interval
+
+        Returns:
+            List[Tuple[Tuple[float, float, float, float], str]]: bbox and datetime (STAC format)
+                of each partition
+        """
+        west, south, east, north = bbox
+        num_x = max(1, int(np.ceil((east - west) / STAC_SEARCH_PARTITION_DEGREES)))
+        num_y = max(1, int(np.ceil((north - south) / STAC_SEARCH_PARTITION_DEGREES)))
+        xs = np.linspace(west, east, num_x + 1)
+        ys = np.linspace(south, north, num_y + 1)
+        bboxes = [
+            (float(xs[i]), float(ys[j]), float(xs[i + 1]), float(ys[j + 1]))
+            for i in range(num_x)
+            for j in range(num_y)
+        ]
+        step = timedelta(days=STAC_SEARCH_PARTITION_DAYS)
+        intervals = list()
+        interval_start = starttime
+        while True:
+            interval_end = min(interval_start + step, endtime)
+            intervals.append(
+                f"{interval_start.strftime(STAC_DATETIME_FORMAT)}/{interval_end.strftime(STAC_DATETIME_FORMAT)}"
+            )
+            if interval_end >= endtime:
+                break
+            interval_start = interval_end
+        return [(b, interval) for b in bboxes for interval in intervals]
+
+    @staticmethod
+    def _search_partitions(
+        stac_catalog: Client,
+        partitions: List[Tuple[Tuple[float, float, float, float], str]],
+        collection_id: str,
+        fields: Dict[str, List[str]],
+        page_size: int,
+        filter_cql: Optional[Dict[str, Any]],
+        streaming: bool,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """search the partitions concurrently (at most STAC_SEARCH_MAX_CONCURRENCY at a time).
+        Items that touch more than one partition are yielded only once
+
+        Yields:
+            Iterator[List[Dict[str, Any]]]: if streaming, the items of each partition as soon
+                as it finishes. Otherwise, all items sorted by datetime
+        """
+
+        def _search_partition(
+            partition: Tuple[Tuple[float, float, float, float], str]
+        ) -> List[Dict[str, Any]]:
+            partition_bbox, partition_datetime = partition
+            result = stac_catalog.search(
+                collections=[collection_id],
+                bbox=partition_bbox,
+                datetime=partition_datetime,
+                fields=fields,
+                limit=page_size,
+                filter=filter_cql,
+                filter_lang="cql2-json",
+            )
+            return list(result.items_as_dicts())
+
+        item_ids = set()
+        merged_items: List[Dict[str, Any]] = list()
+        with ThreadPoolExecutor(max_workers=STAC_SEARCH_MAX_CONCURRENCY) as executor:
+            futures = [executor.submit(_search_partition, p) for p in partitions]
+            for future in as_completed(futures):
+                page = list()
+                for item in future.result():
+                    if item["id"] not in item_ids:
+                        item_ids.add(item["id"])
+                        page.append(item)
+                if streaming:
+                    yield page
+                else:
+                    merged_items.extend(page)
+        if not streaming:
+            # keep the order of a single search, i.e., most recent first
+            merged_items.sort(
+                key=lambda item: pd.Timestamp(item["properties"]["datetime"]),
+                reverse=True,
+            )
+            yield merged_items
+
+    @staticmethod
+    def _make_search_cache_key(
+        collection_id: str,
+        bbox: Tuple[float, float, float, float],
+        datetime: str,
+        filter_cql: Optional[Dict[str, Any]],
+        fields: Dict[str, List[str]],
+        limit: int,
+    ) -> Tuple:
+        """normalize search parameters, so that equivalent searches have the same key
+
+        Returns:
+            Tuple: hashable key
+        """
+        return (
+            collection_id,
+            tuple(float(coord) for coord in bbox),
+            datetime,
+            json.dumps(filter_cql, sort_keys=True, default=str),
+            json.dumps(fields, sort_keys=True),
+            limit,
+        )
 
     @staticmethod
     def _group_items_by_media_type(
@@ -0,0 +1,289 @@
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from openeo_pg_parser_networkx.pg_schema import (
+    BoundingBox,
+    ParameterReference,
+    TemporalInterval,
+)
+
+from tensorlakehouse_openeo_driver import geospatial_utils
+from tensorlakehouse_openeo_driver.constants import logger
+from tensorlakehouse_openeo_driver.file_reader.cloud_storage_file_reader import (
+    CloudStorageFileReader,
+)
+from tensorlakehouse_openeo_driver.file_reader.cog_file_reader import COGFileReader
+from tensorlakehouse_openeo_driver.process_implementations.load_collection import (
+    LoadCollectionFromCOS,
+)
+
+# size of a pixel of an asset whose data type is not advertised by the STAC item
+DEFAULT_ASSET_ITEMSIZE = 4
+
+
+@dataclass
+class LoadPlan:
+    """estimated cost of a load_collection call, computed from the matched STAC items"""
+
+    collection_id: str
+    #: number of items that match the search criteria
+    num_items: int
+    #: number of files that will be opened
+    num_assets: int
+    #: estimated number of bytes read from the object storage
+    bytes_read: int
+    #: number of dask chunks of the data cube
+    num_chunks: int
+    #: time, bands, y, x
+    output_shape: Tuple[int, int, int, int]
+    #: estimated size of the data cube in memory
+    output_bytes: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def plan_load_collection(
+    collection_id: str,
+    spatial_extent: BoundingBox,
+    temporal_extent: TemporalInterval,
+    bands: List[str],
+    properties: Optional[Dict[str, Any]] = {},
+) -> LoadPlan:
+    """estimate the cost of loading a collection without reading any file. The STAC search is
+    cached, so that load_collection reuses the items found here
+
+    Args:
+        collection_id (str): collection ID
+        spatial_extent (BoundingBox): bounding box specified by users
+        temporal_extent (TemporalInterval): time interval
+        bands (List[str]): band names
+        properties (Optional[Dict[str, Any]], optional): properties parameter of load_collection
+
+    Returns:
+        LoadPlan: estimated cost
+    """
+    loader = LoadCollectionFromCOS()
+    bbox = LoadCollectionFromCOS._convert_to_WSG84(spatial_extent=spatial_extent)
+    items = loader._search_items(
+        bbox=bbox,
+        temporal_extent=temporal_extent,
+        collection_id=collection_id,
+        properties=properties,
+    )
+    items_by_media_type = LoadCollectionFromCOS._group_items_by_media_type(
+        items=items, bands=bands
+    )
+    # items are grouped once per matching band, so they are de-duplicated by ID
+    selected_items = {
+        item["id"]: item for group in items_by_media_type.values() for item in group
+    }
+    num_assets = 0
+    bytes_read = 0
+    datetimes = set()
+    crs_resolution_list: List[Tuple[Optional[int], Optional[float]]] = list()
+    for item in selected_items.values():
+        assets = _select_assets(item=item, bands=bands)
+        num_assets += len(assets)
+        overlap = _get_overlap_fraction(bbox=bbox, item_bbox=item["bbox"])
+        for asset in assets:
+            bytes_read += int(_estimate_asset_bytes(item=item, asset=asset) * overlap)
+        datetimes.add(item["properties"].get("datetime"))
+        epsg = CloudStorageFileReader._get_epsg(item=item)
+        resolution = CloudStorageFileReader._get_resolution(item=item)
+        if epsg is not None and resolution is not None:
+            crs_resolution_list.append((epsg, resolution))
+    # data cubes are loaded as float64 unless COG_DTYPE says otherwise
+    dtype, _ = COGFileReader._get_dtype_and_nodata(
+        items=list(selected_items.values()),
+        assets=[CloudStorageFileReader.DATA] + bands,
+    )
+    size_y, size_x = 0, 0
+    num_chunks = 0
+    # output grid and chunks are the same that COGFileReader uses
+    if len(crs_resolution_list) > 0:
+        epsg, resolution = COGFileReader._get_most_frequent_crs(
+            crs_resolution_list=crs_resolution_list
+        )
+        west, south, east, north = geospatial_utils.reproject_bbox(
+            bbox=bbox, dst_crs=epsg
+        )
+        size_x = int(np.ceil((east - west) / resolution))
+        size_y = int(np.ceil((north - south) / resolution))
+        chunk_time, _, chunk_y, chunk_x = COGFileReader._get_chunksize(
+            num_times=len(datetimes),
+            bbox=bbox,
+            epsg=epsg,
+            resolution=resolution,
+            itemsize=dtype.itemsize,
+            block_shape=COGFileReader._get_block_shape(
+                items=list(selected_items.values()),
+                assets=[CloudStorageFileReader.DATA] + bands,
+            ),
+        )
+        num_chunks = (
+            int(np.ceil(len(datetimes) / chunk_time))
+            * len(bands)
+            * int(np.ceil(size_y / chunk_y))
+            * int(np.ceil(size_x / chunk_x))
+        )
+    output_shape = (len(datetimes), len(bands), size_y, size_x)
+    plan = LoadPlan(
+        collection_id=collection_id,
+        num_items=len(selected_items),
+        num_assets=num_assets,
+        bytes_read=bytes_read,
+        num_chunks=num_chunks,
+        output_shape=output_shape,
+        output_bytes=int(np.prod(output_shape)) * dtype.itemsize,
+    )
+    logger.debug(f"Load plan: {plan}")
+    return plan
+
+
+def get_unbounded_collections(process_graph: Dict[str, Any]) -> List[str]:
+    """find the load_collection nodes whose spatial or temporal extent is not set or
+    open-ended, e.g., ["2023-08-01", null]. Their cost cannot be estimated, but it is
+    potentially unlimited
+
+    Args:
+        process_graph (Dict[str, Any]): flat process graph
+
+    Returns:
+        List[str]: collection ID of each unbounded load_collection node
+    """
+    return [
+        node["arguments"]["id"]
+        for node in process_graph.values()
+        if node["process_id"] == "load_collection"
+        and _is_unbounded(arguments=node["arguments"])
+    ]
+
+
+def _is_unbounded(arguments: Dict[str, Any]) -> bool:
+    spatial_extent = arguments.get("spatial_extent")
+    temporal_extent = arguments.get("temporal_extent")
+    return (
+        spatial_extent is None
+        or temporal_extent is None
+        or (isinstance(temporal_extent, list) and None in temporal_extent)
+    )
+
+
+def plan_process_graph(process_graph: Dict[str, Any]) -> List[LoadPlan]:
+    """estimate the cost of each load_collection node of a process graph. Nodes whose extent
+    depends on parameters or is unbounded (see get_unbounded_collections) are skipped
+
+    Args:
+        process_graph (Dict[str, Any]): flat process graph
+
+    Returns:
+        List[LoadPlan]: one plan per load_collection node
+    """
+    plans: List[LoadPlan] = list()
+    for node in process_graph.values():
+        if node["process_id"] != "load_collection":
+            continue
+        arguments = node["arguments"]
+        spatial_extent = arguments.get("spatial_extent")
+        temporal_extent = arguments.get("temporal_extent")
+        bands = arguments.get("bands")
+        if (
+            not isinstance(spatial_extent, dict)
+            or "from_parameter" in spatial_extent
+            or not isinstance(temporal_extent, list)
+            or None in temporal_extent
+            or not isinstance(bands, list)
+        ):
+            logger.debug(f"Load plan of {arguments.get('id')} has been skipped")
+            continue
+        plans.append(
+            plan_load_collection(
+                collection_id=arguments["id"],
+                spatial_extent=BoundingBox(**spatial_extent),
+                temporal_extent=TemporalInterval.parse_obj(temporal_extent),
+                bands=bands,
+                properties=_parse_properties(arguments.get("properties")),
+            )
+        )
+    return plans
+
+
+def _parse_properties(properties: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """replace {"from_parameter": ...} of the JSON process graph by ParameterReference, which is
+    what load_collection receives after the process graph is parsed
+    """
+
+    def _parse(value: Any) -> Any:
+        if isinstance(value, dict):
+            if "from_parameter" in value:
+                return ParameterReference(from_parameter=value["from_parameter"])
+            return {k: _parse(v) for k, v in value.items()}
+        return value
+
+    if properties is None:
+        return None
+    return _parse(properties)
+
+
+def _select_assets(item: Dict[str, Any], bands: List[str]) -> List[Dict[str, Any]]:
+    assets: Dict[str, Any] = item["assets"]
+    if LoadCollectionFromCOS.ASSET_DESCRIPTION_DATA in assets.keys():
+        return [assets[LoadCollectionFromCOS.ASSET_DESCRIPTION_DATA]]
+    return [assets[band] for band in bands if band in assets.keys()]
+
+
+def _get_overlap_fraction(
+    bbox: Tuple[float, float, float, float], item_bbox: List[float]
+) -> float:
+    """fraction of the item that is inside bbox
+
+    Args:
+        bbox (Tuple[float, float, float, float]): west, south, east, north
+        item_bbox (List[float]): bbox of the item
+
+    Returns:
+        float: value between 0 and 1
+    """
+    if len(item_bbox) == 6:
+        item_west, item_south, _, item_east, item_north, _ = item_bbox
+    else:
+        item_west, item_south, item_east, item_north = item_bbox
+    item_area = (item_east - item_west) * (item_north - item_south)
+    if item_area <= 0:
+        return 1.0
+    west, south, east, north = bbox
+    width = max(0.0, min(east, item_east) - max(west, item_west))
+    height = max(0.0, min(north, item_north) - max(south, item_south))
+    return min(1.0, width * height / item_area)
+
+
+def _estimate_asset_bytes(item: Dict[str, Any], asset: Dict[str, Any]) -> int:
+    """estimate the size of an asset, using file:size if available. Otherwise, it is computed
+    from the number of pixels (cube:dimensions) and the data type (raster:bands)
+
+    Args:
+        item (Dict[str, Any]): STAC item
+        asset (Dict[str, Any]): asset of the item
+
+    Returns:
+        int: number of bytes
+    """
+    if asset.get("file:size") is not None:
+        return int(asset["file:size"])
+    num_pixels = 1
+    cube_dimensions: Dict[str, Any] = item["properties"].get("cube:dimensions", {})
+    for dimension in cube_dimensions.values():
+        step = dimension.get("step")
+        extent = dimension.get("extent")
+        if dimension.get("type") == "spatial" and step and extent is not None:
+            num_pixels *= int(np.ceil(abs(extent[1] - extent[0]) / abs(step)))
+    raster_bands = asset.get("raster:bands") or [{}]
+    data_type = raster_bands[0].get("data_type")
+    itemsize = (
+        np.dtype(data_type).itemsize
+        if data_type is not None
+        else DEFAULT_ASSET_ITEMSIZE
+    )
+    return num_pixels * itemsize
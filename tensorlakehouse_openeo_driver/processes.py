@@ -57,7 +57,10 @@ from tensorlakehouse_openeo_driver.constants import (
 from tensorlakehouse_openeo_driver.driver_data_cube import TensorLakehouseDataCube
 from tensorlakehouse_openeo_driver.save_result import GeoDNImageCollectionResult
 from tensorlakehouse_openeo_driver.geospatial_utils import reproject_cube
-from tensorlakehouse_openeo_driver.stac import make_stac_client
+from tensorlakehouse_openeo_driver.stac import get_collection
+from tensorlakehouse_openeo_driver.file_reader.gdal_io_profiles import (
+    GDAL_IO_PROFILE_FIELD,
+)
 
 logging.config.fileConfig(fname="logging.conf", disable_existing_loggers=False)
 logger = logging.getLogger("geodnLogger")
@@ -295,6 +298,9 @@ def load_collection(
     temporal_extent: TemporalInterval,
     bands: Optional[List[str]],
     properties: Optional[Dict[str, Any]] = {},
+    target_resolution: Optional[float] = None,
+    target_epsg: Optional[int] = None,
+    io_profile: Optional[str] = None,
 ) -> Union[RasterCube, VectorCube]:
     """pull data from the data source in which the collection is stored
 
@@ -304,6 +310,11 @@ def load_collection(
         temporal_extent (TemporalInterval): time interval
         bands (Optional[List[str]]): band unique ids
         properties (Dict[str, Any]): property names are the keys and conditions are the values
+        target_resolution (Optional[float]): resolution of a resample_spatial node that
+            consumes this node, set by process_graph_optimizer
+        target_epsg (Optional[int]): CRS of target_resolution
+        io_profile (Optional[str]): GDAL I/O profile set by the gdal-io-profile job option.
+            Defaults to the profile of the collection
 
 
     Returns:
@@ -312,10 +323,9 @@ def load_collection(
     logger.debug(
         f"Running load_collection process: collectiond ID={id} STAC URL={STAC_URL}"
     )
-    stac_catalog = make_stac_client(url=STAC_URL)
     # extract coordinates from BoundingBox object
     try:
-        collection = stac_catalog.get_collection(id)
+        collection = get_collection(collection_id=id)
         extra_fields = collection.extra_fields
         cube_dimensions = extra_fields["cube:dimensions"]
         assert isinstance(
@@ -323,6 +333,8 @@ def load_collection(
         ), f"Error! Unexpected type {cube_dimensions}"
         assert isinstance(bands, list), f"Error! Unexpected type: {bands}"
         dimension_names = _get_dimension_names(cube_dimensions=cube_dimensions)
+        if io_profile is None:
+            io_profile = extra_fields.get(GDAL_IO_PROFILE_FIELD)
         loader = LoadCollectionFromCOS()
         data = loader.load_collection(
             id=id,
@@ -331,6 +343,9 @@ def load_collection(
             bands=bands,
             properties=properties,
             dimensions=dimension_names,
+            target_resolution=target_resolution,
+            target_epsg=target_epsg,
+            io_profile=io_profile,
         )
         return data
     except Exception as e:
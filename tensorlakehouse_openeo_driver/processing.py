@@ -1,5 +1,6 @@
 from pathlib import Path
-from typing import Iterable, List, Union
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Union
 from openeo_driver.utils import read_json
 from openeo_driver.ProcessGraphDeserializer import ConcreteProcessing
 from openeo_driver.dry_run import SourceConstraint
@@ -14,21 +15,80 @@ import os
 import logging
 from openeo.capabilities import ComparableVersion
 
+from tensorlakehouse_openeo_driver.constants import (
+    SYNC_PROCESSING_MAX_BYTES_READ,
+    SYNC_PROCESSING_MAX_OUTPUT_BYTES,
+)
 from tensorlakehouse_openeo_driver.get_specs import get_process_names
+from tensorlakehouse_openeo_driver import geospatial_utils
 from tensorlakehouse_openeo_driver.get_openeo_process_implementations import (
     get_openeo_impls,
 )
 from tensorlakehouse_openeo_driver.get_process_implementations import get_impls
+from tensorlakehouse_openeo_driver.process_implementations.load_planner import (
+    get_unbounded_collections,
+    plan_process_graph,
+)
+from tensorlakehouse_openeo_driver.process_graph_optimizer import (
+    optimize_process_graph,
+)
 from openeo_processes_dask.process_implementations import _max, _min
 from openeo_processes_dask.specs import _max as max_spec, _min as min_spec
 from openeo_processes_dask.process_implementations.core import process
 import openeo
+import xarray as xr
 from openeo.udf import run_udf_code
 
 assert os.path.isfile("logging.conf")
 logging.config.fileConfig(fname="logging.conf", disable_existing_loggers=False)
 logger = logging.getLogger("geodnLogger")
 
+# processes that keep the nodata values of their input data cubes, so that data cubes loaded
+# with their native data type (see COG_DTYPE) are converted to float only when values are computed
+NODATA_PRESERVING_PROCESSES = {
+    "load_collection",
+    "save_result",
+    "filter_bbox",
+    "filter_temporal",
+    "filter_bands",
+    "rename_dimension",
+    "rename_labels",
+}
+
+
+def mask_nodata(f: Callable) -> Callable:
+    """wrap a process implementation, so that the nodata values of the data cubes that it
+    receives are replaced by NaN
+
+    Args:
+        f (Callable): process implementation
+
+    Returns:
+        Callable: wrapped implementation
+    """
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        args = tuple(
+            (
+                geospatial_utils.mask_nodata(data_array=arg)
+                if isinstance(arg, xr.DataArray)
+                else arg
+            )
+            for arg in args
+        )
+        kwargs = {
+            k: (
+                geospatial_utils.mask_nodata(data_array=v)
+                if isinstance(v, xr.DataArray)
+                else v
+            )
+            for k, v in kwargs.items()
+        }
+        return f(*args, **kwargs)
+
+    return wrapper
+
 
 class TensorlakehouseProcessing(ConcreteProcessing):
     def __init__(self) -> None:
@@ -103,8 +163,11 @@ class TensorlakehouseProcessing(ConcreteProcessing):
         proc_data.append({"name": "min", "spec": min_spec, "impl": _min})
 
         for p in proc_data:
+            implementation = p["impl"]
+            if p["name"] not in NODATA_PRESERVING_PROCESSES:
+                implementation = mask_nodata(implementation)
             self.process_registry[p["name"]] = Process(
-                spec=p["spec"], implementation=p["impl"]
+                spec=p["spec"], implementation=implementation
             )
 
     def get_process_registry(
@@ -113,6 +176,9 @@ class TensorlakehouseProcessing(ConcreteProcessing):
         return self.process_registry
 
     def evaluate(self, process_graph: dict, env: EvalEnv = None):
+        # search and read only the data that survives the filters and load coarse outputs
+        # from coarse data, e.g., COG overviews
+        process_graph = optimize_process_graph(process_graph=process_graph)
         parsed_graph = OpenEOProcessGraph(pg_data=process_graph)
 
         # get process graph
@@ -160,3 +226,49 @@ class TensorlakehouseProcessing(ConcreteProcessing):
             if "FAIL_VERIFY_FOR_SYNC_PROCESSING" in cid:
                 # For testing that things keep working when verifying goes wrong
                 raise RuntimeError("Nope, catch this")
+        # plan the same process graph that evaluate runs
+        process_graph = optimize_process_graph(process_graph=process_graph)
+        for cid in get_unbounded_collections(process_graph=process_graph):
+            yield f"Collection {cid!r} is loaded without a bounded spatial or temporal \
+extent, please set both extents or use a batch job."
+        try:
+            plans = plan_process_graph(process_graph=process_graph)
+        except Exception as e:
+            # planning is best-effort, it must not prevent the request from being processed
+            logger.warning(f"Load plan could not be computed: {e}")
+            plans = list()
+        for plan in plans:
+            if plan.bytes_read > SYNC_PROCESSING_MAX_BYTES_READ:
+                yield f"Collection {plan.collection_id!r} requires reading an estimated \
+{plan.bytes_read} bytes (max {SYNC_PROCESSING_MAX_BYTES_READ}), please use a batch job."
+            if plan.output_bytes > SYNC_PROCESSING_MAX_OUTPUT_BYTES:
+                yield f"Collection {plan.collection_id!r} produces an estimated data cube of \
+{plan.output_bytes} bytes (max {SYNC_PROCESSING_MAX_OUTPUT_BYTES}), please use a batch job."
+
+    def explain(self, process_graph: dict) -> Dict[str, Any]:
+        """estimate the cost of the load_collection nodes of a process graph without loading
+        any data
+
+        Args:
+            process_graph (dict): flat process graph
+
+        Returns:
+            Dict[str, Any]: load plan of each load_collection node, unbounded nodes and totals
+        """
+        # plan the same process graph that evaluate runs
+        process_graph = optimize_process_graph(process_graph=process_graph)
+        plans = plan_process_graph(process_graph=process_graph)
+        # cost of unbounded nodes is unknown, so it is not included in the totals
+        unbounded = get_unbounded_collections(process_graph=process_graph)
+        return {
+            "load_collection": [plan.to_dict() for plan in plans],
+            "unbounded": unbounded,
+            "bytes_read": sum(plan.bytes_read for plan in plans),
+            "output_bytes": sum(plan.output_bytes for plan in plans),
+            "synchronous": len(unbounded) == 0
+            and all(
+                plan.bytes_read <= SYNC_PROCESSING_MAX_BYTES_READ
+                and plan.output_bytes <= SYNC_PROCESSING_MAX_OUTPUT_BYTES
+                for plan in plans
+            ),
+        }
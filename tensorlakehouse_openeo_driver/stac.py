@@ -1,4 +1,7 @@
-from typing import Any, Dict, List, Optional
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 import urllib.parse
 from tensorlakehouse_openeo_driver.constants import (
@@ -7,13 +10,28 @@ from tensorlakehouse_openeo_driver.constants import (
     APPID_USERNAME,
     OPENEO_AUTH_CLIENT_ID,
     OPENEO_AUTH_CLIENT_SECRET,
+    STAC_CLIENT_POOL_SIZE,
+    STAC_COLLECTION_CACHE_MAX_AGE,
+    STAC_COLLECTION_CACHE_MAX_SIZE,
+    STAC_COLLECTION_CACHE_TTL,
     STAC_URL,
     logger,
 )
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from pystac_client import Client
+from pystac_client import Client, CollectionClient
+from pystac_client.stac_api_io import StacApiIO
+from tensorlakehouse_openeo_driver.util.cache import TTLCache
+
+# process-wide STAC client shared by load_collection and the collection catalog
+_stac_client: Optional[Client] = None
+_stac_client_lock = threading.Lock()
+# collection ID -> (time it was fetched or revalidated, ETag, collection). Entries are served
+# without any request for STAC_COLLECTION_CACHE_TTL seconds and then revalidated using the ETag
+_collection_cache = TTLCache(
+    max_size=STAC_COLLECTION_CACHE_MAX_SIZE, ttl=STAC_COLLECTION_CACHE_MAX_AGE
+)
 
 
 def sign_request(request: requests.Request) -> requests.Request:
@@ -34,14 +52,145 @@ def sign_request(request: requests.Request) -> requests.Request:
     return request
 
 
-def make_stac_client(url):
+def make_stac_client(
+    url: str = STAC_URL, pool_size: int = STAC_CLIENT_POOL_SIZE
+) -> Client:
+    """create a STAC client whose session keeps up to pool_size keep-alive connections open
+
+    Args:
+        url (str): URL of the STAC service
+        pool_size (int): max number of connections kept in the pool
+
+    Returns:
+        Client: pystac client
+    """
     if "osprey.hartree.stfc.ac.uk" in url:
-        catalog = Client.open(url=STAC_URL, request_modifier=sign_request)
+        stac_io = StacApiIO(request_modifier=sign_request, max_retries=None)
     else:
-        catalog = Client.open(STAC_URL)
+        stac_io = StacApiIO(max_retries=None)
+    retry_strategy = Retry(
+        total=2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "POST"],
+    )
+    # pool_block makes greenlets wait for a free connection instead of opening new ones
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        pool_block=True,
+        max_retries=retry_strategy,
+    )
+    stac_io.session.mount("https://", adapter)
+    stac_io.session.mount("http://", adapter)
+    logger.debug(f"Connecting to STAC service URL={url} {pool_size=}")
+    catalog = Client.open(url=url, stac_io=stac_io)
     return catalog
 
 
+def get_stac_client() -> Client:
+    """get the STAC client of this process, which is created on first use. Gunicorn workers are
+    forked before the first request, so each worker process has its own client and pool
+
+    Returns:
+        Client: pystac client connected to STAC_URL
+    """
+    global _stac_client
+    if _stac_client is None:
+        with _stac_client_lock:
+            if _stac_client is None:
+                _stac_client = make_stac_client(url=STAC_URL)
+    return _stac_client
+
+
+def reset_stac_client() -> None:
+    """drop the process-wide STAC client, so that the next call creates a new one"""
+    global _stac_client
+    with _stac_client_lock:
+        _stac_client = None
+
+
+def get_collection(collection_id: str) -> CollectionClient:
+    """get collection from cache or from the STAC service. Cached collections are returned
+    without sending any request for STAC_COLLECTION_CACHE_TTL seconds. After that, a conditional
+    request (If-None-Match) revalidates the cached collection, so that the collection document
+    is downloaded again only if it has changed
+
+    Args:
+        collection_id (str): collection ID
+
+    Returns:
+        CollectionClient: STAC collection
+    """
+    cached = _collection_cache.get(collection_id)
+    if cached is not None:
+        fetched_at, etag, collection = cached
+        if time.monotonic() - fetched_at < STAC_COLLECTION_CACHE_TTL:
+            return collection
+    else:
+        etag, collection = None, None
+    stac_client = get_stac_client()
+    stac_io = getattr(stac_client, "_stac_io", None)
+    if isinstance(stac_io, StacApiIO):
+        new_etag, document = _fetch_collection(
+            stac_io=stac_io, collection_id=collection_id, etag=etag
+        )
+        if document is not None:
+            collection = CollectionClient.from_dict(
+                document, root=stac_client, modifier=stac_client.modifier
+            )
+            etag = new_etag
+        else:
+            logger.debug(f"Collection {collection_id} has not changed {etag=}")
+    else:
+        # clients that are not connected to a STAC API do not support conditional requests
+        collection = stac_client.get_collection(collection_id)
+    _collection_cache.set(
+        collection_id, (time.monotonic(), etag, collection), tag=collection_id
+    )
+    return collection
+
+
+def _fetch_collection(
+    stac_io: StacApiIO, collection_id: str, etag: Optional[str]
+) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """send GET /collections/{collection_id}, which is conditional if etag is not None
+
+    Args:
+        stac_io (StacApiIO): I/O of the STAC client, whose session has a connection pool
+        collection_id (str): collection ID
+        etag (Optional[str]): ETag of the cached collection
+
+    Returns:
+        Tuple[Optional[str], Optional[Dict[str, Any]]]: ETag and collection document, which is
+            None if the cached collection has not changed
+    """
+    url = f"{STAC_URL.rstrip('/')}/collections/{collection_id}"
+    headers = {"If-None-Match": etag} if etag is not None else {}
+    request = requests.Request(method="GET", url=url, headers=headers)
+    if stac_io._req_modifier is not None:
+        request = stac_io._req_modifier(request) or request
+    logger.debug(f"GET {url} {headers=}")
+    resp = stac_io.session.send(
+        stac_io.session.prepare_request(request), timeout=stac_io.timeout
+    )
+    if resp.status_code == 304:
+        return etag, None
+    resp.raise_for_status()
+    return resp.headers.get("ETag"), json.loads(resp.content)
+
+
+def invalidate_collection_cache(collection_id: Optional[str] = None) -> None:
+    """remove collection from cache, or all collections if collection_id is None
+
+    Args:
+        collection_id (Optional[str], optional): collection ID
+    """
+    if collection_id is None:
+        _collection_cache.invalidate()
+    else:
+        _collection_cache.invalidate(tag=collection_id)
+
+
 class STAC:
     def __init__(self, url: str) -> None:
         assert isinstance(url, str)
@@ -253,6 +402,10 @@ class STAC:
     def update_collection(self, new_collection):
         self._put(endpoint="/collections", payload=new_collection)
 
+    def update_item(self, collection_id: str, item: Dict[str, Any]):
+        path = f"/collections/{collection_id}/items/{item['id']}"
+        self._put(endpoint=urllib.parse.quote(path), payload=item)
+
 
 def main():
     stac = STAC(url=STAC_URL)
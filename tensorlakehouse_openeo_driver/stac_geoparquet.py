@@ -0,0 +1,425 @@
+import json
+import operator
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import click
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pystac_client import Client
+
+from tensorlakehouse_openeo_driver.constants import (
+    STAC_DATETIME_FORMAT,
+    STAC_GEOPARQUET_DIR,
+    STAC_GEOPARQUET_ROW_GROUP_SIZE,
+    logger,
+)
+
+# columns used to evaluate bbox and datetime predicates. Item properties are stored in
+# "properties.<name>" columns and the whole item is stored as JSON in the "item" column
+ID = "id"
+ITEM = "item"
+START_DATETIME = "start_datetime"
+END_DATETIME = "end_datetime"
+XMIN = "bbox_xmin"
+YMIN = "bbox_ymin"
+XMAX = "bbox_xmax"
+YMAX = "bbox_ymax"
+PROPERTIES_PREFIX = "properties."
+# items are synced incrementally by the time they have been updated (ingested) in the STAC
+# service, which is stored in the watermark file of the snapshot
+UPDATED = "updated"
+WATERMARK_FILENAME = "_sync.json"
+
+COMPARISON_OPERATORS = {
+    "=": operator.eq,
+    "eq": operator.eq,
+    "<>": operator.ne,
+    "neq": operator.ne,
+    "<": operator.lt,
+    "lt": operator.lt,
+    "<=": operator.le,
+    "lte": operator.le,
+    ">": operator.gt,
+    "gt": operator.gt,
+    ">=": operator.ge,
+    "gte": operator.ge,
+}
+
+
+def get_snapshot_path(
+    collection_id: str, root: Optional[Union[str, Path]] = STAC_GEOPARQUET_DIR
+) -> Optional[Path]:
+    """get the directory of the stac-geoparquet snapshot of the collection
+
+    Args:
+        collection_id (str): collection ID
+        root (Optional[Union[str, Path]], optional): directory of all snapshots
+
+    Returns:
+        Optional[Path]: path or None if snapshots are disabled
+    """
+    if root is None:
+        return None
+    return Path(root) / collection_id
+
+
+def has_snapshot(
+    collection_id: str, root: Optional[Union[str, Path]] = STAC_GEOPARQUET_DIR
+) -> bool:
+    """check whether there is a local snapshot of the collection
+
+    Args:
+        collection_id (str): collection ID
+        root (Optional[Union[str, Path]], optional): directory of all snapshots
+
+    Returns:
+        bool: True if at least one parquet file has been found
+    """
+    path = get_snapshot_path(collection_id=collection_id, root=root)
+    return path is not None and any(path.glob("*.parquet"))
+
+
+def _to_utc_timestamp(value: Optional[Union[str, datetime]]) -> Optional[pd.Timestamp]:
+    if value is None:
+        return None
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize("UTC")
+    return timestamp.tz_convert("UTC")
+
+
+def items_to_table(items: List[Dict[str, Any]]) -> pa.Table:
+    """convert STAC items to a table sorted by datetime, so that the min/max statistics of
+    each row group prune time ranges
+
+    Args:
+        items (List[Dict[str, Any]]): STAC items
+
+    Returns:
+        pa.Table: one row per item
+    """
+    rows: List[Dict[str, Any]] = list()
+    for item in items:
+        properties = item.get("properties", {})
+        item_datetime = properties.get("datetime")
+        start = properties.get("start_datetime", item_datetime)
+        end = properties.get("end_datetime", item_datetime)
+        if len(item["bbox"]) == 6:
+            xmin, ymin, _, xmax, ymax, _ = item["bbox"]
+        else:
+            xmin, ymin, xmax, ymax = item["bbox"]
+        row = {
+            ID: item["id"],
+            START_DATETIME: _to_utc_timestamp(start),
+            END_DATETIME: _to_utc_timestamp(end),
+            XMIN: float(xmin),
+            YMIN: float(ymin),
+            XMAX: float(xmax),
+            YMAX: float(ymax),
+            ITEM: json.dumps(item),
+        }
+        # only scalar properties are stored as columns
+        for name, value in properties.items():
+            if isinstance(value, bool) or isinstance(value, str):
+                row[f"{PROPERTIES_PREFIX}{name}"] = value
+            elif isinstance(value, (int, float)):
+                # int and float values of the same property must share the column type
+                row[f"{PROPERTIES_PREFIX}{name}"] = float(value)
+        rows.append(row)
+    df = pd.DataFrame(rows).sort_values(by=START_DATETIME, ignore_index=True)
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_snapshot_part(
+    items: List[Dict[str, Any]],
+    collection_id: str,
+    root: Union[str, Path] = STAC_GEOPARQUET_DIR,
+    row_group_size: int = STAC_GEOPARQUET_ROW_GROUP_SIZE,
+) -> Path:
+    """write items as a new parquet file of the snapshot
+
+    Args:
+        items (List[Dict[str, Any]]): STAC items
+        collection_id (str): collection ID
+        root (Union[str, Path], optional): directory of all snapshots
+        row_group_size (int, optional): max number of rows per row group
+
+    Returns:
+        Path: path of the new file
+    """
+    path = get_snapshot_path(collection_id=collection_id, root=root)
+    assert path is not None, "Error! STAC_GEOPARQUET_DIR is not set"
+    path.mkdir(parents=True, exist_ok=True)
+    filename = (
+        path / f"part-{pd.Timestamp.utcnow().strftime('%Y%m%dT%H%M%S%f')}.parquet"
+    )
+    pq.write_table(items_to_table(items=items), filename, row_group_size=row_group_size)
+    logger.debug(f"{len(items)} items have been written to {filename}")
+    return filename
+
+
+def _open_dataset(path: Path) -> ds.Dataset:
+    files = sorted(str(f) for f in path.glob("*.parquet"))
+    # parts written at different times may have different property columns
+    schema = pa.unify_schemas([pq.read_schema(f) for f in files])
+    return ds.dataset(files, schema=schema, format="parquet")
+
+
+def _literal(value: Any, column_type: pa.DataType) -> Any:
+    # pgstac casts literals to the type of the property, e.g., "97" to 97
+    if isinstance(value, dict) and "timestamp" in value:
+        return _literal(value["timestamp"], column_type)
+    if pa.types.is_floating(column_type) and isinstance(value, str):
+        return float(value)
+    if pa.types.is_timestamp(column_type):
+        return pa.scalar(_to_utc_timestamp(value), type=column_type)
+    return value
+
+
+def cql2_to_expression(filter_cql: Dict[str, Any], schema: pa.Schema) -> ds.Expression:
+    """translate a CQL2-JSON filter on item properties to a pyarrow expression
+
+    Args:
+        filter_cql (Dict[str, Any]): CQL2-JSON filter
+        schema (pa.Schema): schema of the snapshot
+
+    Raises:
+        ValueError: if operator or property is not supported
+
+    Returns:
+        ds.Expression: expression evaluated on the columns of the snapshot
+    """
+    op = filter_cql["op"]
+    args = filter_cql["args"]
+    if op in ["and", "or"]:
+        expressions = [cql2_to_expression(a, schema) for a in args]
+        result = expressions[0]
+        for e in expressions[1:]:
+            result = (result & e) if op == "and" else (result | e)
+        return result
+    if op == "not":
+        return ~cql2_to_expression(args[0], schema)
+    prop = args[0].get("property") if isinstance(args[0], dict) else None
+    if prop is None:
+        raise ValueError(f"Error! Unsupported filter: {filter_cql}")
+    if not prop.startswith(PROPERTIES_PREFIX):
+        prop = f"{PROPERTIES_PREFIX}{prop}"
+    if prop not in schema.names:
+        raise ValueError(f"Error! Property {prop} is not in the snapshot")
+    field = ds.field(prop)
+    column_type = schema.field(prop).type
+    if op in COMPARISON_OPERATORS:
+        value = _literal(args[1], column_type)
+        return COMPARISON_OPERATORS[op](field, value)
+    if op == "in":
+        return field.isin([_literal(v, column_type) for v in args[1]])
+    if op == "between":
+        low, high = args[1:3] if len(args) == 3 else args[1]
+        return (field >= _literal(low, column_type)) & (
+            field <= _literal(high, column_type)
+        )
+    if op == "isNull":
+        return field.is_null()
+    raise ValueError(f"Error! Unsupported operator: {op}")
+
+
+def search_items(
+    collection_id: str,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    starttime: Optional[datetime] = None,
+    endtime: Optional[datetime] = None,
+    filter_cql: Optional[Dict[str, Any]] = None,
+    limit: Optional[int] = None,
+    root: Optional[Union[str, Path]] = STAC_GEOPARQUET_DIR,
+) -> List[Dict[str, Any]]:
+    """search items of the local snapshot. Predicates are evaluated on columns, so row groups
+    whose statistics do not match are skipped
+
+    Args:
+        collection_id (str): collection ID
+        bbox (Optional[Tuple[float, float, float, float]], optional): west, south, east, north
+        starttime (Optional[datetime], optional): start of the time interval
+        endtime (Optional[datetime], optional): end of the time interval
+        filter_cql (Optional[Dict[str, Any]], optional): CQL2-JSON filter on properties
+        limit (Optional[int], optional): max number of items
+        root (Optional[Union[str, Path]], optional): directory of all snapshots
+
+    Returns:
+        List[Dict[str, Any]]: items sorted by datetime, most recent first (same as pgstac)
+    """
+    path = get_snapshot_path(collection_id=collection_id, root=root)
+    assert path is not None, "Error! STAC_GEOPARQUET_DIR is not set"
+    dataset = _open_dataset(path=path)
+    expression = ds.scalar(True)
+    if bbox is not None:
+        west, south, east, north = bbox
+        expression &= (
+            (ds.field(XMIN) <= east)
+            & (ds.field(XMAX) >= west)
+            & (ds.field(YMIN) <= north)
+            & (ds.field(YMAX) >= south)
+        )
+    timestamp_type = dataset.schema.field(START_DATETIME).type
+    if endtime is not None:
+        expression &= ds.field(START_DATETIME) <= _literal(endtime, timestamp_type)
+    if starttime is not None:
+        expression &= ds.field(END_DATETIME) >= _literal(starttime, timestamp_type)
+    if filter_cql is not None:
+        expression &= cql2_to_expression(filter_cql=filter_cql, schema=dataset.schema)
+    table = dataset.to_table(columns=[ITEM, START_DATETIME], filter=expression)
+    table = table.sort_by([(START_DATETIME, "descending")])
+    if limit is not None:
+        table = table.slice(0, limit)
+    items = [json.loads(item) for item in table.column(ITEM).to_pylist()]
+    logger.debug(f"{len(items)} items have been found in snapshot {path}")
+    return items
+
+
+def sync_snapshot(
+    collection_id: str,
+    stac_client: Optional[Client] = None,
+    root: Union[str, Path] = STAC_GEOPARQUET_DIR,
+    page_size: int = 1000,
+) -> int:
+    """append the items that have been added or updated in the STAC service since the last sync,
+    i.e., whose "updated" property is not older than the watermark of the snapshot. The
+    acquisition time is not used, so that items that are ingested late or backfilled are synced
+    too. Items that are already in the snapshot are replaced. If there is no snapshot or no
+    watermark, e.g., because the items have no "updated" property, all items are exported
+
+    Args:
+        collection_id (str): collection ID
+        stac_client (Optional[Client], optional): STAC client. Defaults to the shared client
+        root (Union[str, Path], optional): directory of all snapshots
+        page_size (int, optional): number of items per request
+
+    Returns:
+        int: number of items added or replaced
+    """
+    if stac_client is None:
+        from tensorlakehouse_openeo_driver.stac import get_stac_client
+
+        stac_client = get_stac_client()
+    path = get_snapshot_path(collection_id=collection_id, root=root)
+    assert path is not None, "Error! STAC_GEOPARQUET_DIR is not set"
+    files = sorted(path.glob("*.parquet"))
+    watermark = _read_watermark(path=path) if len(files) > 0 else None
+    filter_cql = None
+    if watermark is not None:
+        # STAC_DATETIME_FORMAT has no sub-second precision, so the interval is extended
+        filter_cql = {
+            "op": ">=",
+            "args": [
+                {"property": UPDATED},
+                {"timestamp": watermark.strftime(STAC_DATETIME_FORMAT)},
+            ],
+        }
+    logger.debug(f"Syncing snapshot of {collection_id} {filter_cql=}")
+    result = stac_client.search(
+        collections=[collection_id],
+        filter=filter_cql,
+        filter_lang=None if filter_cql is None else "cql2-json",
+        limit=page_size,
+    )
+    items = list(result.items_as_dicts())
+    # the interval is inclusive, so unchanged items are returned again
+    synced = _get_synced_versions(files=files, ids=[i["id"] for i in items])
+    items = [
+        i
+        for i in items
+        if i["id"] not in synced or synced[i["id"]] != i["properties"].get(UPDATED)
+    ]
+    if len(items) > 0:
+        write_snapshot_part(items=items, collection_id=collection_id, root=root)
+        _remove_items(files=files, ids=[i["id"] for i in items if i["id"] in synced])
+        updated = [
+            _to_utc_timestamp(i["properties"][UPDATED])
+            for i in items
+            if i["properties"].get(UPDATED) is not None
+        ]
+        if len(updated) < len(items):
+            logger.warning(
+                f"Items of {collection_id} have no {UPDATED} property, so they cannot be "
+                "synced incrementally and the next sync exports all items"
+            )
+        else:
+            new_watermark = max(updated)
+            if watermark is not None:
+                new_watermark = max(new_watermark, watermark)
+            _write_watermark(path=path, watermark=new_watermark)
+    logger.info(f"{len(items)} items of {collection_id} have been synced")
+    return len(items)
+
+
+def _read_watermark(path: Path) -> Optional[pd.Timestamp]:
+    try:
+        with open(path / WATERMARK_FILENAME) as f:
+            return _to_utc_timestamp(json.load(f)[UPDATED])
+    except FileNotFoundError:
+        return None
+
+
+def _write_watermark(path: Path, watermark: pd.Timestamp) -> None:
+    tmp_path = path / f"{WATERMARK_FILENAME}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({UPDATED: watermark.isoformat()}, f)
+    os.replace(tmp_path, path / WATERMARK_FILENAME)
+
+
+def _get_synced_versions(files: List[Path], ids: List[str]) -> Dict[str, Optional[str]]:
+    """get the "updated" property of the items of the snapshot whose IDs are in ids"""
+    synced: Dict[str, Optional[str]] = dict()
+    if len(files) == 0 or len(ids) == 0:
+        return synced
+    dataset = _open_dataset(path=files[0].parent)
+    column = f"{PROPERTIES_PREFIX}{UPDATED}"
+    columns = [ID, column] if column in dataset.schema.names else [ID]
+    table = dataset.to_table(columns=columns, filter=ds.field(ID).isin(ids))
+    for row in table.to_pylist():
+        synced[row[ID]] = row.get(column)
+    return synced
+
+
+def _remove_items(files: List[Path], ids: List[str]) -> None:
+    """remove the rows of the items whose IDs are in ids, e.g., because they have been
+    replaced by a newer part"""
+    if len(ids) == 0:
+        return
+    for filename in files:
+        table = pq.read_table(filename)
+        mask = pc.is_in(table.column(ID), value_set=pa.array(ids))
+        if not pc.any(mask).as_py():
+            continue
+        table = table.filter(pc.invert(mask))
+        if table.num_rows == 0:
+            filename.unlink()
+            continue
+        tmp_path = filename.with_suffix(".tmp")
+        pq.write_table(table, tmp_path, row_group_size=STAC_GEOPARQUET_ROW_GROUP_SIZE)
+        os.replace(tmp_path, filename)
+
+
+@click.command()
+@click.argument("collection_ids", nargs=-1, required=True)
+@click.option(
+    "--root",
+    default=STAC_GEOPARQUET_DIR,
+    help="Directory of the snapshots. Default: STAC_GEOPARQUET_DIR",
+)
+def sync_command(collection_ids: Tuple[str, ...], root: Optional[str]):
+    """Pull items added or updated since the last sync of the local stac-geoparquet snapshot
+    of each collection."""
+    assert root is not None, "Error! STAC_GEOPARQUET_DIR is not set"
+    for collection_id in collection_ids:
+        num_items = sync_snapshot(collection_id=collection_id, root=root)
+        print(f"{collection_id}: {num_items} new or updated items")
+
+
+if __name__ == "__main__":
+    sync_command()
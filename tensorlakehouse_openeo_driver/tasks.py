@@ -1,6 +1,7 @@
+import copy
 from pathlib import Path
 from openeo_pg_parser_networkx import OpenEOProcessGraph
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from celery import Celery
 from celery import states
 from tensorlakehouse_openeo_driver.constants import (
@@ -13,8 +14,15 @@ from shapely.geometry.polygon import Polygon
 from shapely.ops import unary_union
 import geopandas
 from tensorlakehouse_openeo_driver.file_reader.cos_parser import COSConnector
+from tensorlakehouse_openeo_driver.file_reader import gdal_io_profiles
+from tensorlakehouse_openeo_driver.file_reader.gdal_io_profiles import (
+    GDAL_IO_PROFILE_JOB_OPTION,
+)
 import pandas as pd
 
+from tensorlakehouse_openeo_driver.process_graph_optimizer import (
+    optimize_process_graph,
+)
 from tensorlakehouse_openeo_driver.processing import TensorlakehouseProcessing
 from tensorlakehouse_openeo_driver.save_result import GeoDNImageCollectionResult
 
@@ -60,6 +68,9 @@ def create_batch_jobs(
     )
     # parse process graph
     processing = TensorlakehouseProcessing()
+    process = _apply_job_options(process=process, job_options=job_options)
+    # optimize the process graph the same way as synchronous requests
+    process = optimize_process_graph(process_graph=process)
     parsed_graph = OpenEOProcessGraph(pg_data=process)
     pg_callable = parsed_graph.to_callable(process_registry=processing.process_registry)
     # execute the process graph, i.e., traverse all nodes and execute each one of them
@@ -96,6 +107,31 @@ def create_batch_jobs(
     return metadata
 
 
+def _apply_job_options(
+    process: Dict[str, Any], job_options: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """set the arguments of load_collection nodes that are specified by job options, i.e., the
+    GDAL I/O profile (gdal-io-profile)
+
+    Args:
+        process (Dict[str, Any]): json that contains the process graph
+        job_options (Optional[Dict[str, Any]]): job options specified by the user
+
+    Returns:
+        Dict[str, Any]: copy of process
+    """
+    process = copy.deepcopy(process)
+    if job_options is None or job_options.get(GDAL_IO_PROFILE_JOB_OPTION) is None:
+        return process
+    io_profile = job_options[GDAL_IO_PROFILE_JOB_OPTION]
+    # fail before any data is loaded if the profile is invalid
+    gdal_io_profiles.get_gdal_env(profile=io_profile)
+    for node in process["process_graph"].values():
+        if node["process_id"] == "load_collection":
+            node["arguments"]["io_profile"] = io_profile
+    return process
+
+
 def _extract_metadata(process: Dict[str, Any]) -> Dict:
     """extract metadata (geometry, time interval) from the process graph
 
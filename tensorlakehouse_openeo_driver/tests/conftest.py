@@ -25,6 +25,13 @@ from openeo_driver.util.logging import (
 )
 
 from openeo_driver.views import build_app
+from tensorlakehouse_openeo_driver.stac import (
+    invalidate_collection_cache,
+    reset_stac_client,
+)
+from tensorlakehouse_openeo_driver.process_implementations.load_collection import (
+    invalidate_search_cache,
+)
 
 
 # pytest_plugins = "pytester"
@@ -59,6 +66,19 @@ def pytest_configure(config):
     time.tzset()
 
 
+@pytest.fixture(autouse=True)
+def fresh_stac_client():
+    # the STAC client and caches are shared by the whole process, so tests that mock
+    # Client.open need new ones
+    reset_stac_client()
+    invalidate_collection_cache()
+    invalidate_search_cache()
+    yield
+    reset_stac_client()
+    invalidate_collection_cache()
+    invalidate_search_cache()
+
+
 @pytest.fixture(scope="module")
 def backend_implementation() -> TensorLakeHouseBackendImplementation:
     return TensorLakeHouseBackendImplementation()
@@ -0,0 +1,35 @@
+from unittest.mock import patch
+
+from tensorlakehouse_openeo_driver.util.cache import TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=4, ttl=60, sizeof=len)
+    cache.set("a", [1, 2])
+    cache.set("b", [1])
+    # touch "a" so that "b" becomes the least recently used entry
+    assert cache.get("a") == [1, 2]
+    cache.set("c", [1, 2])
+    assert cache.get("b") is None
+    assert cache.get("a") == [1, 2]
+    assert cache.size == 4
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(max_size=10, ttl=60)
+    with patch("time.monotonic", return_value=0):
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=120)
+    with patch("time.monotonic", return_value=90):
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+
+
+def test_ttl_cache_invalidate_by_tag():
+    cache = TTLCache(max_size=10, ttl=60)
+    cache.set("a", 1, tag="HLSS30")
+    cache.set("b", 2, tag="HLSS30")
+    cache.set("c", 3, tag="Global_weather_ERA5")
+    assert cache.invalidate(tag="HLSS30") == 2
+    assert cache.get("a") is None
+    assert cache.get("c") == 3
@@ -0,0 +1,600 @@
+import copy
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+import pyproj
+import pytest
+import rasterio
+import stackstac
+from rasterio.transform import from_origin
+from rasterio.vrt import WarpedVRT
+import xarray as xr
+
+from tensorlakehouse_openeo_driver import geospatial_utils
+from tensorlakehouse_openeo_driver.constants import (
+    COG_PIXEL_DRILL_MAX_SIZE,
+    DEFAULT_BANDS_DIMENSION,
+)
+from tensorlakehouse_openeo_driver.file_reader.cog_file_reader import (
+    BLOCK_SHAPE_FIELD,
+    COGFileReader,
+)
+from tensorlakehouse_openeo_driver.file_reader.gdal_io_profiles import get_gdal_env
+from tensorlakehouse_openeo_driver.process_implementations.load_collection import (
+    LoadCollectionFromCOS,
+)
+from tensorlakehouse_openeo_driver.tests.unit.unit_test_util import (
+    HLSS30_ITEMS,
+    MockTemporalInterval,
+)
+
+CREDENTIALS = {
+    "access_key_id": "fake-key",
+    "secret_access_key": "fake-secret",
+    "endpoint": "s3.us-east.cloud-object-storage.appdomain.cloud",
+}
+
+
+def _make_band_array(band: str, x: list, value: float) -> xr.DataArray:
+    return xr.DataArray(
+        np.full((1, 1, 2, len(x)), value),
+        coords={
+            "time": pd.to_datetime(["2023-08-30"]),
+            DEFAULT_BANDS_DIMENSION: [band],
+            "y": [1.5, 0.5],
+            "x": x,
+        },
+        dims=["time", DEFAULT_BANDS_DIMENSION, "y", "x"],
+    ).chunk()
+
+
+def _create_cog(path: Path, value: int, blocksize: int = 512) -> None:
+    data = (np.arange(512 * 512) % 1000 + value).astype(np.uint16).reshape(512, 512)
+    with rasterio.open(
+        path,
+        "w",
+        driver="COG",
+        width=512,
+        height=512,
+        count=1,
+        dtype="uint16",
+        crs="EPSG:32618",
+        transform=from_origin(699960, 5000040, 30, 30),
+        nodata=0,
+        blocksize=blocksize,
+    ) as dst:
+        dst.write(data, 1)
+
+
+def test_drill_pixels(tmp_path: Path):
+    items = copy.deepcopy(list(HLSS30_ITEMS[1:3]))
+    paths = list()
+    for index, item in enumerate(items):
+        path = tmp_path / f"{index}.tif"
+        _create_cog(path=path, value=index * 1000)
+        item["assets"]["data"]["href"] = str(path)
+        paths.append(path)
+    lon, lat = pyproj.Transformer.from_crs(32618, 4326, always_xy=True).transform(
+        705000, 4995000
+    )
+    bbox = (lon - 0.0002, lat - 0.0002, lon + 0.0002, lat + 0.0002)
+    with patch(
+        "tensorlakehouse_openeo_driver.util.object_storage_util.get_credentials_by_bucket",
+        return_value=CREDENTIALS,
+    ):
+        reader = COGFileReader(
+            items=items,
+            bands=["B8A", "B12"],
+            bbox=bbox,
+            temporal_extent=(datetime(2023, 8, 1), datetime(2023, 9, 1)),
+            properties=None,
+        )
+    with patch.object(reader, "_load_items_using_stackstac") as mock_load:
+        data_array = reader.load_items()
+    mock_load.assert_not_called()
+    assert data_array.chunks is None
+    assert list(data_array[DEFAULT_BANDS_DIMENSION].values) == ["B8A", "B12"]
+    assert data_array.sizes["time"] == 1
+    assert 1 <= data_array.sizes["x"] <= COG_PIXEL_DRILL_MAX_SIZE
+    # values of the pixels whose top-left corners are the coordinates
+    for index, path in enumerate(paths):
+        with rasterio.open(path) as src:
+            for y in data_array["y"].values:
+                for x in data_array["x"].values:
+                    expected = next(src.sample([(x + 15, y - 15)]))[0]
+                    actual = data_array.isel(time=0, bands=index).sel(x=x, y=y).item()
+                    assert actual == expected
+
+
+def test_drill_pixels_native_dtype(tmp_path: Path):
+    items = copy.deepcopy(list(HLSS30_ITEMS[1:3]))
+    for index, item in enumerate(items):
+        path = tmp_path / f"{index}.tif"
+        _create_cog(path=path, value=index * 1000)
+        item["assets"]["data"]["href"] = str(path)
+        item["assets"]["data"]["raster:bands"] = [{"data_type": "uint16", "nodata": 0}]
+    lon, lat = pyproj.Transformer.from_crs(32618, 4326, always_xy=True).transform(
+        705000, 4995000
+    )
+    bbox = (lon - 0.0002, lat - 0.0002, lon + 0.0002, lat + 0.0002)
+    with patch(
+        "tensorlakehouse_openeo_driver.util.object_storage_util.get_credentials_by_bucket",
+        return_value=CREDENTIALS,
+    ):
+        reader = COGFileReader(
+            items=items,
+            bands=["B8A", "B12"],
+            bbox=bbox,
+            temporal_extent=(datetime(2023, 8, 1), datetime(2023, 9, 1)),
+            properties=None,
+        )
+    with patch(
+        "tensorlakehouse_openeo_driver.file_reader.cog_file_reader.COG_DTYPE", "native"
+    ):
+        data_array = reader.load_items()
+    assert data_array.dtype == np.uint16
+    assert data_array.rio.nodata == 0
+    float_array = geospatial_utils.mask_nodata(data_array=data_array)
+    assert float_array.dtype == np.float32
+    np.testing.assert_array_equal(float_array.values, data_array.values)
+
+
+@pytest.mark.parametrize(
+    "mosaic_order, expected_index", [("first", 0), ("least-cloudy", 1)]
+)
+def test_drill_pixels_mosaic_order(
+    tmp_path: Path, mosaic_order: str, expected_index: int
+):
+    # two overlapping items of the same band and timestamp
+    items = [copy.deepcopy(HLSS30_ITEMS[1]) for _ in range(2)]
+    paths = list()
+    for index, (item, cloud_cover) in enumerate(zip(items, [80, 10])):
+        path = tmp_path / f"{index}.tif"
+        _create_cog(path=path, value=index * 1000 + 1)
+        item["id"] = f"{item['id']}.{index}"
+        item["assets"]["data"]["href"] = str(path)
+        item["properties"]["eo:cloud_cover"] = cloud_cover
+        paths.append(path)
+    lon, lat = pyproj.Transformer.from_crs(32618, 4326, always_xy=True).transform(
+        705000, 4995000
+    )
+    bbox = (lon - 0.0002, lat - 0.0002, lon + 0.0002, lat + 0.0002)
+    with patch(
+        "tensorlakehouse_openeo_driver.util.object_storage_util.get_credentials_by_bucket",
+        return_value=CREDENTIALS,
+    ):
+        reader = COGFileReader(
+            items=items,
+            bands=["B8A"],
+            bbox=bbox,
+            temporal_extent=(datetime(2023, 8, 1), datetime(2023, 9, 1)),
+            properties=None,
+        )
+    with patch(
+        "tensorlakehouse_openeo_driver.file_reader.cog_file_reader.COG_MOSAIC_ORDER",
+        mosaic_order,
+    ):
+        data_array = reader.load_items()
+    assert data_array.sizes["time"] == 1
+    x = data_array["x"].values[0]
+    y = data_array["y"].values[0]
+    with rasterio.open(paths[expected_index]) as src:
+        expected = next(src.sample([(x + 15, y - 15)]))[0]
+    assert data_array.isel(time=0, bands=0).sel(x=x, y=y).item() == expected
+
+
+class FieldsFilteringStacClient:
+    """STAC client that returns only the properties in the includes of the fields extension,
+    as the STAC service does"""
+
+    def __init__(self, items: List[Dict[str, Any]]) -> None:
+        self.items = items
+        self.search_kwargs: List[Dict[str, Any]] = list()
+
+    def search(self, **kwargs):
+        self.search_kwargs.append(kwargs)
+        includes = {
+            field.removeprefix("properties.")
+            for field in kwargs["fields"]["includes"]
+            if field.startswith("properties.")
+        }
+        items = [
+            {
+                **item,
+                "properties": {
+                    k: v for k, v in item["properties"].items() if k in includes
+                },
+            }
+            for item in self.items
+        ]
+        result = MagicMock()
+        result.items_as_dicts.side_effect = lambda: iter(copy.deepcopy(items))
+        return result
+
+
+@pytest.mark.parametrize(
+    "mosaic_order, expected_index", [("first", 0), ("least-cloudy", 1)]
+)
+def test_mosaic_order_of_searched_items(
+    tmp_path: Path, mosaic_order: str, expected_index: int
+):
+    # two overlapping items of the same band and timestamp, the second one is less cloudy
+    stac_items = [copy.deepcopy(HLSS30_ITEMS[1]) for _ in range(2)]
+    paths = list()
+    for index, (item, cloud_cover) in enumerate(zip(stac_items, [80, 10])):
+        path = tmp_path / f"{index}.tif"
+        _create_cog(path=path, value=index * 1000 + 1)
+        item["id"] = f"{item['id']}.{index}"
+        item["assets"]["data"]["href"] = str(path)
+        item["properties"]["eo:cloud_cover"] = cloud_cover
+        paths.append(path)
+    lon, lat = pyproj.Transformer.from_crs(32618, 4326, always_xy=True).transform(
+        705000, 4995000
+    )
+    bbox = (lon - 0.0002, lat - 0.0002, lon + 0.0002, lat + 0.0002)
+    stac_client = FieldsFilteringStacClient(items=stac_items)
+    with patch(
+        "tensorlakehouse_openeo_driver.file_reader.cog_file_reader.COG_MOSAIC_ORDER",
+        mosaic_order,
+    ):
+        with patch(
+            "tensorlakehouse_openeo_driver.process_implementations.load_collection.get_stac_client",
+            return_value=stac_client,
+        ):
+            items = LoadCollectionFromCOS()._search_items(
+                bbox=bbox,
+                temporal_extent=MockTemporalInterval(
+                    start=pd.Timestamp("2023-08-01"), end=pd.Timestamp("2023-09-01")
+                ),
+                collection_id="HLSS30",
+            )
+        includes = stac_client.search_kwargs[0]["fields"]["includes"]
+        assert ("properties.eo:cloud_cover" in includes) == (
+            mosaic_order == "least-cloudy"
+        )
+        with patch(
+            "tensorlakehouse_openeo_driver.util.object_storage_util.get_credentials_by_bucket",
+            return_value=CREDENTIALS,
+        ):
+            reader = COGFileReader(
+                items=items,
+                bands=["B8A"],
+                bbox=bbox,
+                temporal_extent=(datetime(2023, 8, 1), datetime(2023, 9, 1)),
+                properties=None,
+            )
+        data_array = reader.load_items()
+    x = data_array["x"].values[0]
+    y = data_array["y"].values[0]
+    with rasterio.open(paths[expected_index]) as src:
+        expected = next(src.sample([(x + 15, y - 15)]))[0]
+    assert data_array.isel(time=0, bands=0).sel(x=x, y=y).item() == expected
+
+
+def test_read_pixels_gdal_env(tmp_path: Path):
+    path = tmp_path / "0.tif"
+    _create_cog(path=path, value=1)
+    events = list()
+
+    class FakeEnv:
+        def __init__(self, name: str):
+            self.name = name
+
+        def __enter__(self):
+            events.append(f"enter {self.name}")
+
+        def __exit__(self, *args):
+            events.append(f"exit {self.name}")
+
+    class FakeLayeredEnv:
+        open = FakeEnv(name="open")
+        read = FakeEnv(name="read")
+
+    original_read = WarpedVRT.read
+
+    def fake_read(self, *args, **kwargs):
+        events.append("read pixels")
+        return original_read(self, *args, **kwargs)
+
+    with patch.object(WarpedVRT, "read", fake_read):
+        values = COGFileReader._read_pixels(
+            href=str(path),
+            gdal_env=FakeLayeredEnv(),
+            epsg=32618,
+            transform=from_origin(705000, 4995000, 30, 30),
+            width=2,
+            height=2,
+        )
+    assert values.shape == (2, 2)
+    # dataset is opened under the "open" options and read under the "read" options
+    assert events == [
+        "enter open",
+        "exit open",
+        "enter read",
+        "read pixels",
+        "exit read",
+    ]
+
+
+def test_get_mosaic_order():
+    data_array = _make_band_array(band="B02", x=[0.5, 1.5], value=1.0)
+    data_array = xr.concat([data_array] * 3, dim="time").assign_coords(
+        {"eo:cloud_cover": ("time", np.array([30, None, 5], dtype=object))}
+    )
+    with patch(
+        "tensorlakehouse_openeo_driver.file_reader.cog_file_reader.COG_MOSAIC_ORDER",
+        "least-cloudy",
+    ):
+        order = COGFileReader._get_mosaic_order(data_array=data_array)
+    np.testing.assert_array_equal(order, [30.0, np.inf, 5.0])
+    assert COGFileReader._get_mosaic_order(data_array=data_array) is None
+
+
+@pytest.mark.parametrize(
+    "cog_dtype, raster_bands, expected_dtype, expected_nodata",
+    [
+        ("float64", [{"data_type": "uint16", "nodata": 0}], np.float64, np.nan),
+        ("float32", None, np.float32, np.nan),
+        ("native", [{"data_type": "uint16", "nodata": 0}], np.uint16, 0),
+        ("native", [{"data_type": "int16", "nodata": -9999}], np.int16, -9999),
+        ("native", [{"data_type": "float32", "nodata": -9999}], np.float32, np.nan),
+        # missing pixels cannot be told apart from valid ones
+        ("native", [{"data_type": "uint16"}], np.float32, np.nan),
+        ("native", [{"data_type": "uint8", "nodata": "nan"}], np.float32, np.nan),
+        ("native", None, np.float32, np.nan),
+    ],
+)
+def test_get_dtype_and_nodata(cog_dtype, raster_bands, expected_dtype, expected_nodata):
+    items = copy.deepcopy(list(HLSS30_ITEMS[1:3]))
+    for item in items:
+        item["assets"]["data"]["raster:bands"] = raster_bands
+    with patch(
+        "tensorlakehouse_openeo_driver.file_reader.cog_file_reader.COG_DTYPE", cog_dtype
+    ):
+        dtype, nodata = COGFileReader._get_dtype_and_nodata(
+            items=items, assets=["data"]
+        )
+    assert dtype == expected_dtype
+    np.testing.assert_equal(nodata, expected_nodata)
+
+
+def test_load_items():
+    items = copy.deepcopy(list(HLSS30_ITEMS[1:3]))
+
+    def fake_load(items, bbox, bands, epsg, resolution, **kwargs):
+        return _make_band_array(band=bands[0], x=[0.5, 1.5], value=len(items))
+
+    with patch(
+        "tensorlakehouse_openeo_driver.util.object_storage_util.get_credentials_by_bucket",
+        return_value=CREDENTIALS,
+    ):
+        reader = COGFileReader(
+            items=items,
+            bands=["B8A", "B12"],
+            bbox=(-72.0, 44.0, -71.0, 45.0),
+            temporal_extent=(datetime(2023, 8, 1), datetime(2023, 9, 1)),
+            properties=None,
+        )
+    with patch.object(
+        reader, "_load_items_using_stackstac", side_effect=fake_load
+    ) as mock_load:
+        data_array = reader.load_items()
+    assert mock_load.call_count == 2
+    assert list(data_array[DEFAULT_BANDS_DIMENSION].values) == ["B8A", "B12"]
+
+
+def test_split_and_concat_batches():
+    items = copy.deepcopy(list(HLSS30_ITEMS))
+    items[0]["properties"]["datetime"] = "2023-08-31T15:38:21Z"
+    batches = COGFileReader._split_into_batches(items=items, batch_size=2)
+    assert [len(batch) for batch in batches] == [2, 1]
+    # batches are time-ordered
+    assert batches[1][0]["properties"]["datetime"] == "2023-08-31T15:38:21Z"
+    first = _make_band_array(band="B02", x=[0.5, 1.5], value=1.0)
+    first[0, 0, 0, 0] = np.nan
+    second = _make_band_array(band="B02", x=[0.5, 1.5], value=2.0)
+    third = _make_band_array(band="B02", x=[0.5, 1.5], value=3.0).assign_coords(
+        time=pd.to_datetime(["2023-08-31"])
+    )
+    data_array = COGFileReader._concat_batches(data_arrays=[first, second, third])
+    assert data_array.chunks is not None
+    # the timestamp that is split across batches is merged
+    assert data_array.sizes["time"] == 2
+    np.testing.assert_array_equal(
+        data_array.isel(time=0, bands=0).values, [[2.0, 1.0], [1.0, 1.0]]
+    )
+
+
+@pytest.mark.parametrize(
+    "target_resolution, target_epsg, max_output_size, expected_resolution",
+    [
+        (None, None, 0, 30.0),
+        (30.0, None, 0, 30.0),
+        (100.0, None, 0, 60.0),
+        (120.0, 32618, 0, 120.0),
+        # resolution given in degrees is converted to meters, i.e., ~80 m and ~800 m
+        (0.001, 4326, 0, 60.0),
+        (0.01, 4326, 0, 480.0),
+        # bbox is ~80 km wide, so 1000 pixels require ~80 m resolution
+        (None, None, 1000, 60.0),
+        # overview levels are capped by COG_MAX_OVERVIEW_LEVEL
+        (1e9, None, 0, 30.0 * 2**8),
+    ],
+)
+def test_get_overview_resolution(
+    target_resolution, target_epsg, max_output_size, expected_resolution
+):
+    with patch(
+        "tensorlakehouse_openeo_driver.file_reader.cog_file_reader.COG_MAX_OUTPUT_SIZE",
+        max_output_size,
+    ):
+        resolution = COGFileReader._get_overview_resolution(
+            bbox=(-72.0, 44.0, -71.0, 45.0),
+            epsg=32618,
+            resolution=30.0,
+            target_resolution=target_resolution,
+            target_epsg=target_epsg,
+        )
+    assert resolution == pytest.approx(expected_resolution)
+
+
+@pytest.mark.parametrize(
+    "profile", [None, "default", "latency", "throughput", "low-memory"]
+)
+def test_get_gdal_env(profile):
+    gdal_env = get_gdal_env(profile=profile)
+    # options of stackstac are kept
+    assert gdal_env.always.options["GDAL_HTTP_MERGE_CONSECUTIVE_RANGES"] == "YES"
+    assert gdal_env.open.options["GDAL_DISABLE_READDIR_ON_OPEN"] == "EMPTY_DIR"
+
+
+def test_get_gdal_env_unknown_profile():
+    with pytest.raises(AssertionError):
+        get_gdal_env(profile="fast")
+
+
+@pytest.mark.parametrize(
+    "bbox, num_times, expected_chunksize",
+    [
+        # ~3 km x 3 km, so the whole area fits in a chunk and chunks span many timestamps
+        ((-71.52, 44.49, -71.48, 44.51), 1000, (515, 1, 79, 103)),
+        ((-71.52, 44.49, -71.48, 44.51), 5, (5, 1, 79, 103)),
+        # ~80 km x 110 km, so each timestamp is split into chunks of whole tiles
+        ((-72.0, 44.0, -71.0, 45.0), 10, (1, 1, 2048, 2048)),
+    ],
+)
+def test_get_chunksize(bbox, num_times, expected_chunksize):
+    with patch(
+        "tensorlakehouse_openeo_driver.file_reader.cog_file_reader.DASK_WORKER_MEMORY",
+        4 * 1024**3,
+    ), patch(
+        "tensorlakehouse_openeo_driver.file_reader.cog_file_reader.DASK_CHUNKS_PER_WORKER",
+        128,
+    ):
+        chunksize = COGFileReader._get_chunksize(
+            num_times=num_times, bbox=bbox, epsg=32618, resolution=30.0
+        )
+    assert chunksize == expected_chunksize
+
+
+def test_get_chunksize_of_block_shape():
+    with patch(
+        "tensorlakehouse_openeo_driver.file_reader.cog_file_reader.DASK_WORKER_MEMORY",
+        4 * 1024**3,
+    ), patch(
+        "tensorlakehouse_openeo_driver.file_reader.cog_file_reader.DASK_CHUNKS_PER_WORKER",
+        128,
+    ):
+        chunksize = COGFileReader._get_chunksize(
+            num_times=10,
+            bbox=(-72.0, 44.0, -71.0, 45.0),
+            epsg=32618,
+            resolution=30.0,
+            block_shape=(256, 384),
+        )
+    # 2048 x 2048 pixels fit in a chunk
+    assert chunksize == (1, 1, 2048, 1920)
+
+
+@pytest.mark.parametrize(
+    "asset_block_shapes, expected_block_shape",
+    [
+        ([[256, 256], [256, 256]], (256, 256)),
+        ([[128, 256], [128, 256]], (128, 256)),
+        # COGs that do not share the same shape or whose shape is unknown
+        ([[256, 256], [512, 512]], (512, 512)),
+        ([[256, 256], None], (512, 512)),
+    ],
+)
+def test_get_block_shape(asset_block_shapes, expected_block_shape):
+    items = copy.deepcopy(list(HLSS30_ITEMS[1:3]))
+    for item, block_shape in zip(items, asset_block_shapes):
+        if block_shape is not None:
+            item["assets"]["data"][BLOCK_SHAPE_FIELD] = block_shape
+    block_shape = COGFileReader._get_block_shape(items=items, assets=["data"])
+    assert block_shape == expected_block_shape
+
+
+def test_get_aligned_bounds():
+    bounds = (702000.0, 4987000.0, 712020.0, 4997020.0)
+    origin = COGFileReader._get_tile_origin(items=HLSS30_ITEMS[1:3], epsg=32618)
+    assert origin == (699960, 5000040)
+    aligned_bounds = COGFileReader._get_aligned_bounds(
+        bounds=bounds,
+        resolution=30.0,
+        chunksize=(1, 1, 128, 128),
+        block_shape=(128, 128),
+        origin=origin,
+    )
+    # top-left corner is moved to the corner of the tile that contains it
+    assert aligned_bounds == (699960.0, 4987000.0, 712020.0, 5000040.0)
+    # a single chunk covers the bounds
+    assert (
+        COGFileReader._get_aligned_bounds(
+            bounds=bounds,
+            resolution=30.0,
+            chunksize=(1, 1, 1024, 1024),
+            block_shape=(128, 128),
+            origin=origin,
+        )
+        == bounds
+    )
+    # pixels of the output grid do not match the pixels of the tiles
+    assert (
+        COGFileReader._get_aligned_bounds(
+            bounds=bounds,
+            resolution=240.0,
+            chunksize=(1, 1, 128, 128),
+            block_shape=(128, 128),
+            origin=origin,
+        )
+        == bounds
+    )
+
+
+def test_load_items_using_stackstac_aligns_chunks_to_tiles(tmp_path: Path):
+    item = copy.deepcopy(HLSS30_ITEMS[1])
+    path = tmp_path / "file.tif"
+    _create_cog(path=path, value=0, blocksize=128)
+    item["assets"]["data"]["href"] = str(path)
+    item["assets"]["data"][BLOCK_SHAPE_FIELD] = [128, 128]
+    transformer = pyproj.Transformer.from_crs(32618, 4326, always_xy=True)
+    west, south = transformer.transform(702000, 4987000)
+    east, north = transformer.transform(712000, 4997000)
+    bbox = (west, south, east, north)
+    with patch(
+        "tensorlakehouse_openeo_driver.util.object_storage_util.get_credentials_by_bucket",
+        return_value=CREDENTIALS,
+    ):
+        reader = COGFileReader(
+            items=[item],
+            bands=["B8A"],
+            bbox=bbox,
+            temporal_extent=(datetime(2023, 8, 1), datetime(2023, 9, 1)),
+            properties=None,
+        )
+    module = "tensorlakehouse_openeo_driver.file_reader.cog_file_reader"
+    # chunks of a single tile
+    with patch(f"{module}.DASK_WORKER_MEMORY", 128 * 128 * 8), patch(
+        f"{module}.DASK_CHUNKS_PER_WORKER", 1
+    ):
+        data_array = reader._load_items_using_stackstac(
+            items=[item], bbox=bbox, bands=["B8A"], epsg=32618, resolution=30.0
+        )
+    # the grid is the same that stackstac creates from bbox
+    expected = stackstac.stack(
+        [item], epsg=32618, resolution=30.0, bounds_latlon=bbox, rescale=False
+    )
+    np.testing.assert_allclose(data_array["x"].values, expected["x"].values)
+    np.testing.assert_allclose(data_array["y"].values, expected["y"].values)
+    np.testing.assert_array_equal(data_array.values, expected.values)
+    # but chunks start at the corners of the tiles
+    tile_size = 128 * 30.0
+    for index in np.cumsum(data_array.chunks[-1])[:-1]:
+        assert (float(data_array["x"][index]) - 699960) % tile_size == 0
+    for index in np.cumsum(data_array.chunks[-2])[:-1]:
+        assert (5000040 - float(data_array["y"][index])) % tile_size == 0
@@ -0,0 +1,153 @@
+import io
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+from tensorlakehouse_openeo_driver.util import cog_header_cache
+
+HREF = "s3://my-bucket/path/to/file.tif"
+
+
+class FakeS3Client:
+    """serves a local file as if it was stored in a bucket"""
+
+    def __init__(self, path: Path, etag: str) -> None:
+        self.data = path.read_bytes()
+        self.etag = etag
+        self.calls: Dict[str, int] = {"get_object": 0, "head_object": 0}
+
+    def get_object(self, **kwargs):
+        self.calls["get_object"] += 1
+        start, end = map(int, kwargs["Range"].replace("bytes=", "").split("-"))
+        return {
+            "ETag": self.etag,
+            "ContentRange": f"bytes {start}-{end}/{len(self.data)}",
+            "Body": io.BytesIO(self.data[start : end + 1]),  # noqa: E203
+        }
+
+    def head_object(self, **kwargs):
+        self.calls["head_object"] += 1
+        return {"ETag": self.etag}
+
+
+def _create_cog(path: Path) -> np.ndarray:
+    data = np.arange(512 * 512, dtype=np.uint16).reshape(512, 512)
+    with rasterio.open(
+        path,
+        "w",
+        driver="COG",
+        width=512,
+        height=512,
+        count=1,
+        dtype="uint16",
+        crs="EPSG:32618",
+        transform=from_origin(600000, 5000000, 30, 30),
+        blocksize=128,
+    ) as dst:
+        dst.write(data, 1)
+    return data
+
+
+def test_get_cached_href(tmp_path: Path):
+    cog_path = tmp_path / "file.tif"
+    data = _create_cog(path=cog_path)
+    root = tmp_path / "cache"
+    root.mkdir()
+    s3_client = FakeS3Client(path=cog_path, etag='"v1"')
+    with patch.object(cog_header_cache, "_get_gdal_path", return_value=str(cog_path)):
+        href = cog_header_cache.get_cached_href(
+            href=HREF, s3_client=s3_client, root=str(root)
+        )
+        assert href.startswith("/vsisparse/")
+        with rasterio.open(href) as src:
+            np.testing.assert_array_equal(src.read(1), data)
+            assert len(src.overviews(1)) > 0
+        # header is served from the cache
+        assert (
+            cog_header_cache.get_cached_href(
+                href=HREF, s3_client=s3_client, root=str(root)
+            )
+            == href
+        )
+        assert s3_client.calls == {"get_object": 1, "head_object": 0}
+        # a new ETag invalidates the cached header
+        s3_client.etag = '"v2"'
+        with patch.object(cog_header_cache, "COG_HEADER_CACHE_TTL", -1):
+            new_href = cog_header_cache.get_cached_href(
+                href=HREF, s3_client=s3_client, root=str(root)
+            )
+    assert new_href != href
+    assert s3_client.calls == {"get_object": 2, "head_object": 1}
+
+
+def test_get_header_length(tmp_path: Path):
+    cog_path = tmp_path / "file.tif"
+    _create_cog(path=cog_path)
+    data = cog_path.read_bytes()
+    complete, header_length = cog_header_cache._get_header_length(data=data)
+    assert complete
+    # tiles are stored after the header
+    with rasterio.open(cog_path) as src:
+        tile_offset = int(src.get_tag_item("BLOCK_OFFSET_0_0", "TIFF", bidx=1))
+    assert header_length <= tile_offset
+    complete, required = cog_header_cache._get_header_length(data=data[:20])
+    assert not complete
+    assert required > 20
+
+
+def test_evict(tmp_path: Path):
+    for index in range(3):
+        path = tmp_path / f"{index}.hdr"
+        path.write_bytes(b"0" * 100)
+        path.with_suffix(".xml").write_text("")
+        # first header is the least recently used
+        os.utime(path, (1000000 + index, 1000000 + index))
+    cog_header_cache._evict(root=str(tmp_path), max_bytes=250, min_age=3600)
+    assert sorted(p.name for p in tmp_path.glob("*.hdr")) == ["1.hdr", "2.hdr"]
+    assert not (tmp_path / "0.xml").exists()
+
+
+def test_evict_keeps_recently_used(tmp_path: Path):
+    now = time.time()
+    for index in range(3):
+        path = tmp_path / f"{index}.hdr"
+        path.write_bytes(b"0" * 100)
+        path.with_suffix(".xml").write_text("")
+        # headers 1 and 2 are still used by running jobs
+        os.utime(path, (now - 7200 + index * 3600, now - 7200 + index * 3600))
+    cog_header_cache._evict(root=str(tmp_path), max_bytes=0, min_age=5400)
+    assert sorted(p.name for p in tmp_path.glob("*.hdr")) == ["1.hdr", "2.hdr"]
+
+
+class FakeDaskClient:
+    """runs a function on each worker, whose file system is the local one unless it is
+    mounted at another path"""
+
+    def __init__(self, mounts: Dict[str, Optional[Path]]) -> None:
+        self.mounts = mounts
+
+    def run(self, function, path: str):
+        results = dict()
+        for worker, mount in self.mounts.items():
+            results[worker] = function(path if mount is None else str(mount / "x"))
+        return results
+
+
+def test_check_cache_dir(tmp_path: Path):
+    root = tmp_path / "cache"
+    client = FakeDaskClient(mounts={"tcp://worker-1": None, "tcp://worker-2": None})
+    cog_header_cache.check_cache_dir(client=client, root=str(root))
+    # the check file is removed
+    assert list(root.iterdir()) == []
+    client = FakeDaskClient(mounts={"tcp://worker-1": None, "tcp://worker-2": tmp_path})
+    with pytest.raises(AssertionError, match="worker-2"):
+        cog_header_cache.check_cache_dir(client=client, root=str(root))
+    with pytest.raises(AssertionError, match="absolute"):
+        cog_header_cache.check_cache_dir(client=client, root="cache")
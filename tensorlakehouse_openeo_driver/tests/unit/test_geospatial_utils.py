@@ -8,6 +8,10 @@ from tensorlakehouse_openeo_driver.constants import (
 from tensorlakehouse_openeo_driver.geospatial_utils import (
     remove_repeated_time_coords,
     clip_box,
+    filter_by_time,
+    has_timestamps_within,
+    mask_nodata,
+    mosaic,
 )
 import numpy as np
 import pandas as pd
@@ -33,6 +37,100 @@ def test_squeeze():
     assert len(da["space"].values) == 3
 
 
+def test_squeeze_with_order():
+    times = [pd.Timestamp(2000, 1, 1), pd.Timestamp(2000, 1, 1)]
+    data = np.array([[1.0, np.nan], [2.0, 3.0]])
+    foo = xr.DataArray(
+        data, coords=[times, ["IA", "IL"]], dims=[DEFAULT_TIME_DIMENSION, "space"]
+    )
+    da = remove_repeated_time_coords(foo)
+    np.testing.assert_array_equal(da.values, [[1.0, 3.0]])
+    # the second slice is less cloudy, so it takes precedence
+    da = remove_repeated_time_coords(foo, order=[50.0, 10.0])
+    np.testing.assert_array_equal(da.values, [[2.0, 3.0]])
+
+
+@pytest.mark.parametrize("num_times", [10, 50])
+def test_squeeze_vectorized(num_times: int):
+    rng = np.random.default_rng(0)
+    # every timestamp has up to 3 slices, which are not adjacent
+    times = pd.date_range("2000-01-01", periods=num_times).repeat(3)
+    permutation = rng.permutation(len(times))[: 2 * num_times]
+    data = rng.random((len(permutation), 4))
+    data[rng.random(data.shape) < 0.5] = np.nan
+    foo = xr.DataArray(
+        data,
+        coords={DEFAULT_TIME_DIMENSION: times[permutation]},
+        dims=[DEFAULT_TIME_DIMENSION, "space"],
+    ).chunk({DEFAULT_TIME_DIMENSION: 5})
+    da = remove_repeated_time_coords(foo)
+    # graph size does not depend on the number of timestamps
+    assert len(da.data.dask.layers) <= 10
+    expected = [
+        foo.isel(
+            {DEFAULT_TIME_DIMENSION: np.flatnonzero(foo[DEFAULT_TIME_DIMENSION] == t)}
+        )
+        .bfill(DEFAULT_TIME_DIMENSION)
+        .isel({DEFAULT_TIME_DIMENSION: 0})
+        .values
+        for t in pd.unique(foo[DEFAULT_TIME_DIMENSION].values)
+    ]
+    np.testing.assert_array_equal(da.values, expected)
+    assert list(da[DEFAULT_TIME_DIMENSION].values) == list(
+        pd.unique(foo[DEFAULT_TIME_DIMENSION].values)
+    )
+
+
+def test_mosaic():
+    first = xr.DataArray(
+        np.array([[np.nan, 1.0], [1.0, 1.0]]),
+        coords={"y": [1.5, 0.5], "x": [0.5, 1.5]},
+        dims=["y", "x"],
+    ).chunk({"x": 1})
+    second = xr.DataArray(
+        np.full((2, 3), 2.0),
+        coords={"y": [1.5, 0.5], "x": [0.5, 1.5, 2.5]},
+        dims=["y", "x"],
+    ).chunk({"x": 2})
+    result = mosaic(data_arrays=[first, second])
+    assert result.chunks is not None
+    xr.testing.assert_equal(result.compute(), first.combine_first(second).compute())
+    result = mosaic(data_arrays=[first, second], order=[1, 0])
+    xr.testing.assert_equal(result.compute(), second.compute())
+
+
+def test_mosaic_nodata():
+    first = xr.DataArray(
+        np.array([[0, 1], [1, 1]], dtype=np.uint16),
+        coords={"y": [1.5, 0.5], "x": [0.5, 1.5]},
+        dims=["y", "x"],
+    ).rio.write_nodata(0, encoded=False)
+    second = xr.DataArray(
+        np.full((2, 3), 2, dtype=np.uint16),
+        coords={"y": [1.5, 0.5], "x": [0.5, 1.5, 2.5]},
+        dims=["y", "x"],
+    ).chunk({"x": 2})
+    result = mosaic(data_arrays=[first, second])
+    # nodata pixels are filled and the data type is kept
+    assert result.dtype == np.uint16
+    assert result.rio.nodata == 0
+    np.testing.assert_array_equal(result.values, [[2, 1, 2], [1, 1, 2]])
+
+
+@pytest.mark.parametrize(
+    "dtype, expected_dtype",
+    [(np.uint8, np.float32), (np.int16, np.float32), (np.uint32, np.float64)],
+)
+def test_mask_nodata(dtype, expected_dtype):
+    data = xr.DataArray(np.array([[0, 1], [2, 0]], dtype=dtype), dims=["y", "x"])
+    # data arrays without nodata value are not changed
+    assert mask_nodata(data_array=data) is data
+    masked = mask_nodata(data_array=data.chunk().rio.write_nodata(0, encoded=False))
+    assert masked.chunks is not None
+    assert masked.dtype == expected_dtype
+    np.testing.assert_array_equal(masked.values, [[np.nan, 1], [2, np.nan]])
+
+
 @pytest.mark.parametrize(
     "bbox, filter_bbox, expected_dim_size",
     [
@@ -85,3 +183,32 @@ def test_clip_box(
         ), f"Error! {filter_bbox[1]=} {miny=} {maxy=} {filter_bbox[3]=}"
     for dim_name, dim_size in expected_dim_size.items():
         assert dim_size == array_clipped[dim_name].size
+
+
+@pytest.mark.parametrize(
+    "temporal_extent, expected_within, expected_index",
+    [
+        ((datetime(2000, 1, 2), datetime(2000, 1, 3)), True, [1, 2]),
+        # the next timestamp is kept if none is selected
+        ((datetime(2000, 1, 2, 12), datetime(2000, 1, 2, 13)), False, [2]),
+    ],
+)
+def test_has_timestamps_within(temporal_extent, expected_within, expected_index):
+    times = pd.date_range("2000-01-01", periods=4, freq="D")
+    data = xr.DataArray(np.arange(4), coords={"time": times}, dims=["time"])
+    assert (
+        has_timestamps_within(
+            data=data, temporal_extent=temporal_extent, temporal_dim="time"
+        )
+        == expected_within
+    )
+    filtered = filter_by_time(
+        data=data, temporal_extent=temporal_extent, temporal_dim="time"
+    )
+    np.testing.assert_array_equal(filtered.values, expected_index)
+    # all timestamps are before the start
+    assert not has_timestamps_within(
+        data=data,
+        temporal_extent=(datetime(2001, 1, 1), datetime(2001, 1, 2)),
+        temporal_dim="time",
+    )
@@ -0,0 +1,302 @@
+import base64
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from tensorlakehouse_openeo_driver.constants import (
+    GRIB2_MEDIA_TYPE,
+    NETCDF_MEDIA_TYPE,
+    REFERENCES_MEDIA_TYPE,
+)
+from tensorlakehouse_openeo_driver.file_reader.netcdf_file_reader import (
+    NetCDFFileReader,
+)
+from tensorlakehouse_openeo_driver.util import kerchunk_references
+
+LAT = np.array([50.5, 51.5, 52.5])
+LON = np.array([-1.5, -0.5, 0.5, 1.5])
+# days since 2000-01-01
+TIME = np.array([0, 1], dtype="<i8")
+TASMAX = np.arange(2 * 3 * 4, dtype="<f8").reshape(2, 3, 4)
+
+
+def _zarray(shape, chunks, dtype: str) -> str:
+    return json.dumps(
+        {
+            "shape": list(shape),
+            "chunks": list(chunks),
+            "dtype": dtype,
+            "compressor": None,
+            "fill_value": None,
+            "filters": None,
+            "order": "C",
+            "zarr_format": 2,
+        }
+    )
+
+
+def _write_references(tmp_path: Path) -> Path:
+    """write the arrays to a raw binary file and the references to its chunks, as kerchunk
+    would do for a NetCDF file"""
+    data_path = tmp_path / "file.bin"
+    refs: Dict[str, Any] = {
+        ".zgroup": json.dumps({"zarr_format": 2}),
+        ".zattrs": json.dumps({}),
+    }
+    offset = 0
+    with open(data_path, "wb") as f:
+        for name, values, dims, attrs in [
+            ("lat", LAT, ["lat"], {}),
+            ("lon", LON, ["lon"], {}),
+            ("time", TIME, ["time"], {"units": "days since 2000-01-01"}),
+            ("tasmax", TASMAX, ["time", "lat", "lon"], {}),
+        ]:
+            # tasmax has one chunk per timestamp
+            chunks = (1,) + values.shape[1:] if name == "tasmax" else values.shape
+            refs[f"{name}/.zarray"] = _zarray(
+                shape=values.shape, chunks=chunks, dtype=values.dtype.str
+            )
+            refs[f"{name}/.zattrs"] = json.dumps({"_ARRAY_DIMENSIONS": dims, **attrs})
+            for index in range(values.shape[0] // chunks[0]):
+                chunk = (
+                    values[index * chunks[0]][np.newaxis] if chunks[0] == 1 else values
+                )
+                key = ".".join([str(index)] + ["0"] * (values.ndim - 1))
+                refs[f"{name}/{key}"] = [str(data_path), offset, chunk.nbytes]
+                f.write(chunk.tobytes())
+                offset += chunk.nbytes
+    references_path = tmp_path / "file.nc.kerchunk.json"
+    references_path.write_text(json.dumps({"version": 1, "refs": refs}))
+    return references_path
+
+
+def _make_item(references_href: str) -> Dict[str, Any]:
+    return {
+        "id": "file",
+        "assets": {
+            "data": {
+                "href": "https://s3.us-east.cloud-object-storage.appdomain.cloud/my-bucket/file.nc",
+                "type": NETCDF_MEDIA_TYPE,
+            },
+            kerchunk_references.REFERENCES_ASSET: {
+                "href": references_href,
+                "type": REFERENCES_MEDIA_TYPE,
+            },
+        },
+        "properties": {
+            "cube:dimensions": {
+                "lat": {"axis": "y", "type": "spatial", "reference_system": 4326},
+                "lon": {"axis": "x", "type": "spatial", "reference_system": 4326},
+                "time": {"type": "temporal"},
+            }
+        },
+    }
+
+
+def test_open_references(tmp_path: Path):
+    references_path = _write_references(tmp_path=tmp_path)
+    ds = kerchunk_references.open_references(
+        url=str(references_path), storage_options={}
+    )
+    assert ds["tasmax"].chunks is not None
+    np.testing.assert_array_equal(ds["tasmax"].values, TASMAX)
+    assert ds["time"].values[1] == np.datetime64("2000-01-02")
+
+
+def test_load_items_using_references(tmp_path: Path):
+    references_path = _write_references(tmp_path=tmp_path)
+    item = _make_item(references_href=str(references_path))
+    os.environ["TLH_MYBUCKET_ACCESS_KEY_ID"] = "my-access-key"
+    os.environ["TLH_MYBUCKET_SECRET_ACCESS_KEY"] = "my-secret-key"
+    os.environ["TLH_MYBUCKET_ENDPOINT"] = (
+        "s3.us-south.cloud-object-storage.appdomain.cloud"
+    )
+    reader = NetCDFFileReader(
+        items=[item],
+        bbox=(-1.0, 51.0, 1.0, 53.0),
+        temporal_extent=(datetime(2000, 1, 2), datetime(2000, 1, 3)),
+        bands=["tasmax"],
+        properties=None,
+    )
+    # the NetCDF file is not opened
+    with patch.object(NetCDFFileReader, "create_s3filesystem") as mock_fs:
+        array = reader.load_items()
+    mock_fs.assert_not_called()
+    assert isinstance(array, xr.DataArray)
+    np.testing.assert_array_equal(
+        array.isel(bands=0).values, TASMAX[1:, 1:, 1:3].astype(np.float64)
+    )
+
+
+def test_index_item(tmp_path: Path):
+    asset_path = tmp_path / "file.nc"
+    asset_path.write_bytes(b"")
+    item = {
+        "id": "file",
+        "assets": {"data": {"href": str(asset_path), "type": NETCDF_MEDIA_TYPE}},
+        "properties": {},
+    }
+    references = {"version": 1, "refs": {".zgroup": '{"zarr_format": 2}'}}
+    with patch.object(
+        kerchunk_references, "generate_references", return_value=references
+    ):
+        new_item = kerchunk_references.index_item(item=item, storage_options={})
+        assert new_item is not None
+        # items that have references are skipped
+        assert kerchunk_references.index_item(item=new_item, storage_options={}) is None
+    references_href = kerchunk_references.get_references_href(item=new_item)
+    assert references_href == f"{asset_path}{kerchunk_references.REFERENCES_SUFFIX}"
+    assert json.loads(Path(references_href).read_text()) == references
+    # the original item is not modified
+    assert kerchunk_references.REFERENCES_ASSET not in item["assets"]
+
+
+def _scalar(value, dtype: str, attrs: Dict[str, Any]) -> Dict[str, Any]:
+    data = np.array(value, dtype=dtype).tobytes()
+    return {
+        ".zarray": _zarray(shape=[], chunks=[], dtype=dtype),
+        ".zattrs": json.dumps({"_ARRAY_DIMENSIONS": [], **attrs}),
+        "0": "base64:" + base64.b64encode(data).decode(),
+    }
+
+
+def _write_grib_messages(tmp_path: Path) -> List[Dict[str, Any]]:
+    """write the grid of each message to a raw binary file and its references, as scan_grib
+    would do for a GRIB2 file that has one message per level and step"""
+    data_path = tmp_path / "file.bin"
+    messages = list()
+    with open(data_path, "wb") as f:
+        for index, (level, step) in enumerate([(850, 0), (850, 6), (500, 0), (500, 6)]):
+            values = np.full((len(LAT), len(LON)), index, dtype="<f8")
+            offset = f.tell()
+            f.write(values.tobytes())
+            arrays = {
+                "latitude": _scalar(0, "<f8", {}),
+                "longitude": _scalar(0, "<f8", {}),
+                "time": _scalar(
+                    946684800, "<i8", {"units": "seconds since 1970-01-01"}
+                ),
+                "step": _scalar(step, "<f8", {"units": "hours"}),
+                "valid_time": _scalar(
+                    946684800 + step * 3600,
+                    "<i8",
+                    {"units": "seconds since 1970-01-01"},
+                ),
+                "isobaricInhPa": _scalar(level, "<f8", {}),
+            }
+            refs: Dict[str, Any] = {
+                ".zgroup": json.dumps({"zarr_format": 2}),
+                ".zattrs": json.dumps({"coordinates": " ".join(arrays)}),
+            }
+            for name, coords in [("latitude", LAT), ("longitude", LON)]:
+                arrays[name] = {
+                    ".zarray": _zarray(
+                        shape=coords.shape, chunks=coords.shape, dtype="<f8"
+                    ),
+                    ".zattrs": json.dumps({"_ARRAY_DIMENSIONS": [name]}),
+                    "0": "base64:" + base64.b64encode(coords.tobytes()).decode(),
+                }
+            arrays["t"] = {
+                ".zarray": _zarray(
+                    shape=values.shape, chunks=values.shape, dtype="<f8"
+                ),
+                ".zattrs": json.dumps(
+                    {
+                        "_ARRAY_DIMENSIONS": ["latitude", "longitude"],
+                        "GRIB_typeOfLevel": "isobaricInhPa",
+                    }
+                ),
+                "0.0": [str(data_path), offset, values.nbytes],
+            }
+            for name, array_refs in arrays.items():
+                for key, value in array_refs.items():
+                    refs[f"{name}/{key}"] = value
+            messages.append({"version": 1, "refs": refs})
+    return messages
+
+
+def test_combine_grib_messages(tmp_path: Path):
+    messages = _write_grib_messages(tmp_path=tmp_path)
+    references = kerchunk_references.combine_grib_messages(message_references=messages)
+    references_path = tmp_path / "file.grib2.kerchunk.json"
+    references_path.write_text(json.dumps(references))
+    ds = kerchunk_references.open_references(
+        url=str(references_path), storage_options={}
+    )
+    # messages of each level and step are stacked instead of overwriting each other
+    assert ds["t"].dims == ("step", "isobaricInhPa", "latitude", "longitude")
+    np.testing.assert_array_equal(ds["isobaricInhPa"].values, [500, 850])
+    np.testing.assert_array_equal(ds["t"].values[:, :, 0, 0], [[2, 0], [3, 1]])
+    np.testing.assert_array_equal(ds["latitude"].values, LAT)
+    # valid_time depends on step, so it is dropped
+    assert "valid_time" not in ds.coords
+
+
+def test_generate_references_netcdf4(tmp_path: Path):
+    pytest.importorskip("kerchunk")
+    pytest.importorskip("h5py")
+    path = tmp_path / "file.nc"
+    expected = xr.Dataset(
+        {"tasmax": (["time", "lat", "lon"], TASMAX)},
+        coords={"time": TIME, "lat": LAT, "lon": LON},
+    )
+    expected.to_netcdf(
+        path,
+        engine="netcdf4",
+        encoding={"tasmax": {"chunksizes": (1, len(LAT), len(LON))}},
+    )
+    references = kerchunk_references.generate_references(
+        url=str(path), media_type=NETCDF_MEDIA_TYPE, storage_options={}
+    )
+    references_path = tmp_path / "file.nc.kerchunk.json"
+    references_path.write_text(json.dumps(references))
+    ds = kerchunk_references.open_references(
+        url=str(references_path), storage_options={}
+    )
+    np.testing.assert_array_equal(ds["tasmax"].values, TASMAX)
+
+
+def test_generate_references_grib2(tmp_path: Path):
+    pytest.importorskip("kerchunk")
+    eccodes = pytest.importorskip("eccodes")
+    path = tmp_path / "file.grib2"
+    with open(path, "wb") as f:
+        for index, (level, step) in enumerate([(850, 0), (850, 6), (500, 0), (500, 6)]):
+            handle = eccodes.codes_grib_new_from_samples("regular_ll_sfc_grib2")
+            for key, value in [
+                ("Ni", 40),
+                ("Nj", 30),
+                ("latitudeOfFirstGridPointInDegrees", 52.5),
+                ("longitudeOfFirstGridPointInDegrees", 0.0),
+                ("latitudeOfLastGridPointInDegrees", 23.5),
+                ("longitudeOfLastGridPointInDegrees", 39.0),
+                ("iDirectionIncrementInDegrees", 1.0),
+                ("jDirectionIncrementInDegrees", 1.0),
+                ("typeOfLevel", "isobaricInhPa"),
+                ("level", level),
+                ("shortName", "t"),
+                ("stepRange", str(step)),
+            ]:
+                eccodes.codes_set(handle, key, value)
+            eccodes.codes_set_values(handle, np.full(30 * 40, float(index)))
+            eccodes.codes_write(handle, f)
+            eccodes.codes_release(handle)
+    references = kerchunk_references.generate_references(
+        url=str(path), media_type=GRIB2_MEDIA_TYPE, storage_options={}
+    )
+    references_path = tmp_path / "file.grib2.kerchunk.json"
+    references_path.write_text(json.dumps(references))
+    ds = kerchunk_references.open_references(
+        url=str(references_path), storage_options={}
+    )
+    expected = xr.open_dataset(path, engine="cfgrib", backend_kwargs={"indexpath": ""})
+    expected = expected.sortby("isobaricInhPa")
+    assert ds["t"].dims == expected["t"].dims
+    np.testing.assert_array_equal(ds["t"].values, expected["t"].values)
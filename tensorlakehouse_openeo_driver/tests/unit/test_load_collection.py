@@ -1,8 +1,19 @@
 from tensorlakehouse_openeo_driver.process_implementations.load_collection import (
+    SEARCH_CACHE_VERSIONS_KEY,
     LoadCollectionFromCOS,
+    invalidate_search_cache,
 )
-
+from tensorlakehouse_openeo_driver.tests.unit.unit_test_util import (
+    HLSS30_ITEMS,
+    MockTemporalInterval,
+)
+from unittest.mock import MagicMock, patch
+import numpy as np
+import pandas as pd
 import pytest
+from rasterio.enums import Resampling
+import xarray as xr
+from openeo_pg_parser_networkx import OpenEOProcessGraph
 from openeo_pg_parser_networkx.pg_schema import ParameterReference
 import deepdiff
 
@@ -84,6 +95,90 @@ import deepdiff
                 ],
             },
         ),
+        (
+            {
+                "cloud_coverage": {
+                    "process_graph": {
+                        "lt1": {
+                            "process_id": "lt",
+                            "arguments": {
+                                "x": 10,
+                                "y": ParameterReference(from_parameter="value"),
+                            },
+                        },
+                        "between1": {
+                            "process_id": "between",
+                            "arguments": {
+                                "x": {"from_parameter": "value"},
+                                "min": 0,
+                                "max": 5,
+                            },
+                        },
+                        "or1": {
+                            "process_id": "or",
+                            "arguments": {
+                                "x": {"from_node": "lt1"},
+                                "y": {"from_node": "between1"},
+                            },
+                        },
+                        "not1": {
+                            "process_id": "not",
+                            "arguments": {"x": {"from_node": "or1"}},
+                            "result": True,
+                        },
+                    }
+                },
+                "tile": {
+                    "process_graph": {
+                        "contains1": {
+                            "process_id": "array_contains",
+                            "arguments": {
+                                "data": ["T18TYP", "T18TYQ"],
+                                "value": {"from_parameter": "value"},
+                            },
+                            "result": True,
+                        }
+                    }
+                },
+            },
+            {
+                "op": "and",
+                "args": [
+                    {
+                        "op": "not",
+                        "args": [
+                            {
+                                "op": "or",
+                                "args": [
+                                    {
+                                        "op": ">",
+                                        "args": [
+                                            {"property": "properties.cloud_coverage"},
+                                            10,
+                                        ],
+                                    },
+                                    {
+                                        "op": "between",
+                                        "args": [
+                                            {"property": "properties.cloud_coverage"},
+                                            0,
+                                            5,
+                                        ],
+                                    },
+                                ],
+                            }
+                        ],
+                    },
+                    {
+                        "op": "in",
+                        "args": [
+                            {"property": "properties.tile"},
+                            ["T18TYP", "T18TYQ"],
+                        ],
+                    },
+                ],
+            },
+        ),
     ],
 )
 def test_convert_properties_to_filter(properties, expected_filter):
@@ -92,3 +187,342 @@ def test_convert_properties_to_filter(properties, expected_filter):
     )
     d = deepdiff.DeepDiff(filter_cql, expected_filter)
     assert len(d) == 0, f"Error! not equal: {d}"
+
+
+def test_convert_parsed_properties_to_filter():
+    process_graph = {
+        "load1": {
+            "process_id": "load_collection",
+            "arguments": {
+                "id": "HLSS30",
+                "spatial_extent": None,
+                "temporal_extent": None,
+                "properties": {
+                    "cloud_coverage": {
+                        "process_graph": {
+                            "gte1": {
+                                "process_id": "gte",
+                                "arguments": {"x": {"from_parameter": "value"}, "y": 1},
+                            },
+                            "neq1": {
+                                "process_id": "neq",
+                                "arguments": {"x": {"from_parameter": "value"}, "y": 5},
+                            },
+                            "and1": {
+                                "process_id": "and",
+                                "arguments": {
+                                    "x": {"from_node": "gte1"},
+                                    "y": {"from_node": "neq1"},
+                                },
+                                "result": True,
+                            },
+                        }
+                    }
+                },
+            },
+            "result": True,
+        }
+    }
+    # after parsing, nodes are referenced by ResultReference objects
+    parsed_graph = OpenEOProcessGraph(pg_data=process_graph)
+    properties = next(
+        data["resolved_kwargs"]["properties"]
+        for _, data in parsed_graph.G.nodes(data=True)
+        if data.get("process_id") == "load_collection"
+    )
+    filter_cql = LoadCollectionFromCOS._convert_properties_to_filter(
+        properties=properties
+    )
+    prop = {"property": "properties.cloud_coverage"}
+    assert filter_cql == {
+        "op": "and",
+        "args": [{"op": ">=", "args": [prop, 1]}, {"op": "<>", "args": [prop, 5]}],
+    }
+
+
+def test_convert_unsupported_properties_to_filter():
+    properties = {
+        "cloud_coverage": {
+            "process_graph": {
+                "abs1": {
+                    "process_id": "absolute",
+                    "arguments": {"x": {"from_parameter": "value"}},
+                    "result": True,
+                }
+            }
+        }
+    }
+    with pytest.raises(ValueError):
+        LoadCollectionFromCOS._convert_properties_to_filter(properties=properties)
+
+
+def test_search_item_pages_streaming():
+    pages = [
+        {"type": "FeatureCollection", "features": [HLSS30_ITEMS[0]]},
+        {"type": "FeatureCollection", "features": [HLSS30_ITEMS[1]]},
+    ]
+    stac_client = MagicMock()
+    stac_client.search.return_value.pages_as_dicts.return_value = iter(pages)
+    temporal_extent = MockTemporalInterval(
+        start=pd.Timestamp("2023-08-01"), end=pd.Timestamp("2023-09-01")
+    )
+    with patch(
+        "tensorlakehouse_openeo_driver.process_implementations.load_collection.get_stac_client",
+        return_value=stac_client,
+    ):
+        loader = LoadCollectionFromCOS()
+        item_pages = list(
+            loader._search_item_pages(
+                bbox=(-72.0, 44.0, -71.0, 45.0),
+                temporal_extent=temporal_extent,
+                collection_id="HLSS30",
+                streaming=True,
+            )
+        )
+        assert [len(page) for page in item_pages] == [1, 1]
+        # the same search is served by the cache
+        items = loader._search_items(
+            bbox=(-72.0, 44.0, -71.0, 45.0),
+            temporal_extent=temporal_extent,
+            collection_id="HLSS30",
+        )
+        assert len(items) == 2
+        assert stac_client.search.call_count == 1
+
+
+class FakeRedis:
+    """redis hash shared by processes"""
+
+    def __init__(self) -> None:
+        self.hashes: dict = dict()
+
+    def hincrby(self, name, key, amount):
+        self.hashes.setdefault(name, dict())
+        self.hashes[name][key] = self.hashes[name].get(key, 0) + amount
+
+    def hmget(self, name, keys):
+        return [self.hashes.get(name, dict()).get(key) for key in keys]
+
+
+def test_search_cache_invalidated_by_other_process():
+    stac_client = MagicMock()
+    stac_client.search.return_value.items_as_dicts.side_effect = lambda: iter(
+        HLSS30_ITEMS[:2]
+    )
+    temporal_extent = MockTemporalInterval(
+        start=pd.Timestamp("2023-08-01"), end=pd.Timestamp("2023-09-01")
+    )
+    redis_client = FakeRedis()
+    module = "tensorlakehouse_openeo_driver.process_implementations.load_collection"
+    with patch(f"{module}.get_stac_client", return_value=stac_client), patch(
+        f"{module}._get_redis_client", return_value=redis_client
+    ):
+        loader = LoadCollectionFromCOS()
+        for _ in range(2):
+            loader._search_items(
+                bbox=(-72.0, 44.0, -71.0, 45.0),
+                temporal_extent=temporal_extent,
+                collection_id="HLSS30",
+            )
+        assert stac_client.search.call_count == 1
+        # another worker process invalidates the collection, i.e., the local cache is intact
+        redis_client.hincrby(SEARCH_CACHE_VERSIONS_KEY, "HLSS30", 1)
+        loader._search_items(
+            bbox=(-72.0, 44.0, -71.0, 45.0),
+            temporal_extent=temporal_extent,
+            collection_id="HLSS30",
+        )
+        assert stac_client.search.call_count == 2
+        # invalidation of another collection does not affect cached items
+        invalidate_search_cache(collection_id="S2")
+        loader._search_items(
+            bbox=(-72.0, 44.0, -71.0, 45.0),
+            temporal_extent=temporal_extent,
+            collection_id="HLSS30",
+        )
+        assert stac_client.search.call_count == 2
+        result = invalidate_search_cache()
+        assert result == {"removed": 1, "broadcast": True}
+        assert redis_client.hashes[SEARCH_CACHE_VERSIONS_KEY] == {
+            "HLSS30": 1,
+            "S2": 1,
+            "*": 1,
+        }
+
+
+def test_invalidate_search_cache_redis_not_available():
+    stac_client = MagicMock()
+    stac_client.search.return_value.items_as_dicts.side_effect = lambda: iter(
+        HLSS30_ITEMS[:2]
+    )
+    temporal_extent = MockTemporalInterval(
+        start=pd.Timestamp("2023-08-01"), end=pd.Timestamp("2023-09-01")
+    )
+    redis_client = MagicMock()
+    redis_client.hmget.return_value = [None, None]
+    redis_client.hincrby.side_effect = ConnectionError("redis is down")
+    module = "tensorlakehouse_openeo_driver.process_implementations.load_collection"
+    with patch(f"{module}.get_stac_client", return_value=stac_client), patch(
+        f"{module}._get_redis_client", return_value=redis_client
+    ):
+        loader = LoadCollectionFromCOS()
+        loader._search_items(
+            bbox=(-72.0, 44.0, -71.0, 45.0),
+            temporal_extent=temporal_extent,
+            collection_id="HLSS30",
+        )
+        result = invalidate_search_cache(collection_id="HLSS30")
+        # the cache of this process is cleared anyway
+        assert result == {"removed": 1, "broadcast": False, "error": "redis is down"}
+        loader._search_items(
+            bbox=(-72.0, 44.0, -71.0, 45.0),
+            temporal_extent=temporal_extent,
+            collection_id="HLSS30",
+        )
+        assert stac_client.search.call_count == 2
+
+
+def test_concat_pages():
+    times = pd.to_datetime(["2023-08-01", "2023-08-02", "2023-08-02", "2023-08-03"])
+    first = xr.DataArray(
+        np.array([[1.0, np.nan], [2.0, np.nan]]),
+        coords={"time": times[:2], "x": [0, 1]},
+        dims=["time", "x"],
+    )
+    second = xr.DataArray(
+        np.array([[np.nan, 3.0], [4.0, 4.0]]),
+        coords={"time": times[2:], "x": [0, 1]},
+        dims=["time", "x"],
+    )
+    data_array = LoadCollectionFromCOS._concat_pages(
+        data_arrays=[second, first], time_dim="time"
+    )
+    assert list(data_array["time"].values) == list(times.unique().values)
+    np.testing.assert_array_equal(data_array.sel(time="2023-08-02").values, [2.0, 3.0])
+
+
+def test_partition_search_extent():
+    partitions = LoadCollectionFromCOS._partition_search_extent(
+        bbox=(-80.0, 40.0, -60.0, 45.0),
+        starttime=pd.Timestamp("2020-01-01").to_pydatetime(),
+        endtime=pd.Timestamp("2021-06-01").to_pydatetime(),
+    )
+    # 2 tiles x 2 time intervals
+    assert len(partitions) == 4
+    assert {p[0] for p in partitions} == {
+        (-80.0, 40.0, -70.0, 45.0),
+        (-70.0, 40.0, -60.0, 45.0),
+    }
+    small = LoadCollectionFromCOS._partition_search_extent(
+        bbox=(-72.0, 44.0, -71.0, 45.0),
+        starttime=pd.Timestamp("2023-08-01").to_pydatetime(),
+        endtime=pd.Timestamp("2023-09-01").to_pydatetime(),
+    )
+    assert len(small) == 1
+
+
+def test_search_partitions_removes_duplicates():
+    stac_client = MagicMock()
+    stac_client.search.return_value.items_as_dicts.side_effect = lambda: iter(
+        HLSS30_ITEMS[:2]
+    )
+    partitions = [
+        ((-80.0, 40.0, -70.0, 45.0), "2023-08-01T00:00:00Z/2023-09-01T00:00:00Z"),
+        ((-70.0, 40.0, -60.0, 45.0), "2023-08-01T00:00:00Z/2023-09-01T00:00:00Z"),
+    ]
+    pages = list(
+        LoadCollectionFromCOS._search_partitions(
+            stac_catalog=stac_client,
+            partitions=partitions,
+            collection_id="HLSS30",
+            fields={},
+            page_size=100,
+            filter_cql=None,
+            streaming=False,
+        )
+    )
+    assert len(pages) == 1
+    assert len(pages[0]) == 2
+    assert stac_client.search.call_count == 2
+
+
+def test_merge_cubes():
+    cog = xr.DataArray(
+        np.ones((1, 1, 4, 4)),
+        coords={
+            "time": pd.to_datetime(["2023-08-01"]),
+            "bands": ["B02"],
+            "y": [3.5, 2.5, 1.5, 0.5],
+            "x": [0.5, 1.5, 2.5, 3.5],
+        },
+        dims=["time", "bands", "y", "x"],
+    ).chunk()
+    # coarser cube whose grid is shifted by a fraction of a pixel
+    netcdf = xr.DataArray(
+        np.full((1, 1, 2, 2), 2.0),
+        coords={
+            "time": pd.to_datetime(["2023-08-02"]),
+            "bands": ["B03"],
+            "y": [3.4, 2.4],
+            "x": [0.6, 1.6],
+        },
+        dims=["time", "bands", "y", "x"],
+    ).chunk()
+    data_array = LoadCollectionFromCOS._merge_cubes(
+        data_arrays=[netcdf, cog], time_dims=["time", "time"]
+    )
+    assert data_array.chunks is not None
+    assert data_array.sizes == {"time": 2, "bands": 2, "y": 4, "x": 4}
+    merged = data_array.sel(time="2023-08-02", bands="B03").values
+    np.testing.assert_array_equal(merged[0:2, 0:2], 2.0)
+    assert np.isnan(merged[2:, 2:]).all()
+    assert np.isnan(data_array.sel(time="2023-08-02", bands="B02").values).all()
+
+
+def test_merge_cubes_reprojected():
+    # 40x40 pixels of 30 m in UTM 18N
+    cog = xr.DataArray(
+        np.ones((1, 1, 40, 40)),
+        coords={
+            "time": pd.to_datetime(["2023-08-01"]),
+            "bands": ["B02"],
+            "y": 4001200.0 - 15.0 - 30.0 * np.arange(40),
+            "x": 600000.0 + 15.0 + 30.0 * np.arange(40),
+        },
+        dims=["time", "bands", "y", "x"],
+    )
+    cog = cog.rio.write_crs(32618).chunk({"y": 20, "x": 20})
+    # cube in EPSG:4326 that covers part of the COG grid, whose temporal dimension has
+    # another name
+    lons = np.linspace(-73.8863, -73.8795, 10)
+    lats = np.linspace(36.1445, 36.1338, 20)
+    netcdf = xr.DataArray(
+        np.arange(2 * 20 * 10, dtype=float).reshape(2, 1, 20, 10),
+        coords={
+            "t": pd.to_datetime(["2023-08-02", "2023-08-03"]),
+            "bands": ["B03"],
+            "latitude": lats,
+            "longitude": lons,
+        },
+        dims=["t", "bands", "latitude", "longitude"],
+    )
+    netcdf = netcdf.rio.write_crs(4326).chunk()
+    data_array = LoadCollectionFromCOS._merge_cubes(
+        data_arrays=[netcdf, cog], time_dims=["t", "time"]
+    )
+    # nothing has been computed yet
+    assert data_array.chunks is not None
+    assert data_array.sizes == {"time": 3, "bands": 2, "y": 40, "x": 40}
+    assert data_array.rio.crs.to_epsg() == 32618
+    expected = (
+        netcdf.sel(bands="B03")
+        .rename({"t": "time"})
+        .rio.reproject_match(cog, resampling=Resampling.nearest, nodata=np.nan)
+    )
+    regridded = data_array.sel(bands="B03", time=expected["time"]).values
+    expected_values = expected.values
+    inside = ~np.isnan(regridded)
+    assert inside.any() and (~inside).any()
+    # nearest neighbors match rasterio where both have values
+    both = inside & ~np.isnan(expected_values)
+    np.testing.assert_array_equal(regridded[both], expected_values[both])
@@ -0,0 +1,183 @@
+import copy
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from tensorlakehouse_openeo_driver.process_implementations.load_planner import (
+    get_unbounded_collections,
+    plan_process_graph,
+)
+from tensorlakehouse_openeo_driver.processing import TensorlakehouseProcessing
+from tensorlakehouse_openeo_driver.tests.unit.unit_test_util import HLSS30_ITEMS
+
+
+def test_plan_process_graph():
+    stac_client = MagicMock()
+    stac_client.search.return_value.items_as_dicts.side_effect = lambda: iter(
+        HLSS30_ITEMS
+    )
+    process_graph = {
+        "load1": {
+            "process_id": "load_collection",
+            "arguments": {
+                "id": "HLSS30",
+                "spatial_extent": {
+                    "west": -72.0,
+                    "south": 44.0,
+                    "east": -71.9,
+                    "north": 44.1,
+                },
+                "temporal_extent": ["2023-08-01", "2023-09-01"],
+                "bands": ["B8A", "B12"],
+                "properties": {
+                    "cloud_coverage": {
+                        "process_graph": {
+                            "lte1": {
+                                "process_id": "lte",
+                                "arguments": {
+                                    "x": {"from_parameter": "value"},
+                                    "y": 99,
+                                },
+                                "result": True,
+                            }
+                        }
+                    }
+                },
+            },
+        },
+        # extent depends on a parameter, so this node is not planned
+        "load2": {
+            "process_id": "load_collection",
+            "arguments": {
+                "id": "HLSS30",
+                "spatial_extent": {"from_parameter": "bbox"},
+                "temporal_extent": ["2023-08-01", "2023-09-01"],
+                "bands": ["B8A"],
+            },
+        },
+        "save1": {
+            "process_id": "save_result",
+            "arguments": {"data": {"from_node": "load1"}, "format": "GTiff"},
+            "result": True,
+        },
+    }
+    with patch(
+        "tensorlakehouse_openeo_driver.process_implementations.load_collection.get_stac_client",
+        return_value=stac_client,
+    ):
+        plans = plan_process_graph(process_graph=process_graph)
+    assert len(plans) == 1
+    plan = plans[0]
+    assert plan.num_items == 2
+    assert plan.num_assets == 2
+    # all items share the same datetime
+    assert plan.output_shape[0:2] == (1, 2)
+    # 30m pixels of roughly 8km x 11km
+    assert 200 < plan.output_shape[2] < 500 and 200 < plan.output_shape[3] < 500
+    assert plan.output_bytes == 8 * 2 * plan.output_shape[2] * plan.output_shape[3]
+    assert plan.num_chunks == 2
+    assert 0 < plan.bytes_read < 2 * 3660 * 3660 * 4
+    filter_cql = stac_client.search.call_args.kwargs["filter"]
+    assert filter_cql["args"][1] == 99
+
+
+UNBOUNDED_PROCESS_GRAPH = {
+    "load1": {
+        "process_id": "load_collection",
+        "arguments": {
+            "id": "HLSS30",
+            "spatial_extent": {
+                "west": -72.0,
+                "south": 44.0,
+                "east": -71.9,
+                "north": 44.1,
+            },
+            "temporal_extent": ["2023-08-01", None],
+            "bands": ["B8A"],
+        },
+    },
+    "save1": {
+        "process_id": "save_result",
+        "arguments": {"data": {"from_node": "load1"}, "format": "GTiff"},
+        "result": True,
+    },
+}
+
+
+@pytest.mark.parametrize(
+    "spatial_extent, temporal_extent, expected",
+    [
+        ({"west": 0, "south": 0, "east": 1, "north": 1}, ["2023", "2024"], []),
+        ({"west": 0, "south": 0, "east": 1, "north": 1}, ["2023", None], ["HLSS30"]),
+        ({"west": 0, "south": 0, "east": 1, "north": 1}, [None, "2024"], ["HLSS30"]),
+        ({"west": 0, "south": 0, "east": 1, "north": 1}, None, ["HLSS30"]),
+        (None, ["2023", "2024"], ["HLSS30"]),
+        # extent depends on a parameter, so it is unknown rather than unbounded
+        ({"from_parameter": "bbox"}, ["2023", "2024"], []),
+    ],
+)
+def test_get_unbounded_collections(spatial_extent, temporal_extent, expected):
+    process_graph = {
+        "load1": {
+            "process_id": "load_collection",
+            "arguments": {
+                "id": "HLSS30",
+                "spatial_extent": spatial_extent,
+                "temporal_extent": temporal_extent,
+                "bands": ["B8A"],
+            },
+            "result": True,
+        }
+    }
+    assert get_unbounded_collections(process_graph=process_graph) == expected
+
+
+def test_verify_for_synchronous_processing_rejects_unbounded_extent():
+    processing = TensorlakehouseProcessing()
+    with patch(
+        "tensorlakehouse_openeo_driver.processing.plan_process_graph", return_value=[]
+    ) as plan:
+        messages = list(
+            processing.verify_for_synchronous_processing(
+                process_graph=UNBOUNDED_PROCESS_GRAPH
+            )
+        )
+    assert len(messages) == 1
+    assert "HLSS30" in messages[0]
+    plan.assert_called_once()
+
+
+def test_explain_unbounded_extent():
+    processing = TensorlakehouseProcessing()
+    with patch(
+        "tensorlakehouse_openeo_driver.processing.plan_process_graph", return_value=[]
+    ):
+        explanation = processing.explain(process_graph=UNBOUNDED_PROCESS_GRAPH)
+    assert explanation["unbounded"] == ["HLSS30"]
+    assert explanation["synchronous"] is False
+
+
+def test_explain_plans_optimized_process_graph():
+    # filter_temporal is folded into load_collection, as it is when the graph is evaluated
+    process_graph = copy.deepcopy(UNBOUNDED_PROCESS_GRAPH)
+    process_graph["filter1"] = {
+        "process_id": "filter_temporal",
+        "arguments": {
+            "data": {"from_node": "load1"},
+            "extent": ["2023-08-01", "2023-09-01"],
+        },
+    }
+    process_graph["save1"]["arguments"]["data"] = {"from_node": "filter1"}
+    processing = TensorlakehouseProcessing()
+    with patch(
+        "tensorlakehouse_openeo_driver.processing.plan_process_graph", return_value=[]
+    ) as plan:
+        explanation = processing.explain(process_graph=process_graph)
+    assert explanation["unbounded"] == []
+    assert explanation["synchronous"] is True
+    planned_graph = plan.call_args.kwargs["process_graph"]
+    assert "filter1" not in planned_graph
+    assert planned_graph["load1"]["arguments"]["temporal_extent"] == [
+        "2023-08-01",
+        "2023-09-01",
+    ]
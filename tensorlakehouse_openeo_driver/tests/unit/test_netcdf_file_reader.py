@@ -15,12 +15,15 @@ from unittest.mock import patch
 from rasterio.crs import CRS
 from openeo_pg_parser_networkx.pg_schema import ParameterReference
 from tensorlakehouse_openeo_driver.util import object_storage_util
+import io
 import os
+import numpy as np
+import pandas as pd
 
 
 class FakeS3Filesystem:
 
-    def open(self, href, mode):
+    def open(self, href, mode, **kwargs):
         return href
 
 
@@ -223,3 +226,89 @@ def test_load_items(
                             actual_size == expected_size
                         ), f"Error! {dim=} {actual_size=} {expected_size=}"
                     assert array.rio.crs == CRS.from_epsg(crs)
+
+
+def test_get_internal_chunks():
+    ds = xr.Dataset(
+        {
+            "tasmax": (["time", "lat", "lon"], np.zeros((4, 6, 8))),
+            "tasmin": (["time", "lat", "lon"], np.zeros((4, 6, 8))),
+            "mask": (["lat", "lon"], np.zeros((6, 8))),
+        }
+    )
+    ds["tasmax"].encoding["chunksizes"] = (1, 6, 4)
+    ds["tasmin"].encoding["chunksizes"] = (2, 3, 4)
+    # contiguous variable
+    ds["mask"].encoding["chunksizes"] = None
+    chunks = NetCDFFileReader._get_internal_chunks(ds=ds)
+    assert chunks == {"time": 1, "lat": 3, "lon": 4}
+
+
+def test_open_remote_dataset():
+    ds = xr.Dataset({"tasmax": (["time", "lon"], np.arange(8.0).reshape(2, 4))})
+    # NetCDF3 files are read by scipy
+    netcdf3_bytes = ds.to_netcdf(engine="scipy")
+    assert isinstance(netcdf3_bytes, bytes)
+    actual = NetCDFFileReader._open_remote_dataset(file_obj=io.BytesIO(netcdf3_bytes))
+    np.testing.assert_array_equal(actual["tasmax"].values, ds["tasmax"].values)
+    # NetCDF4 files are read lazily by h5netcdf, one dask chunk per internal chunk
+    h5_ds = ds.copy()
+    h5_ds["tasmax"].encoding["chunksizes"] = (1, 2)
+    file_obj = io.BytesIO(b"\x89HDF\r\n\x1a\n")
+    with patch.object(xr, "open_dataset", return_value=h5_ds) as mock_open:
+        actual = NetCDFFileReader._open_remote_dataset(file_obj=file_obj)
+    mock_open.assert_called_once_with(file_obj, engine="h5netcdf")
+    assert file_obj.tell() == 0
+    assert actual["tasmax"].chunks == ((1, 1), (2, 2))
+
+
+def test_subset_item():
+    os.environ["TLH_MYBUCKET_ACCESS_KEY_ID"] = "my-access-key"
+    os.environ["TLH_MYBUCKET_SECRET_ACCESS_KEY"] = "my-secret-key"
+    os.environ["TLH_MYBUCKET_ENDPOINT"] = (
+        "s3.us-south.cloud-object-storage.appdomain.cloud"
+    )
+    item = {
+        "id": "file",
+        "assets": {
+            "data": {
+                "href": "https://s3.us-east.cloud-object-storage.appdomain.cloud/my-bucket/file.nc"
+            }
+        },
+        "properties": {
+            "cube:dimensions": {
+                "lat": {"axis": "y", "type": "spatial", "reference_system": 4326},
+                "lon": {"axis": "x", "type": "spatial", "reference_system": 4326},
+                "time": {"type": "temporal"},
+            }
+        },
+    }
+    times = pd.date_range("2000-01-01", periods=4, freq="D")
+    ds = xr.Dataset(
+        {
+            "tasmax": (["time", "lat", "lon"], np.zeros((4, 10, 20))),
+            "tasmin": (["time", "lat", "lon"], np.ones((4, 10, 20))),
+        },
+        coords={
+            "time": times,
+            "lat": np.arange(40.5, 50.5),
+            "lon": np.arange(-9.5, 10.5),
+        },
+    )
+    reader = NetCDFFileReader(
+        items=[item],
+        bbox=(-2.0, 42.0, 2.0, 44.0),
+        temporal_extent=(datetime(2000, 1, 2), datetime(2000, 1, 3)),
+        bands=["tasmax", "tasmin"],
+        properties=None,
+    )
+    da = reader._subset_item(ds=ds, item=item)
+    assert dict(da.sizes) == {"bands": 2, "time": 2, "lat": 2, "lon": 4}
+    np.testing.assert_array_equal(da["time"].values, times[1:3].values)
+    # items that have no timestamp within the temporal extent are skipped
+    for temporal_extent in [
+        (datetime(2001, 1, 1), datetime(2001, 1, 2)),
+        (datetime(2000, 1, 2, 12), datetime(2000, 1, 2, 13)),
+    ]:
+        reader.temporal_extent = temporal_extent
+        assert reader._subset_item(ds=ds, item=item) is None
@@ -0,0 +1,184 @@
+import pytest
+
+from tensorlakehouse_openeo_driver.process_graph_optimizer import (
+    push_down_filters,
+    push_down_resolution,
+)
+
+
+def _load_collection(**arguments):
+    defaults = {
+        "id": "HLSS30",
+        "spatial_extent": {"west": -72.0, "south": 44.0, "east": -71.0, "north": 45.0},
+        "temporal_extent": ["2023-08-01", "2023-09-01"],
+        "bands": ["B02", "B03", "B04"],
+    }
+    defaults.update(arguments)
+    return {"process_id": "load_collection", "arguments": defaults}
+
+
+def test_push_down_filters():
+    process_graph = {
+        "load1": _load_collection(),
+        "bbox1": {
+            "process_id": "filter_bbox",
+            "arguments": {
+                "data": {"from_node": "load1"},
+                "extent": {"west": -71.5, "south": 44.5, "east": -70.0, "north": 46.0},
+            },
+        },
+        "temporal1": {
+            "process_id": "filter_temporal",
+            "arguments": {
+                "data": {"from_node": "bbox1"},
+                "extent": ["2023-08-15", None],
+            },
+        },
+        "bands1": {
+            "process_id": "filter_bands",
+            "arguments": {"data": {"from_node": "temporal1"}, "bands": ["B04"]},
+        },
+        "save1": {
+            "process_id": "save_result",
+            "arguments": {"data": {"from_node": "bands1"}, "format": "GTiff"},
+            "result": True,
+        },
+    }
+    optimized = push_down_filters(process_graph=process_graph)
+    assert set(optimized.keys()) == {"load1", "save1"}
+    arguments = optimized["load1"]["arguments"]
+    assert arguments["spatial_extent"] == {
+        "west": -71.5,
+        "south": 44.5,
+        "east": -71.0,
+        "north": 45.0,
+    }
+    assert arguments["temporal_extent"] == ["2023-08-15", "2023-09-01"]
+    assert arguments["bands"] == ["B04"]
+    assert optimized["save1"]["arguments"]["data"] == {"from_node": "load1"}
+    # input is not modified
+    assert "bbox1" in process_graph
+
+
+@pytest.mark.parametrize(
+    "filter_node",
+    [
+        # load_collection has another consumer
+        {
+            "process_id": "filter_bands",
+            "arguments": {"data": {"from_node": "load1"}, "bands": ["B04"]},
+        },
+        # band that has not been loaded
+        {
+            "process_id": "filter_bands",
+            "arguments": {"data": {"from_node": "load1"}, "bands": ["B08"]},
+        },
+        # extent is a parameter
+        {
+            "process_id": "filter_bbox",
+            "arguments": {
+                "data": {"from_node": "load1"},
+                "extent": {"from_parameter": "bbox"},
+            },
+        },
+        # bounding boxes are disjoint
+        {
+            "process_id": "filter_bbox",
+            "arguments": {
+                "data": {"from_node": "load1"},
+                "extent": {"west": -70.0, "south": 44.0, "east": -69.0, "north": 45.0},
+            },
+        },
+        {
+            "process_id": "filter_bbox",
+            "arguments": {
+                "data": {"from_node": "load1"},
+                "extent": {"west": -72.0, "south": 46.0, "east": -71.0, "north": 47.0},
+            },
+        },
+        # intervals are disjoint
+        {
+            "process_id": "filter_temporal",
+            "arguments": {
+                "data": {"from_node": "load1"},
+                "extent": ["2023-10-01", "2023-11-01"],
+            },
+        },
+        # intervals are right-open, so they do not overlap
+        {
+            "process_id": "filter_temporal",
+            "arguments": {
+                "data": {"from_node": "load1"},
+                "extent": [None, "2023-08-01"],
+            },
+        },
+    ],
+)
+def test_push_down_filters_not_folded(filter_node):
+    process_graph = {
+        "load1": _load_collection(),
+        "filter1": filter_node,
+        "save1": {
+            "process_id": "save_result",
+            "arguments": {"data": {"from_node": "filter1"}, "format": "GTiff"},
+            "result": True,
+        },
+    }
+    if filter_node["arguments"].get("bands") == ["B04"]:
+        process_graph["save2"] = {
+            "process_id": "save_result",
+            "arguments": {"data": {"from_node": "load1"}, "format": "netCDF"},
+        }
+    optimized = push_down_filters(process_graph=process_graph)
+    assert optimized == process_graph
+
+
+def test_push_down_filter_spatial():
+    polygon = {
+        "type": "Polygon",
+        "coordinates": [
+            [[-71.8, 44.2], [-71.2, 44.2], [-71.2, 44.8], [-71.8, 44.8], [-71.8, 44.2]]
+        ],
+    }
+    process_graph = {
+        "load1": _load_collection(),
+        "spatial1": {
+            "process_id": "filter_spatial",
+            "arguments": {"data": {"from_node": "load1"}, "geometries": polygon},
+            "result": True,
+        },
+    }
+    optimized = push_down_filters(process_graph={"process_graph": process_graph})
+    nodes = optimized["process_graph"]
+    # filter_spatial is kept to mask pixels outside the polygon
+    assert "spatial1" in nodes
+    spatial_extent = nodes["load1"]["arguments"]["spatial_extent"]
+    assert spatial_extent["west"] == pytest.approx(-71.8)
+    assert spatial_extent["north"] == pytest.approx(44.8)
+
+
+@pytest.mark.parametrize(
+    "resample_arguments, expected_resolution, expected_epsg",
+    [
+        ({"resolution": 300, "projection": 32618}, 300.0, 32618),
+        ({"resolution": [300, 600], "projection": "EPSG:32618"}, 300.0, 32618),
+        ({"resolution": 0, "projection": 32618}, None, None),
+        ({"resolution": {"from_parameter": "res"}, "projection": 32618}, None, None),
+    ],
+)
+def test_push_down_resolution(resample_arguments, expected_resolution, expected_epsg):
+    process_graph = {
+        "load1": _load_collection(),
+        "resample1": {
+            "process_id": "resample_spatial",
+            "arguments": {"data": {"from_node": "load1"}, **resample_arguments},
+            "result": True,
+        },
+    }
+    optimized = push_down_resolution(process_graph=process_graph)
+    arguments = optimized["load1"]["arguments"]
+    assert arguments.get("target_resolution") == expected_resolution
+    assert arguments.get("target_epsg") == expected_epsg
+    # resample_spatial is kept
+    assert "resample1" in optimized
+    assert "target_resolution" not in process_graph["load1"]["arguments"]
@@ -25,6 +25,7 @@ from tensorlakehouse_openeo_driver.tests.unit.unit_test_util import (
 import pandas as pd
 import pytest
 import numpy as np
+import xarray as xr
 from rasterio import crs
 
 
@@ -279,3 +280,18 @@ def test_resample_cube_spatial(source_data, target_data):
         aligned_coords = aligned[dim].values
         target_coords = target[dim].values
         assert np.array_equal(aligned_coords, target_coords)
+
+
+def test_mask_nodata():
+    data = xr.DataArray(
+        np.array([[0, 2], [4, 0]], dtype=np.uint16), dims=["y", "x"]
+    ).rio.write_nodata(0, encoded=False)
+    proc = TensorlakehouseProcessing()
+    # nodata values are skipped by processes that compute new values
+    assert proc.process_registry["mean"].implementation(data=data) == 3
+    # and kept by processes that do not
+    renamed = proc.process_registry["rename_dimension"].implementation(
+        data=data, source="x", target="x_new"
+    )
+    assert renamed.dtype == np.uint16
+    assert renamed.rio.nodata == 0
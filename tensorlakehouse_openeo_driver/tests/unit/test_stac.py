@@ -0,0 +1,57 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from pystac_client import Client
+from pystac_client.stac_api_io import StacApiIO
+
+from tensorlakehouse_openeo_driver import stac
+from tensorlakehouse_openeo_driver.stac import (
+    get_collection,
+    get_stac_client,
+    make_stac_client,
+)
+from tensorlakehouse_openeo_driver.tests.unit.unit_test_util import (
+    MockPystacClient,
+    make_pystac_client_collection,
+)
+
+
+def test_get_stac_client_is_shared():
+    with patch.object(Client, "open", return_value=MockPystacClient()) as mock_open:
+        first = get_stac_client()
+        second = get_stac_client()
+        assert first is second
+        assert mock_open.call_count == 1
+
+
+def test_make_stac_client_pool_size():
+    with patch.object(Client, "open", return_value=MockPystacClient()) as mock_open:
+        make_stac_client(url="https://fake-stac.com", pool_size=3)
+        stac_io = mock_open.call_args.kwargs["stac_io"]
+        adapter = stac_io.session.get_adapter("https://fake-stac.com")
+        assert adapter._pool_maxsize == 3
+
+
+def test_get_collection_revalidates_with_etag():
+    document = make_pystac_client_collection(collection_id="HLSS30").to_dict()
+    ok = MagicMock(status_code=200, headers={"ETag": '"v1"'})
+    ok.content = json.dumps(document).encode()
+    not_modified = MagicMock(status_code=304, headers={})
+    stac_io = StacApiIO()
+    stac_client = Client(id="fake-stac", description="fake STAC")
+    stac_client._stac_io = stac_io
+    with patch(
+        "tensorlakehouse_openeo_driver.stac.get_stac_client", return_value=stac_client
+    ), patch.object(
+        stac_io.session, "send", side_effect=[ok, not_modified]
+    ) as mock_send:
+        first = get_collection(collection_id="HLSS30")
+        # served from cache without any request
+        assert get_collection(collection_id="HLSS30") is first
+        assert mock_send.call_count == 1
+        with patch.object(stac, "STAC_COLLECTION_CACHE_TTL", 0):
+            assert get_collection(collection_id="HLSS30") is first
+        assert mock_send.call_count == 2
+        request = mock_send.call_args.args[0]
+        assert request.headers["If-None-Match"] == '"v1"'
+    assert first.extra_fields["cube:dimensions"] == document["cube:dimensions"]
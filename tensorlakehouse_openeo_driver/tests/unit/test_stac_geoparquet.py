@@ -0,0 +1,99 @@
+import copy
+import json
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from tensorlakehouse_openeo_driver import stac_geoparquet
+from tensorlakehouse_openeo_driver.tests.unit.unit_test_util import HLSS30_ITEMS
+
+
+@pytest.mark.parametrize(
+    "filter_cql, expected_ids",
+    [
+        (None, [i["id"] for i in HLSS30_ITEMS]),
+        (
+            {
+                "op": "<=",
+                "args": [{"property": "properties.cloud_coverage"}, "97"],
+            },
+            ["HLS.S30.T18TYQ.2023242T153821.v2.0.B8A"],
+        ),
+        (
+            {
+                "op": "and",
+                "args": [
+                    {"op": "=", "args": [{"property": "properties.tile"}, "T18TYQ"]},
+                    {
+                        "op": "between",
+                        "args": [{"property": "properties.cloud_coverage"}, 98, 100],
+                    },
+                ],
+            },
+            ["HLS.S30.T18TYQ.2023242T153821.v2.0.B12"],
+        ),
+    ],
+)
+def test_search_items(tmp_path, filter_cql, expected_ids):
+    stac_geoparquet.write_snapshot_part(
+        items=HLSS30_ITEMS, collection_id="HLSS30", root=tmp_path
+    )
+    assert stac_geoparquet.has_snapshot(collection_id="HLSS30", root=tmp_path)
+    items = stac_geoparquet.search_items(
+        collection_id="HLSS30",
+        bbox=(-72.0, 44.0, -71.0, 45.0),
+        starttime=datetime(2023, 8, 1),
+        endtime=datetime(2023, 9, 1),
+        filter_cql=filter_cql,
+        root=tmp_path,
+    )
+    assert sorted(i["id"] for i in items) == sorted(expected_ids)
+    # no item intersects this bbox
+    items = stac_geoparquet.search_items(
+        collection_id="HLSS30", bbox=(0.0, 0.0, 1.0, 1.0), root=tmp_path
+    )
+    assert len(items) == 0
+
+
+def test_sync_snapshot(tmp_path):
+    stac_client = MagicMock()
+    stac_items = list(copy.deepcopy(HLSS30_ITEMS))
+    stac_client.search.return_value.items_as_dicts.side_effect = lambda: iter(
+        stac_items
+    )
+    num_items = stac_geoparquet.sync_snapshot(
+        collection_id="HLSS30", stac_client=stac_client, root=tmp_path
+    )
+    assert num_items == len(HLSS30_ITEMS)
+    assert stac_client.search.call_args.kwargs["filter"] is None
+    # items are synced by ingestion time instead of acquisition time
+    num_items = stac_geoparquet.sync_snapshot(
+        collection_id="HLSS30", stac_client=stac_client, root=tmp_path
+    )
+    assert num_items == 0
+    assert stac_client.search.call_args.kwargs["filter"] == {
+        "op": ">=",
+        "args": [{"property": "updated"}, {"timestamp": "2023-09-19T13:00:11.000Z"}],
+    }
+    assert len(list((tmp_path / "HLSS30").glob("*.parquet"))) == 1
+    # an old acquisition that has been backfilled and an item that has been updated
+    backfilled = copy.deepcopy(HLSS30_ITEMS[0])
+    backfilled["id"] = "backfilled"
+    backfilled["properties"]["datetime"] = "2020-01-01T00:00:00Z"
+    backfilled["properties"]["updated"] = "2023-10-01T00:00:00Z"
+    stac_items[1]["properties"]["updated"] = "2023-10-02T00:00:00Z"
+    stac_items[1]["properties"]["cloud_coverage"] = 0
+    stac_items.append(backfilled)
+    num_items = stac_geoparquet.sync_snapshot(
+        collection_id="HLSS30", stac_client=stac_client, root=tmp_path
+    )
+    assert num_items == 2
+    items = stac_geoparquet.search_items(collection_id="HLSS30", root=tmp_path)
+    assert sorted(i["id"] for i in items) == sorted(
+        [i["id"] for i in HLSS30_ITEMS] + ["backfilled"]
+    )
+    updated_item = [i for i in items if i["id"] == HLSS30_ITEMS[1]["id"]][0]
+    assert updated_item["properties"]["cloud_coverage"] == 0
+    watermark = json.loads((tmp_path / "HLSS30" / "_sync.json").read_text())
+    assert watermark["updated"].startswith("2023-10-02T00:00:00")
@@ -0,0 +1,90 @@
+import copy
+from unittest.mock import patch
+
+import pytest
+
+from tensorlakehouse_openeo_driver import tasks
+
+PROCESS = {
+    "process_graph": {
+        "loadco1": {
+            "process_id": "load_collection",
+            "arguments": {
+                "id": "HLSS30",
+                "spatial_extent": {
+                    "west": -72.0,
+                    "south": 44.0,
+                    "east": -71.0,
+                    "north": 45.0,
+                },
+                "temporal_extent": ["2023-08-01", "2023-09-01"],
+                "bands": ["B02", "B03"],
+            },
+        },
+        "filter1": {
+            "process_id": "filter_bands",
+            "arguments": {"data": {"from_node": "loadco1"}, "bands": ["B02"]},
+        },
+        "save1": {
+            "process_id": "save_result",
+            "arguments": {"data": {"from_node": "filter1"}, "format": "netCDF"},
+            "result": True,
+        },
+    }
+}
+
+
+class GraphParsedError(Exception):
+    """stops the batch job once its process graph has been parsed"""
+
+
+def _run_batch_job(process: dict) -> dict:
+    """run create_batch_jobs until the process graph is parsed and return the parsed graph"""
+    parsed = dict()
+
+    def fake_graph(pg_data):
+        parsed.update(pg_data)
+        raise GraphParsedError()
+
+    with patch.object(tasks.create_batch_jobs, "update_state"), patch.object(
+        tasks, "OpenEOProcessGraph", side_effect=fake_graph
+    ):
+        with pytest.raises(GraphParsedError):
+            tasks.create_batch_jobs.apply(
+                kwargs=dict(
+                    job_id="job-1",
+                    status="created",
+                    process=process,
+                    created="2023-09-01T00:00:00Z",
+                    job_options={},
+                    title="title",
+                    description={},
+                ),
+                throw=True,
+            )
+    return parsed["process_graph"]
+
+
+def test_create_batch_jobs_pushes_down_filters():
+    process_graph = _run_batch_job(process=PROCESS)
+    assert "filter1" not in process_graph
+    assert process_graph["loadco1"]["arguments"]["bands"] == ["B02"]
+    assert process_graph["save1"]["arguments"]["data"] == {"from_node": "loadco1"}
+
+
+def test_create_batch_jobs_pushes_down_resolution():
+    process = copy.deepcopy(PROCESS)
+    process["process_graph"]["resample1"] = {
+        "process_id": "resample_spatial",
+        "arguments": {
+            "data": {"from_node": "filter1"},
+            "resolution": 0.01,
+            "projection": 4326,
+        },
+    }
+    process["process_graph"]["save1"]["arguments"]["data"] = {"from_node": "resample1"}
+    process_graph = _run_batch_job(process=process)
+    arguments = process_graph["loadco1"]["arguments"]
+    assert arguments["target_resolution"] == 0.01
+    assert arguments["target_epsg"] == 4326
+    assert process_graph["resample1"]["arguments"]["data"] == {"from_node": "loadco1"}
@@ -0,0 +1,67 @@
+from unittest import mock
+
+import pytest
+from openeo_driver.testing import TEST_USER_AUTH_HEADER
+from openeo_driver.views import build_app
+
+from tensorlakehouse_openeo_driver.tests.conftest import TEST_APP_CONFIG
+from tensorlakehouse_openeo_driver.views import register_views_explain
+
+PROCESS_GRAPH = {
+    "loadco1": {
+        "process_id": "load_collection",
+        "arguments": {"id": "S2", "spatial_extent": None, "temporal_extent": None},
+        "result": True,
+    }
+}
+
+
+@pytest.fixture
+def explain_client(backend_implementation):
+    app = build_app(backend_implementation=backend_implementation)
+    register_views_explain(app=app, backend_implementation=backend_implementation)
+    app.config.from_mapping(TEST_APP_CONFIG)
+    return app.test_client()
+
+
+@pytest.mark.parametrize("url", ["/openeo/1.1.0/explain", "/openeo/explain"])
+def test_explain(explain_client, backend_implementation, url):
+    plan = {"loadco1": {"assets": 1}}
+    with mock.patch.object(
+        backend_implementation.processing, "explain", return_value=plan
+    ) as explain:
+        response = explain_client.post(
+            url,
+            json={"process": {"process_graph": PROCESS_GRAPH}},
+            headers=TEST_USER_AUTH_HEADER,
+        )
+    assert response.status_code == 200, f"Error! {response.json}"
+    assert response.json == plan
+    explain.assert_called_once_with(process_graph=PROCESS_GRAPH)
+
+
+def test_explain_requires_auth(explain_client):
+    response = explain_client.post(
+        "/openeo/1.1.0/explain", json={"process": {"process_graph": PROCESS_GRAPH}}
+    )
+    assert response.status_code == 401
+    assert response.json["code"] == "AuthenticationRequired"
+
+
+@pytest.mark.parametrize(
+    "body, code",
+    [
+        (None, "ProcessGraphMissing"),
+        ([], "ProcessGraphMissing"),
+        ({}, "ProcessGraphMissing"),
+        ({"process": {}}, "ProcessGraphMissing"),
+        ({"process": {"process_graph": []}}, "ProcessGraphInvalid"),
+        ({"process": {"process_graph": {}}}, "ProcessGraphInvalid"),
+    ],
+)
+def test_explain_invalid_body(explain_client, body, code):
+    response = explain_client.post(
+        "/openeo/1.1.0/explain", json=body, headers=TEST_USER_AUTH_HEADER
+    )
+    assert response.status_code == 400
+    assert response.json["code"] == code
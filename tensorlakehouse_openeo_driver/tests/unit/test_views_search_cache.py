@@ -0,0 +1,52 @@
+from unittest import mock
+
+import pytest
+from openeo_driver.testing import TEST_USER_AUTH_HEADER
+from openeo_driver.views import build_app
+
+from tensorlakehouse_openeo_driver import views
+from tensorlakehouse_openeo_driver.tests.conftest import TEST_APP_CONFIG
+from tensorlakehouse_openeo_driver.views import register_views_search_cache
+
+URL = "/openeo/1.1.0/search_cache/invalidate"
+
+
+@pytest.fixture
+def search_cache_client(backend_implementation):
+    app = build_app(backend_implementation=backend_implementation)
+    register_views_search_cache(app=app)
+    app.config.from_mapping(TEST_APP_CONFIG)
+    return app.test_client()
+
+
+@pytest.mark.parametrize(
+    "body, collection_id", [({"collection_id": "HLSS30"}, "HLSS30"), (None, None)]
+)
+def test_invalidate_search_cache(search_cache_client, body, collection_id):
+    with mock.patch.object(
+        views,
+        "invalidate_search_cache",
+        return_value={"removed": 3, "broadcast": True},
+    ) as invalidate:
+        response = search_cache_client.post(
+            URL, json=body, headers=TEST_USER_AUTH_HEADER
+        )
+    assert response.status_code == 200, f"Error! {response.json}"
+    assert response.json == {
+        "collection_id": collection_id,
+        "removed": 3,
+        "broadcast": True,
+    }
+    invalidate.assert_called_once_with(collection_id=collection_id)
+
+
+def test_invalidate_search_cache_requires_auth(search_cache_client):
+    response = search_cache_client.post(URL, json={"collection_id": "HLSS30"})
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("body", [{"collection_id": 1}, ["HLSS30"]])
+def test_invalidate_search_cache_invalid_body(search_cache_client, body):
+    response = search_cache_client.post(URL, json=body, headers=TEST_USER_AUTH_HEADER)
+    assert response.status_code == 400
+    assert response.json["code"] == "BadRequest"
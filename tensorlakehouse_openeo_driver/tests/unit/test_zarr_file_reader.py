@@ -1,6 +1,8 @@
 import os
+from pathlib import Path
+import fsspec
 import pandas as pd
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import pytest
 import xarray as xr
 from tensorlakehouse_openeo_driver.constants import (
@@ -148,3 +150,174 @@ def test_load_items(
                     actual_size == expected_size
                 ), f"Error! {dim=} {actual_size=} {expected_size=}"
             assert array.rio.crs == CRS.from_epsg(dst_crs)
+
+
+class LocalFilesystem:
+    """serves zarr stores of a local directory as if they were stored in a bucket"""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def get_mapper(self, root=""):
+        return fsspec.get_mapper(str(self.root / Path(root).name))
+
+
+def _make_zarr_item(name: str, bbox: List[float]) -> Dict:
+    return {
+        "bbox": bbox,
+        "assets": {
+            "data": {
+                "href": f"https://s3.us-east.cloud-object-storage.appdomain.cloud/my-bucket/{name}"
+            }
+        },
+        "properties": {
+            "cube:dimensions": {
+                DEFAULT_TIME_DIMENSION: {"type": "temporal"},
+                DEFAULT_Y_DIMENSION: {"axis": "y", "reference_system": 4326},
+                DEFAULT_X_DIMENSION: {"axis": "x", "reference_system": 4326},
+            }
+        },
+    }
+
+
+def _write_zarr(
+    path: Path, times: List[str], x: List[float], value: float, consolidated: bool
+) -> None:
+    xr.Dataset(
+        {
+            "tasmax": (
+                [DEFAULT_TIME_DIMENSION, DEFAULT_Y_DIMENSION, DEFAULT_X_DIMENSION],
+                np.full((len(times), 2, len(x)), value),
+            )
+        },
+        coords={
+            DEFAULT_TIME_DIMENSION: pd.to_datetime(times),
+            DEFAULT_Y_DIMENSION: [50.25, 50.75],
+            DEFAULT_X_DIMENSION: x,
+        },
+    ).to_zarr(path, consolidated=consolidated)
+
+
+def test_load_multiple_items(tmp_path: Path):
+    # two items of the same area at different times and one item of a neighbouring area
+    _write_zarr(tmp_path / "a.zarr", ["2020-01-01"], [0.25, 0.75], 1.0, True)
+    _write_zarr(tmp_path / "b.zarr", ["2020-01-02"], [0.25, 0.75], 2.0, False)
+    _write_zarr(tmp_path / "c.zarr", ["2020-01-02"], [1.25, 1.75], 3.0, True)
+    items = [
+        _make_zarr_item(name="b.zarr", bbox=[0, 50, 1, 51]),
+        _make_zarr_item(name="a.zarr", bbox=[0, 50, 1, 51]),
+        _make_zarr_item(name="c.zarr", bbox=[1, 50, 2, 51]),
+    ]
+    os.environ["TLH_MYBUCKET_ACCESS_KEY_ID"] = "my-access-key"
+    os.environ["TLH_MYBUCKET_SECRET_ACCESS_KEY"] = "my-secret-key"
+    os.environ["TLH_MYBUCKET_ENDPOINT"] = (
+        "s3.us-south.cloud-object-storage.appdomain.cloud"
+    )
+    reader = ZarrFileReader(
+        items=items,
+        bbox=(0.0, 50.0, 2.0, 51.0),
+        temporal_extent=(datetime(2020, 1, 1), datetime(2020, 1, 3)),
+        bands=["tasmax"],
+        properties=None,
+    )
+    with patch.object(
+        ZarrFileReader, "create_s3filesystem", return_value=LocalFilesystem(tmp_path)
+    ), patch.object(xr, "open_zarr", wraps=xr.open_zarr) as mock_open:
+        array = reader.load_items()
+    # consolidated metadata is used if present
+    assert sorted(call.kwargs["consolidated"] for call in mock_open.call_args_list) == [
+        False,
+        True,
+        True,
+        True,
+    ]
+    assert list(array[DEFAULT_TIME_DIMENSION].values) == list(
+        pd.to_datetime(["2020-01-01", "2020-01-02"])
+    )
+    np.testing.assert_array_equal(
+        array.isel({DEFAULT_TIME_DIMENSION: 1, DEFAULT_Y_DIMENSION: 0}).values,
+        [[2.0, 2.0, 3.0, 3.0]],
+    )
+    np.testing.assert_array_equal(
+        array.isel({DEFAULT_TIME_DIMENSION: 0, DEFAULT_Y_DIMENSION: 0}).values,
+        [[1.0, 1.0, np.nan, np.nan]],
+    )
+
+
+@pytest.mark.parametrize(
+    "coords, start, end, expected",
+    [
+        ([0.5, 1.5, 2.5, 3.5], 1.0, 3.0, slice(1, 3)),
+        ([0.5, 1.5, 2.5, 3.5], 1.5, 3.5, slice(1, 4)),
+        ([3.5, 2.5, 1.5, 0.5], 1.0, 3.0, slice(1, 3)),
+        ([3.5, 2.5, 1.5, 0.5], 1.5, 3.5, slice(0, 3)),
+        ([0.5, 1.5], 5.0, 6.0, slice(2, 2)),
+    ],
+)
+def test_get_index_slice(coords: List[float], start: float, end: float, expected):
+    index_slice = ZarrFileReader._get_index_slice(
+        coords=np.array(coords), start=start, end=end
+    )
+    assert index_slice == expected
+    # same as label-based selection
+    expected_coords = [c for c in coords if start <= c <= end]
+    assert list(np.array(coords)[index_slice]) == expected_coords
+
+
+@pytest.mark.parametrize(
+    "temporal_extent, expected",
+    [
+        ((datetime(2000, 1, 3), datetime(2000, 1, 5)), [2, 3, 4]),
+        ((datetime(2000, 1, 8, 12), None), [8, 9]),
+        # 2000-01-03T02:00:00 UTC
+        (
+            (
+                pd.Timestamp("2000-01-02T23:00:00-03:00").to_pydatetime(),
+                datetime(2000, 2, 1),
+            ),
+            [3, 4, 5, 6, 7, 8, 9],
+        ),
+        # same as filter_by_time, the next timestamp is kept if none is selected
+        ((datetime(2000, 1, 3, 12), datetime(2000, 1, 3, 13)), [3]),
+    ],
+)
+def test_get_time_slice(
+    temporal_extent: Tuple[datetime, Optional[datetime]], expected: List[int]
+):
+    times = pd.date_range("2000-01-01", periods=10).values
+    time_slice = ZarrFileReader._get_time_slice(
+        times=times, temporal_extent=temporal_extent
+    )
+    np.testing.assert_array_equal(np.arange(10)[time_slice], expected)
+
+
+def test_load_item_chunks(tmp_path: Path):
+    _write_zarr(
+        tmp_path / "a.zarr",
+        [f"2020-01-{day:02d}" for day in range(1, 11)],
+        [0.25 + 0.5 * i for i in range(8)],
+        1.0,
+        True,
+    )
+    item = _make_zarr_item(name="a.zarr", bbox=[0, 50, 4, 51])
+    reader = ZarrFileReader(
+        items=[item],
+        bbox=(0.0, 50.0, 1.0, 51.0),
+        temporal_extent=(datetime(2020, 1, 2), datetime(2020, 1, 3)),
+        bands=["tasmax"],
+        properties=None,
+    )
+    with patch.object(
+        xr,
+        "open_zarr",
+        side_effect=lambda **kwargs: xr.open_dataset(
+            tmp_path / "a.zarr",
+            engine="zarr",
+            chunks={DEFAULT_TIME_DIMENSION: 1, DEFAULT_X_DIMENSION: 1},
+        ),
+    ):
+        array = reader._load_item(item=item, fs=LocalFilesystem(tmp_path))
+    assert array.sizes[DEFAULT_TIME_DIMENSION] == 2
+    assert array.sizes[DEFAULT_X_DIMENSION] == 2
+    # only the chunks that intersect the request are in the graph
+    assert array.data.npartitions == 4
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """in-memory LRU cache whose entries expire after a time-to-live. The total size of the
+    cached values is bounded by max_size, where the size of each value is computed by sizeof
+    (1 per entry by default). Entries can be tagged (e.g., by collection ID) so that all entries
+    that share a tag are invalidated at once. It is safe to use from threads and greenlets
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        sizeof: Callable[[Any], int] = lambda value: 1,
+    ) -> None:
+        """
+
+        Args:
+            max_size (int): max total size of the cached values
+            ttl (float): default time-to-live in seconds. Entries with ttl <= 0 are not cached
+            sizeof (Callable[[Any], int], optional): computes the size of a value
+        """
+        assert max_size > 0, f"Error! Invalid {max_size=}"
+        self.max_size = max_size
+        self.ttl = ttl
+        self._sizeof = sizeof
+        # key -> (expiration time, size, tag, value), ordered from least to most recently used
+        self._entries: OrderedDict[Hashable, Tuple[float, int, Optional[str], Any]] = (
+            OrderedDict()
+        )
+        self._size = 0
+        self._lock = threading.RLock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """get value associated with key
+
+        Args:
+            key (Hashable): cache key
+
+        Returns:
+            Optional[Any]: cached value or None if key is missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, _, _, value = entry
+            if expires_at <= time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        tag: Optional[str] = None,
+    ) -> None:
+        """store value and evict the least recently used entries if cache is full
+
+        Args:
+            key (Hashable): cache key
+            value (Any): value to be cached
+            ttl (Optional[float], optional): time-to-live in seconds. Defaults to self.ttl
+            tag (Optional[str], optional): tag used by invalidate
+        """
+        if ttl is None:
+            ttl = self.ttl
+        size = self._sizeof(value)
+        # values that are larger than the whole cache would evict everything else
+        if ttl <= 0 or size > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (time.monotonic() + ttl, size, tag, value)
+            self._size += size
+            while self._size > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._pop(oldest_key)
+
+    def invalidate(self, tag: Optional[str] = None) -> int:
+        """remove all entries associated with tag, or all entries if tag is None
+
+        Args:
+            tag (Optional[str], optional): tag set when entries were stored
+
+        Returns:
+            int: number of removed entries
+        """
+        with self._lock:
+            if tag is None:
+                keys = list(self._entries.keys())
+            else:
+                keys = [k for k, v in self._entries.items() if v[2] == tag]
+            for key in keys:
+                self._pop(key)
+            return len(keys)
+
+    def _pop(self, key: Hashable) -> None:
+        _, size, _, _ = self._entries.pop(key)
+        self._size -= size
@@ -0,0 +1,367 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from xml.sax.saxutils import escape
+
+from tensorlakehouse_openeo_driver.constants import (
+    COG_HEADER_CACHE_DIR,
+    COG_HEADER_CACHE_MAX_BYTES,
+    COG_HEADER_CACHE_MIN_AGE,
+    COG_HEADER_CACHE_TTL,
+    COG_HEADER_CACHE_WORKERS,
+    logger,
+)
+
+# number of bytes of the first request, which usually covers the whole header of a COG
+HEADER_INITIAL_BYTES = 64 * 1024
+# headers that are larger than this are not cached, e.g., TIFFs whose IFDs are not at the start
+HEADER_MAX_BYTES = 16 * 1024 * 1024
+# size in bytes of each TIFF data type
+TIFF_TYPE_SIZES = {
+    1: 1,
+    2: 1,
+    3: 2,
+    4: 4,
+    5: 8,
+    6: 1,
+    7: 1,
+    8: 2,
+    9: 4,
+    10: 8,
+    11: 4,
+    12: 8,
+    13: 4,
+    16: 8,
+    17: 8,
+    18: 8,
+}
+SPARSE_FILE_TEMPLATE = """<VSISparseFile>
+  <Length>{length}</Length>
+  <SubfileRegion>
+    <Filename relative="0">{header_path}</Filename>
+    <DestinationOffset>0</DestinationOffset>
+    <SourceOffset>0</SourceOffset>
+    <RegionLength>{header_length}</RegionLength>
+  </SubfileRegion>
+  <SubfileRegion>
+    <Filename relative="0">{gdal_path}</Filename>
+    <DestinationOffset>{header_length}</DestinationOffset>
+    <SourceOffset>{header_length}</SourceOffset>
+    <RegionLength>{data_length}</RegionLength>
+  </SubfileRegion>
+</VSISparseFile>
+"""
+
+
+def replace_hrefs(
+    items: List[Dict[str, Any]],
+    assets: List[str],
+    s3_client: Any,
+    root: Optional[str] = COG_HEADER_CACHE_DIR,
+) -> List[Dict[str, Any]]:
+    """replace the hrefs of the COG assets by GDAL sparse files that read the header (IFDs and
+    tile offsets) from the local cache and the tiles from the object storage, so that opening a
+    file does not require fetching its header again. Headers that are not cached yet are
+    fetched concurrently. Items are not modified, copies are returned. The sparse files are
+    opened by the dask workers, so root must be shared with all of them (see check_cache_dir)
+
+    Args:
+        items (List[Dict[str, Any]]): STAC items
+        assets (List[str]): keys of the assets that will be read
+        s3_client (Any): boto3 S3 client
+        root (Optional[str], optional): cache directory. Defaults to COG_HEADER_CACHE_DIR
+
+    Returns:
+        List[Dict[str, Any]]: items whose hrefs point to the cache if the header is cached
+    """
+    if root is None:
+        return items
+    Path(root).mkdir(parents=True, exist_ok=True)
+    hrefs = {
+        item["assets"][asset]["href"]
+        for item in items
+        for asset in assets
+        if asset in item["assets"]
+    }
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(COG_HEADER_CACHE_WORKERS, len(hrefs)))
+    ) as executor:
+        cached_hrefs = dict(
+            zip(
+                hrefs,
+                executor.map(
+                    lambda href: get_cached_href(
+                        href=href, s3_client=s3_client, root=root
+                    ),
+                    hrefs,
+                ),
+            )
+        )
+    _evict(
+        root=root,
+        max_bytes=COG_HEADER_CACHE_MAX_BYTES,
+        min_age=COG_HEADER_CACHE_MIN_AGE,
+    )
+    new_items = list()
+    for item in items:
+        new_assets = dict(item["assets"])
+        for asset in assets:
+            if asset in new_assets:
+                new_assets[asset] = dict(new_assets[asset])
+                new_assets[asset]["href"] = cached_hrefs[new_assets[asset]["href"]]
+        new_items.append({**item, "assets": new_assets})
+    return new_items
+
+
+def get_cached_href(href: str, s3_client: Any, root: str) -> str:
+    """get the path of the GDAL sparse file that reads the header of href from the cache. The
+    header is fetched if it is not cached or if the ETag of the file has changed
+
+    Args:
+        href (str): link to a COG file (s3://bucket/key)
+        s3_client (Any): boto3 S3 client
+        root (str): cache directory
+
+    Returns:
+        str: /vsisparse/ path or href if the header cannot be cached
+    """
+    if urlparse(href).scheme.lower() != "s3":
+        return href
+    try:
+        index = _read_index(href=href, root=root)
+        if (
+            index is not None
+            and time.time() - index["validated_at"] > COG_HEADER_CACHE_TTL
+        ):
+            bucket, key = _split_s3_url(url=href)
+            response = s3_client.head_object(Bucket=bucket, Key=key)
+            if response["ETag"] != index["etag"]:
+                index = None
+            else:
+                index["validated_at"] = time.time()
+                _write_index(href=href, root=root, index=index)
+        # the header might have been evicted by another worker
+        if index is None or not Path(index["sparse_path"]).exists():
+            index = _fetch_header(href=href, s3_client=s3_client, root=root)
+            if index is None:
+                return href
+        sparse_path = Path(index["sparse_path"])
+        # mtime is used to evict the least recently used headers
+        os.utime(sparse_path.with_suffix(".hdr"))
+        return f"/vsisparse/{sparse_path}"
+    except Exception as e:
+        # the cache is an optimization, files are still readable without it
+        logger.warning(f"Unable to cache header of {href}: {e}")
+        return href
+
+
+def _fetch_header(href: str, s3_client: Any, root: str) -> Optional[Dict[str, Any]]:
+    """fetch the header of href and store it as a sparse file
+
+    Returns:
+        Optional[Dict[str, Any]]: index entry or None if the file is not a cacheable TIFF
+    """
+    bucket, key = _split_s3_url(url=href)
+    response = s3_client.get_object(
+        Bucket=bucket, Key=key, Range=f"bytes=0-{HEADER_INITIAL_BYTES - 1}"
+    )
+    etag = response["ETag"]
+    # Content-Range is "bytes 0-65535/<length>"
+    length = int(response["ContentRange"].split("/")[-1])
+    data = response["Body"].read()
+    complete, header_length = _get_header_length(data=data)
+    while not complete:
+        if header_length > min(length, HEADER_MAX_BYTES):
+            logger.debug(f"Header of {href} is not cached: {header_length=} {length=}")
+            return None
+        end = min(max(header_length, 2 * len(data)), length)
+        response = s3_client.get_object(
+            Bucket=bucket, Key=key, Range=f"bytes={len(data)}-{end - 1}", IfMatch=etag
+        )
+        data += response["Body"].read()
+        complete, header_length = _get_header_length(data=data)
+    name = _get_hash(f"{href}{etag}")
+    # GDAL requires absolute paths, because it resolves them from its working directory
+    header_path = Path(root).resolve() / f"{name}.hdr"
+    sparse_path = Path(root).resolve() / f"{name}.xml"
+    _write_atomically(path=header_path, data=data[:header_length])
+    sparse_file = SPARSE_FILE_TEMPLATE.format(
+        length=length,
+        header_path=escape(str(header_path)),
+        header_length=header_length,
+        gdal_path=escape(_get_gdal_path(url=href)),
+        data_length=length - header_length,
+    )
+    _write_atomically(path=sparse_path, data=sparse_file.encode("utf-8"))
+    index = {
+        "etag": etag,
+        "sparse_path": str(sparse_path),
+        "validated_at": time.time(),
+    }
+    _write_index(href=href, root=root, index=index)
+    return index
+
+
+def _get_header_length(data: bytes) -> Tuple[bool, int]:
+    """compute the length of the header of a TIFF file, i.e., the byte at which the last IFD or
+    the last tag value (e.g., the tile offsets) ends, walking through all IFDs
+
+    Args:
+        data (bytes): first bytes of the file
+
+    Returns:
+        Tuple[bool, int]: whether data has the whole header and the number of bytes that are
+            required, which is the header length if the header is complete
+    """
+    if len(data) < 16:
+        return False, 16
+    byteorder = {b"II": "<", b"MM": ">"}.get(data[:2])
+    if byteorder is None:
+        raise ValueError("Error! File is not a TIFF")
+    version = struct.unpack_from(f"{byteorder}H", data, 2)[0]
+    if version == 42:
+        offset_format, count_format, first_ifd = "I", "H", 4
+    elif version == 43:
+        # BigTIFF has 8-byte offsets and counts
+        offset_format, count_format, first_ifd = "Q", "Q", 8
+    else:
+        raise ValueError(f"Error! Unexpected TIFF version: {version}")
+    offset_size = struct.calcsize(offset_format)
+    count_size = struct.calcsize(count_format)
+    entry_size = 4 + 2 * offset_size
+    header_length = first_ifd + offset_size
+    ifd_offset = struct.unpack_from(f"{byteorder}{offset_format}", data, first_ifd)[0]
+    visited = set()
+    while ifd_offset != 0:
+        if ifd_offset in visited:
+            raise ValueError("Error! TIFF has a loop of IFDs")
+        visited.add(ifd_offset)
+        if ifd_offset + count_size > len(data):
+            return False, ifd_offset + count_size
+        num_entries = struct.unpack_from(
+            f"{byteorder}{count_format}", data, ifd_offset
+        )[0]
+        ifd_end = ifd_offset + count_size + num_entries * entry_size + offset_size
+        if ifd_end > len(data):
+            return False, ifd_end
+        header_length = max(header_length, ifd_end)
+        for index in range(num_entries):
+            entry = ifd_offset + count_size + index * entry_size
+            data_type = struct.unpack_from(f"{byteorder}H", data, entry + 2)[0]
+            count = struct.unpack_from(f"{byteorder}{offset_format}", data, entry + 4)[
+                0
+            ]
+            size = TIFF_TYPE_SIZES.get(data_type, 1) * count
+            # values that do not fit in the entry are stored elsewhere
+            if size > offset_size:
+                value_offset = struct.unpack_from(
+                    f"{byteorder}{offset_format}", data, entry + 4 + offset_size
+                )[0]
+                header_length = max(header_length, value_offset + size)
+        ifd_offset = struct.unpack_from(
+            f"{byteorder}{offset_format}", data, ifd_end - offset_size
+        )[0]
+    return header_length <= len(data), header_length
+
+
+def check_cache_dir(client: Any, root: str) -> None:
+    """check that the cache directory is shared with all dask workers, i.e., that a file that is
+    written by the driver can be read by each worker at the same path, because the sparse files
+    that replace the hrefs are opened by the workers
+
+    Args:
+        client (Any): dask client connected to the workers
+        root (str): cache directory
+    """
+    assert os.path.isabs(root), f"Error! COG header cache dir must be absolute: {root}"
+    Path(root).mkdir(parents=True, exist_ok=True)
+    token = uuid.uuid4().hex
+    path = Path(root) / f"{token}.check"
+    _write_atomically(path=path, data=token.encode("utf-8"))
+    try:
+        results = client.run(_read_text, str(path))
+    finally:
+        path.unlink(missing_ok=True)
+    assert len(results) > 0, "Error! No dask worker to check the COG header cache dir"
+    for worker, text in results.items():
+        assert (
+            text == token
+        ), f"Error! COG header cache dir {root} is not shared with dask worker {worker}"
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        return Path(path).read_text()
+    except OSError:
+        return None
+
+
+def _evict(root: str, max_bytes: int, min_age: float) -> None:
+    """remove the least recently used headers until their total size is below max_bytes. Headers
+    that have been used in the last min_age seconds are kept, because running jobs of this or
+    other processes might still read them
+    """
+    headers = list()
+    for path in Path(root).glob("*.hdr"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            # removed by another worker
+            continue
+        headers.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in headers)
+    min_mtime = time.time() - min_age
+    for mtime, size, path in sorted(headers, key=lambda header: header[0]):
+        if total <= max_bytes or mtime > min_mtime:
+            break
+        path.unlink(missing_ok=True)
+        path.with_suffix(".xml").unlink(missing_ok=True)
+        total -= size
+
+
+def _read_index(href: str, root: str) -> Optional[Dict[str, Any]]:
+    path = Path(root) / f"{_get_hash(href)}.json"
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_index(href: str, root: str, index: Dict[str, Any]) -> None:
+    path = Path(root) / f"{_get_hash(href)}.json"
+    _write_atomically(path=path, data=json.dumps(index).encode("utf-8"))
+
+
+def _write_atomically(path: Path, data: bytes) -> None:
+    """write data to a temporary file and rename it, so that workers that share the cache
+    directory never read a partially written file
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _get_hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _split_s3_url(url: str) -> Tuple[str, str]:
+    """split s3://bucket/key into bucket and key"""
+    url_parsed = urlparse(url)
+    assert isinstance(url_parsed.hostname, str), f"Error! Invalid URL: {url}"
+    return url_parsed.netloc, url_parsed.path.lstrip("/")
+
+
+def _get_gdal_path(url: str) -> str:
+    bucket, key = _split_s3_url(url=url)
+    return f"/vsis3/{bucket}/{key}"
@@ -0,0 +1,357 @@
+import base64
+import json
+from collections import defaultdict
+from typing import Any, DefaultDict, Dict, List, Optional, Tuple
+
+import click
+import fsspec
+import numpy as np
+import xarray as xr
+from urllib.parse import urlparse
+
+from tensorlakehouse_openeo_driver.constants import (
+    GRIB2_MEDIA_TYPE,
+    NETCDF_MEDIA_TYPE,
+    REFERENCES_MEDIA_TYPE,
+    STAC_URL,
+    X_NETCDF_MEDIA_TYPE,
+    logger,
+)
+from tensorlakehouse_openeo_driver.stac import STAC, get_stac_client
+from tensorlakehouse_openeo_driver.util import object_storage_util
+
+# key of the asset that links to the references of the data asset of an item
+REFERENCES_ASSET = "references"
+# references are stored next to the file that they index, i.e., <href><REFERENCES_SUFFIX>
+REFERENCES_SUFFIX = ".kerchunk.json"
+# chunks smaller than this number of bytes (e.g., coordinates) are stored in the references
+INLINE_THRESHOLD = 500
+# first bytes of NetCDF4 (HDF5) and NetCDF3 files
+HDF5_SIGNATURE = b"\x89HDF"
+NETCDF3_SIGNATURE = b"CDF"
+# scalar coordinates of GRIB messages along which the messages of a variable are stacked, in the
+# order of the dimensions of cfgrib. The coordinate of the level is named after GRIB_typeOfLevel
+GRIB2_STACK_COORDINATES = ["number", "time", "step"]
+
+
+def get_references_href(item: Dict[str, Any]) -> Optional[str]:
+    """get the link to the references of an item, which are advertised as an asset
+
+    Args:
+        item (Dict[str, Any]): STAC item
+
+    Returns:
+        Optional[str]: href or None if the item has not been indexed
+    """
+    asset = item["assets"].get(REFERENCES_ASSET)
+    if asset is None or asset.get("type") != REFERENCES_MEDIA_TYPE:
+        return None
+    return asset["href"]
+
+
+def open_references(url: str, storage_options: Dict[str, Any]) -> xr.Dataset:
+    """open a file through its references as a lazy zarr dataset, so that only the chunks that
+    are selected are read, by range requests that fsspec issues concurrently. Chunks must be
+    stored in the same file system as the references
+
+    Args:
+        url (str): link to the references (e.g., s3://bucket/file.nc.kerchunk.json)
+        storage_options (Dict[str, Any]): fsspec options, e.g., credentials
+
+    Returns:
+        xr.Dataset: lazy dataset
+    """
+    protocol = fsspec.utils.get_protocol(url)
+    fs = fsspec.filesystem(
+        "reference",
+        fo=url,
+        target_protocol=protocol,
+        target_options=storage_options,
+        remote_protocol=protocol,
+        remote_options=storage_options,
+    )
+    return xr.open_zarr(store=fs.get_mapper(""), consolidated=False)
+
+
+def generate_references(
+    url: str, media_type: str, storage_options: Dict[str, Any]
+) -> Dict[str, Any]:
+    """generate the byte-range references of the chunks of a NetCDF or GRIB2 file using kerchunk
+
+    Args:
+        url (str): link to the file (e.g., s3://bucket/file.nc)
+        media_type (str): media type of the file
+        storage_options (Dict[str, Any]): fsspec options, e.g., credentials
+
+    Returns:
+        Dict[str, Any]: references (version 1)
+    """
+    # kerchunk is only required to index files and to decode GRIB2 messages
+    if media_type in [NETCDF_MEDIA_TYPE, X_NETCDF_MEDIA_TYPE]:
+        with fsspec.open(url, mode="rb", **storage_options) as f:
+            signature = f.read(4)
+            if signature.startswith(HDF5_SIGNATURE):
+                from kerchunk.hdf import SingleHdf5ToZarr
+
+                f.seek(0)
+                return SingleHdf5ToZarr(
+                    f, url, inline_threshold=INLINE_THRESHOLD
+                ).translate()
+        assert signature.startswith(
+            NETCDF3_SIGNATURE
+        ), f"Error! {url} is neither NetCDF4 nor NetCDF3"
+        from kerchunk.netCDF3 import NetCDF3ToZarr
+
+        return NetCDF3ToZarr(
+            url, storage_options=storage_options, inline_threshold=INLINE_THRESHOLD
+        ).translate()
+    if media_type == GRIB2_MEDIA_TYPE:
+        from kerchunk.grib2 import scan_grib
+
+        # one set of references per GRIB message
+        message_references = scan_grib(
+            url, storage_options=storage_options, inline_threshold=INLINE_THRESHOLD
+        )
+        return combine_grib_messages(message_references=message_references)
+    raise ValueError(f"Error! Unsupported media type: {media_type}")
+
+
+def combine_grib_messages(message_references: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """combine the references of the messages of a GRIB2 file into the references of a single
+    dataset. The messages of a variable (e.g., one per level or forecast step) are stacked
+    along the scalar coordinates whose values differ between them, as cfgrib does, instead of
+    overwriting each other
+
+    Args:
+        message_references (List[Dict[str, Any]]): references of each message, as generated by
+            kerchunk.grib2.scan_grib
+
+    Returns:
+        Dict[str, Any]: references (version 1)
+    """
+    assert len(message_references) > 0, "Error! There is no GRIB message"
+    templates: Dict[str, str] = dict()
+    messages_by_variable: DefaultDict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for message in message_references:
+        templates.update(message.get("templates") or {})
+        refs = message["refs"]
+        coordinates = json.loads(refs[".zattrs"]).get("coordinates", "").split()
+        for key in refs.keys():
+            name, _, field = key.rpartition("/")
+            if field == ".zarray" and name not in coordinates:
+                messages_by_variable[name].append(refs)
+    assert len(messages_by_variable) > 0, "Error! GRIB messages have no variable"
+    combined: Dict[str, Any] = dict()
+    coordinates = set()
+    for variable, messages in messages_by_variable.items():
+        variable_refs = _stack_messages(variable=variable, messages=messages)
+        root_attrs = json.loads(variable_refs.pop(".zattrs"))
+        coordinates.update(root_attrs.get("coordinates", "").split())
+        for key, value in variable_refs.items():
+            # coordinates are shared by variables, but they cannot have different values
+            if combined.get(key, value) != value:
+                raise ValueError(
+                    f"Error! Variables have different values of {key.split('/')[0]}"
+                )
+            combined[key] = value
+    root_attrs["coordinates"] = " ".join(sorted(coordinates))
+    combined[".zattrs"] = json.dumps(root_attrs)
+    references: Dict[str, Any] = {"version": 1, "refs": combined}
+    if len(templates) > 0:
+        references["templates"] = templates
+    return references
+
+
+def _stack_messages(variable: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """stack the messages of a variable along the scalar coordinates that vary between them.
+    Scalar coordinates that vary but are not stacked (e.g., valid_time, which depends on time
+    and step) are dropped
+
+    Args:
+        variable (str): variable name
+        messages (List[Dict[str, Any]]): refs of each message that has the variable
+
+    Returns:
+        Dict[str, Any]: refs of the variable and its coordinates
+    """
+    first = messages[0]
+    root_attrs = json.loads(first[".zattrs"])
+    coordinates: List[str] = root_attrs.get("coordinates", "").split()
+    # values of the scalar coordinates of each message
+    scalars = {
+        name: [_read_scalar(refs=refs, name=name) for refs in messages]
+        for name in coordinates
+        if json.loads(first[f"{name}/.zarray"])["shape"] == []
+    }
+    level = json.loads(first[f"{variable}/.zattrs"]).get("GRIB_typeOfLevel")
+    dims = [
+        name
+        for name in GRIB2_STACK_COORDINATES + [level]
+        if name in scalars and len(set(scalars[name])) > 1
+    ]
+    dropped = [
+        name
+        for name, values in scalars.items()
+        if name not in dims and len(set(values)) > 1
+    ]
+    # coordinates that are not stacked are kept as they are in the first message
+    refs = {
+        key: value
+        for key, value in first.items()
+        if key.split("/")[0] not in dims + dropped + [variable]
+    }
+    root_attrs["coordinates"] = " ".join(c for c in coordinates if c not in dropped)
+    refs[".zattrs"] = json.dumps(root_attrs)
+    labels = {name: sorted(set(scalars[name])) for name in dims}
+    for name in dims:
+        zarray = json.loads(first[f"{name}/.zarray"])
+        values = np.array(labels[name], dtype=zarray["dtype"])
+        zarray.update({"shape": [len(values)], "chunks": [len(values)]})
+        zattrs = json.loads(first[f"{name}/.zattrs"])
+        zattrs["_ARRAY_DIMENSIONS"] = [name]
+        refs[f"{name}/.zarray"] = json.dumps(zarray)
+        refs[f"{name}/.zattrs"] = json.dumps(zattrs)
+        refs[f"{name}/0"] = "base64:" + base64.b64encode(values.tobytes()).decode()
+    zarray = json.loads(first[f"{variable}/.zarray"])
+    zattrs = json.loads(first[f"{variable}/.zattrs"])
+    zarray["shape"] = [len(labels[name]) for name in dims] + zarray["shape"]
+    zarray["chunks"] = [1] * len(dims) + zarray["chunks"]
+    if len(dims) > 0 and np.dtype(zarray["dtype"]).kind == "f":
+        # combinations of coordinates that have no message are missing
+        zarray["fill_value"] = "NaN"
+    zattrs["_ARRAY_DIMENSIONS"] = dims + zattrs["_ARRAY_DIMENSIONS"]
+    refs[f"{variable}/.zarray"] = json.dumps(zarray)
+    refs[f"{variable}/.zattrs"] = json.dumps(zattrs)
+    for index, message in enumerate(messages):
+        position = [str(labels[name].index(scalars[name][index])) for name in dims]
+        for key, value in message.items():
+            name, _, field = key.rpartition("/")
+            if name != variable or field.startswith("."):
+                continue
+            new_key = f"{variable}/{'.'.join(position + [field])}"
+            if new_key in refs:
+                logger.warning(f"Duplicate GRIB message of {variable} has been ignored")
+                continue
+            refs[new_key] = value
+    return refs
+
+
+def _read_scalar(refs: Dict[str, Any], name: str) -> Any:
+    """read the value of a scalar coordinate whose chunk is inlined in the references"""
+    zarray = json.loads(refs[f"{name}/.zarray"])
+    assert (
+        zarray["compressor"] is None and not zarray["filters"]
+    ), f"Error! {name} is encoded"
+    value = refs[f"{name}/0"]
+    assert isinstance(value, str), f"Error! {name} is not inlined"
+    if value.startswith("base64:"):
+        data = base64.b64decode(value.removeprefix("base64:"))
+    else:
+        data = value.encode("ascii")
+    return np.frombuffer(data, dtype=zarray["dtype"])[0].item()
+
+
+def index_item(
+    item: Dict[str, Any], storage_options: Dict[str, Any], overwrite: bool = False
+) -> Optional[Dict[str, Any]]:
+    """generate the references of the data asset of an item, store them next to the asset and
+    advertise them as the REFERENCES_ASSET asset
+
+    Args:
+        item (Dict[str, Any]): STAC item
+        storage_options (Dict[str, Any]): fsspec options of the bucket of the item
+        overwrite (bool, optional): index items that already have references. Defaults to False
+
+    Returns:
+        Optional[Dict[str, Any]]: copy of the item or None if it cannot be indexed
+    """
+    if get_references_href(item=item) is not None and not overwrite:
+        return None
+    asset = next(iter(item["assets"].values()))
+    media_type = asset.get("type")
+    if media_type not in [NETCDF_MEDIA_TYPE, X_NETCDF_MEDIA_TYPE, GRIB2_MEDIA_TYPE]:
+        return None
+    href = asset["href"]
+    url = _to_fsspec_url(href=href)
+    references = generate_references(
+        url=url, media_type=media_type, storage_options=storage_options
+    )
+    with fsspec.open(f"{url}{REFERENCES_SUFFIX}", mode="w", **storage_options) as f:
+        json.dump(references, f)
+    new_item = dict(item)
+    new_item["assets"] = {
+        **item["assets"],
+        REFERENCES_ASSET: {
+            "href": f"{href}{REFERENCES_SUFFIX}",
+            "type": REFERENCES_MEDIA_TYPE,
+            "roles": ["metadata", "references"],
+            "title": "byte-range references of the chunks of the data asset",
+        },
+    }
+    logger.debug(f"Item {item['id']} has been indexed: {len(references['refs'])=}")
+    return new_item
+
+
+def get_storage_options(href: str) -> Dict[str, Any]:
+    """fsspec options to access the bucket of href, using the TLH_<bucket>_* credentials"""
+    if urlparse(href).scheme == "":
+        return {}
+    bucket, _ = _split_url(href=href)
+    credentials = object_storage_util.get_credentials_by_bucket(bucket=bucket)
+    endpoint = credentials["endpoint"]
+    if not endpoint.startswith("https://"):
+        endpoint = f"https://{endpoint}"
+    return {
+        "key": credentials["access_key_id"],
+        "secret": credentials["secret_access_key"],
+        "client_kwargs": {"endpoint_url": endpoint},
+    }
+
+
+def _to_fsspec_url(href: str) -> str:
+    """convert the https link to a COS object to s3://bucket/key, local paths are kept"""
+    if urlparse(href).scheme.lower() not in ["http", "https"]:
+        return href
+    bucket, key = _split_url(href=href)
+    return f"s3://{bucket}/{key}"
+
+
+def _split_url(href: str) -> Tuple[str, str]:
+    """split s3://bucket/key or https://endpoint/bucket/key into bucket and key"""
+    url_parsed = urlparse(href)
+    if url_parsed.scheme.lower() == "s3":
+        return url_parsed.netloc, url_parsed.path.lstrip("/")
+    bucket, _, key = url_parsed.path.lstrip("/").partition("/")
+    assert len(bucket) > 0 and len(key) > 0, f"Error! Invalid URL: {href}"
+    return bucket, key
+
+
+@click.command()
+@click.argument("collection_ids", nargs=-1, required=True)
+@click.option("--overwrite", is_flag=True, help="Index items that have references")
+def index_command(collection_ids: Tuple[str, ...], overwrite: bool):
+    """Generate kerchunk references of the NetCDF and GRIB2 items of each collection and
+    advertise them in the STAC items."""
+    stac = STAC(url=STAC_URL)
+    for collection_id in collection_ids:
+        num_items = 0
+        result = get_stac_client().search(collections=[collection_id])
+        for item in result.items_as_dicts():
+            href = next(iter(item["assets"].values()))["href"]
+            try:
+                new_item = index_item(
+                    item=item,
+                    storage_options=get_storage_options(href=href),
+                    overwrite=overwrite,
+                )
+            except Exception as e:
+                logger.warning(f"Unable to index item {item['id']}: {e}")
+                continue
+            if new_item is not None:
+                stac.update_item(collection_id=collection_id, item=new_item)
+                num_items += 1
+        print(f"{collection_id}: {num_items} items have been indexed")
+
+
+if __name__ == "__main__":
+    index_command()
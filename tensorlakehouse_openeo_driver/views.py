@@ -0,0 +1,100 @@
+import flask
+from openeo_driver.errors import (
+    OpenEOApiException,
+    ProcessGraphInvalidException,
+    ProcessGraphMissingException,
+)
+from openeo_driver.users import User
+from openeo_driver.views import OpenEoApiApp
+
+from tensorlakehouse_openeo_driver.process_implementations.load_collection import (
+    invalidate_search_cache,
+)
+from tensorlakehouse_openeo_driver.tensorlakehouse_backend import (
+    TensorLakeHouseBackendImplementation,
+)
+
+
+def _extract_process_graph(post_data) -> dict:
+    """validate the payload of POST /explain, which is the same as the payload of POST /result
+
+    Args:
+        post_data (Any): json body of the request
+
+    Raises:
+        ProcessGraphMissingException: if body has no process graph
+        ProcessGraphInvalidException: if process graph is not a json object
+
+    Returns:
+        dict: process graph
+    """
+    if not isinstance(post_data, dict):
+        raise ProcessGraphMissingException()
+    process = post_data.get("process")
+    if not isinstance(process, dict) or "process_graph" not in process:
+        raise ProcessGraphMissingException()
+    process_graph = process["process_graph"]
+    if not isinstance(process_graph, dict) or len(process_graph) == 0:
+        raise ProcessGraphInvalidException()
+    return process_graph
+
+
+def register_views_explain(
+    app: OpenEoApiApp, backend_implementation: TensorLakeHouseBackendImplementation
+):
+    """register POST /explain under the same versioned url prefixes and authentication
+    as the openEO endpoints, e.g., /openeo/1.1.0/explain
+
+    Args:
+        app (OpenEoApiApp): app created by openeo_driver.views.build_app
+        backend_implementation (TensorLakeHouseBackendImplementation): backend
+    """
+    auth_handler = app.extensions["auth_handler"]
+    blueprint = flask.Blueprint("tensorlakehouse", __name__)
+
+    @blueprint.route("/explain", methods=["POST"])
+    @auth_handler.requires_bearer_auth
+    def explain(user: User):
+        # same payload as POST /result, but the load plan is returned instead of the result
+        process_graph = _extract_process_graph(flask.request.get_json(silent=True))
+        return flask.jsonify(
+            backend_implementation.processing.explain(process_graph=process_graph)
+        )
+
+    app.register_blueprint(blueprint, url_prefix="/openeo", name="tensorlakehouse_old")
+    app.register_blueprint(blueprint, url_prefix="/openeo/<version>")
+
+
+def register_views_search_cache(app: OpenEoApiApp):
+    """register POST /search_cache/invalidate, which ingestion calls after adding items to a
+    collection, under the same versioned url prefixes and authentication as the openEO endpoints
+
+    Args:
+        app (OpenEoApiApp): app created by openeo_driver.views.build_app
+    """
+    auth_handler = app.extensions["auth_handler"]
+    blueprint = flask.Blueprint("tensorlakehouse_search_cache", __name__)
+
+    @blueprint.route("/search_cache/invalidate", methods=["POST"])
+    @auth_handler.requires_bearer_auth
+    def invalidate(user: User):
+        # without collection_id, search results of all collections are invalidated
+        post_data = flask.request.get_json(silent=True) or {}
+        collection_id = (
+            post_data.get("collection_id") if isinstance(post_data, dict) else post_data
+        )
+        if not isinstance(post_data, dict) or not isinstance(
+            collection_id, (str, type(None))
+        ):
+            raise OpenEOApiException(
+                message="Body must be a JSON object with an optional collection_id string",
+                code="BadRequest",
+                status_code=400,
+            )
+        result = invalidate_search_cache(collection_id=collection_id)
+        return flask.jsonify({"collection_id": collection_id, **result})
+
+    app.register_blueprint(
+        blueprint, url_prefix="/openeo", name="tensorlakehouse_search_cache_old"
+    )
+    app.register_blueprint(blueprint, url_prefix="/openeo/<version>")